@@ -18,7 +18,8 @@ def create_app():
 
     # enable CORS if flask_cors is installed; allow all origins for dev
     if CORS is not None:
-        CORS(app)
+        # the list endpoint returns its pagination cursor in a header
+        CORS(app, expose_headers=["X-Next-Cursor"])
     else:
         # Warn to stdout; not raising so the app can still run in environments
         print("Warning: Flask-CORS not installed. If you run frontend from a different origin, requests may be blocked by the browser.")
@@ -27,8 +28,30 @@ def create_app():
     with app.app_context():
         from backend import models
         db.create_all()
+        from backend.services.search_index import init_search_index
+        init_search_index()
         from backend.blueprints.uploads_api import uploads_bp
         from backend.blueprints.transcriptions_api import transcriptions_bp
+        from backend.blueprints.admin_api import admin_bp
+        from backend.blueprints.search_api import search_bp
+        from backend.blueprints.exports_api import exports_bp
+        from backend.blueprints.batches_api import batches_bp
+        from backend.blueprints.metrics_api import metrics_bp, init_request_metrics
         app.register_blueprint(uploads_bp, url_prefix="/api/uploads")
         app.register_blueprint(transcriptions_bp, url_prefix="/api/transcriptions")
+        app.register_blueprint(admin_bp, url_prefix="/api/admin")
+        app.register_blueprint(search_bp, url_prefix="/api/search")
+        app.register_blueprint(exports_bp, url_prefix="/api/exports")
+        app.register_blueprint(batches_bp, url_prefix="/api/batches")
+        app.register_blueprint(metrics_bp)
+        init_request_metrics(app)
+        if app.config.get("LIVE_TRANSCRIPTION"):
+            from backend.blueprints.live_api import live_bp, Sock
+            if Sock is not None:
+                app.register_blueprint(live_bp, url_prefix="/api/live")
+            else:
+                print("Warning: flask-sock not installed. The live transcription WebSocket (/api/live/ws) is disabled.")
+    if app.config.get("MODEL_WARMUP"):
+        from backend.services.transcription_engine import warmup_models
+        warmup_models(app)
     return app
@@ -0,0 +1,39 @@
+from flask import Blueprint, jsonify, request, current_app
+from backend.services.result_cache import get_result_cache
+from backend.services.whisper_batching import batcher_stats
+from backend.services.search_index import reindex
+
+admin_bp = Blueprint("admin", __name__)
+
+@admin_bp.route("/cache", methods=["GET"])
+def cache_stats():
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify({"enabled":False})
+    return jsonify(dict(cache.stats(), enabled=True))
+
+@admin_bp.route("/cache/invalidate", methods=["POST"])
+def invalidate_cache():
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify({"error":"result cache disabled"}),409
+    data = request.get_json(silent=True) or {}
+    engine = data.get("engine")
+    model = data.get("model")
+    if engine is None and model is None and not data.get("all"):
+        return jsonify({"error":"engine, model or all=true required"}),400
+    removed = cache.invalidate(engine=engine.lower() if engine else None, model=model)
+    return jsonify({"removed":removed})
+
+@admin_bp.route("/batching", methods=["GET"])
+def batching_stats():
+    return jsonify({"enabled":bool(current_app.config.get("WHISPER_BATCHING")),"batchers":batcher_stats()})
+
+@admin_bp.route("/search/reindex", methods=["POST"])
+def reindex_search():
+    """Index transcriptions completed before search existed; new ones are indexed as they complete."""
+    data = request.get_json(silent=True) or {}
+    ids = data.get("transcription_ids")
+    if ids is not None and not isinstance(ids, list):
+        return jsonify({"error":"transcription_ids must be a list"}),400
+    return jsonify({"indexed":reindex(ids)})
@@ -0,0 +1,93 @@
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
+from pathlib import Path
+import json
+from backend import db
+from backend.models import Batch, Transcription, Upload
+from backend.blueprints.uploads_api import VIDEO_EXTENSIONS
+from backend.blueprints.transcriptions_api import queue_fields
+from backend.services import job_queue
+from backend.services.batches import store_archive, guess_content_type, create_batch, batch_progress, iter_manifest
+from backend.services.metrics import stage
+
+batches_bp = Blueprint("batches", __name__)
+
+@batches_bp.route("", methods=["POST"])
+def create_batch_endpoint():
+    """Queue many transcriptions at once: JSON ``{"upload_ids": [...]}`` or a zip/tar in the ``file`` field."""
+    max_files = current_app.config["BATCH_MAX_FILES"]
+    archive = request.files.get("file")
+    try:
+        priority, tenant = queue_fields(request.form if archive is not None else (request.get_json(silent=True) or {}))
+    except (ValueError, TypeError):
+        return jsonify({"error":"invalid priority or tenant"}),400
+    if archive is not None:
+        folder = current_app.config["UPLOAD_FOLDER"]
+        Path(folder).mkdir(parents=True, exist_ok=True)
+        try:
+            with stage("upload"):
+                stored = store_archive(archive.stream, folder, current_app.config["UPLOAD_CHUNK_SIZE"], max_files)
+        except ValueError as e:
+            return jsonify({"error":str(e)}),400
+        uploads = [
+            Upload(filename=name, content_type=guess_content_type(name), size_bytes=size, stored_at=str(path), content_sha256=sha256, is_video=name.lower().endswith(VIDEO_EXTENSIONS))
+            for name, path, size, sha256 in stored
+        ]
+        name = request.form.get("name") or archive.filename
+        source = "archive"
+    else:
+        data = request.get_json(silent=True) or {}
+        upload_ids = data.get("upload_ids")
+        if not isinstance(upload_ids, list) or not upload_ids:
+            return jsonify({"error":"upload_ids (non-empty list) or an archive file required"}),400
+        if len(upload_ids) > max_files:
+            return jsonify({"error":f"at most {max_files} uploads per batch"}),400
+        found = {u.id: u for u in Upload.query.filter(Upload.id.in_([str(i) for i in upload_ids])).all()}
+        missing = [i for i in upload_ids if str(i) not in found]
+        if missing:
+            return jsonify({"error":"uploads not found","missing":missing}),404
+        uploads = [found[str(i)] for i in upload_ids]
+        name = data.get("name")
+        source = "uploads"
+    batch, transcriptions = create_batch(uploads, name=name, source=source, priority=priority, tenant=tenant)
+    db.session.commit()
+    body = batch_progress(batch)
+    body["transcriptions"] = [{"id":t.id,"upload_id":t.upload_id,"filename":t.filename} for t in transcriptions]
+    return jsonify(body),201
+
+@batches_bp.route("/<string:bid>", methods=["GET"])
+def get_batch(bid):
+    batch = db.session.get(Batch, bid)
+    if not batch:
+        return jsonify({"error":"not found"}),404
+    return jsonify(batch_progress(batch))
+
+@batches_bp.route("/<string:bid>/cancel", methods=["POST"])
+def cancel_batch(bid):
+    """Cancel the batch's queued jobs; running ones stop at their next chunk boundary."""
+    batch = db.session.get(Batch, bid)
+    if not batch:
+        return jsonify({"error":"not found"}),404
+    cancelled, flagged = job_queue.cancel(Transcription.batch_id == bid)
+    return jsonify(dict(batch_progress(batch), cancelled_now=cancelled, cancelling=flagged))
+
+@batches_bp.route("/<string:bid>/manifest", methods=["GET"])
+def download_manifest(bid):
+    """One JSON document with every item's outcome and export links, once the batch has finished."""
+    batch = db.session.get(Batch, bid)
+    if not batch:
+        return jsonify({"error":"not found"}),404
+    progress = batch_progress(batch)
+    if progress["status"] != "completed":
+        return jsonify(dict(progress, error="batch not finished")),409
+
+    def generate():
+        yield json.dumps({"batch":progress}, ensure_ascii=False)[:-1] + ', "items": ['
+        sep = ""
+        for entry in iter_manifest(batch):
+            yield sep + json.dumps(entry, ensure_ascii=False)
+            sep = ", "
+        yield "]}"
+
+    resp = Response(stream_with_context(generate()), mimetype="application/json")
+    resp.headers.set("Content-Disposition", "attachment", filename=f"batch-{batch.id}.json")
+    return resp
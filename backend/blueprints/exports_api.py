@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify, url_for
+from pathlib import Path
+from backend import db
+from backend.models import ExportJob
+
+exports_bp = Blueprint("exports", __name__)
+
+@exports_bp.route("/<string:eid>", methods=["GET"])
+def get_export(eid):
+    """Status of an export queued for the worker (large DOCX builds)."""
+    job = db.session.get(ExportJob, eid)
+    if not job:
+        return jsonify({"error":"not found"}),404
+    body = {"id":job.id,"transcription_id":job.transcription_id,"format":job.format,"options":job.options,"status":job.status,"error":job.error}
+    if job.status == "completed" and job.path:
+        body["download_url"] = url_for("transcriptions.download_docx", filename=Path(job.path).name)
+        if job.format == "docx":
+            body["docx_url"] = job.path
+    return jsonify(body)
@@ -0,0 +1,206 @@
+from flask import Blueprint, request, current_app
+from werkzeug.utils import secure_filename
+from pathlib import Path
+from datetime import datetime, timezone
+import json
+import os
+import threading
+import time
+import uuid
+import wave
+from backend import db
+from backend.models import Upload, Transcription
+from backend.services.storage import commit_object
+from backend.services.result_cache import file_sha256
+from backend.services.transcription_engine import get_transcription_engine
+from backend.services.segment_store import insert_segments
+from backend.services.search_index import index_segments
+from backend.services.exporters import content_digest
+
+# flask-sock is optional like Flask-CORS; without it the live endpoint is simply not registered
+try:
+    from flask_sock import Sock
+except Exception:
+    Sock = None
+
+live_bp = Blueprint("live", __name__)
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+
+def _session_slots(limit):
+    global _sessions
+    with _sessions_lock:
+        if _sessions is None:
+            _sessions = threading.BoundedSemaphore(limit)
+    return _sessions
+
+
+def _send(ws, kind, **data):
+    ws.send(json.dumps(dict(data, type=kind)))
+
+
+def _parse_config(message):
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _persist(wav_path, filename, sample_rate, result):
+    """Store the recorded WAV as an Upload and the live result as a completed Transcription."""
+    folder = current_app.config["UPLOAD_FOLDER"]
+    size = os.path.getsize(wav_path)
+    sha256 = file_sha256(wav_path)
+    path = commit_object(wav_path, folder, sha256)
+    upload = Upload(filename=filename, content_type="audio/wav", size_bytes=size, stored_at=str(path), content_sha256=sha256, is_video=False)
+    db.session.add(upload)
+    db.session.flush()
+    t = Transcription(
+        upload_id=upload.id,
+        filename=filename,
+        content_type="audio/wav",
+        # already 16-bit mono PCM; at the default rate it needs no conversion later
+        audio_path=str(path) if sample_rate == current_app.config.get("DEFAULT_SAMPLE_RATE", 16000) else None,
+        language="es",
+        text=result.get("text"),
+        segments=result.get("segments"),
+        duration_seconds=result.get("duration"),
+        content_sha256=content_digest(result.get("text"), result.get("segments")),
+        status="completed",
+        transcriber="vosk-live",
+    )
+    db.session.add(t)
+    db.session.flush()
+    insert_segments(t.id, result.get("segments") or [])
+    index_segments(t.id, result.get("segments") or [])
+    db.session.commit()
+    return upload, t
+
+
+def live_session(ws):
+    """Transcribe 16-bit little-endian mono PCM sent as binary frames.
+
+    An optional first text frame ``{"type":"config","sample_rate":16000,"filename":"..."}``
+    sets the stream parameters (``?sample_rate=`` works too). The server
+    answers with ``partial`` messages while a phrase is open and a ``final``
+    message per finished segment. A ``{"type":"end"}`` frame (or closing the
+    socket) ends the session; the audio and transcription are then stored
+    and a ``done`` message carries their ids.
+
+    The Vosk models are shared through the model registry; each connection
+    only owns a KaldiRecognizer, so sessions are cheap to open.
+    """
+    config = current_app.config
+    slots = _session_slots(config.get("LIVE_MAX_SESSIONS", 32))
+    if not slots.acquire(blocking=False):
+        _send(ws, "error", error="too many live sessions")
+        return
+    try:
+        _run_session(ws, config)
+    finally:
+        slots.release()
+
+
+def _run_session(ws, config):
+    try:
+        sample_rate = int(request.args.get("sample_rate", config.get("DEFAULT_SAMPLE_RATE", 16000)))
+    except ValueError:
+        _send(ws, "error", error="sample_rate must be an integer")
+        return
+    filename = secure_filename(request.args.get("filename") or "")
+    idle_timeout = config.get("LIVE_IDLE_TIMEOUT", 30)
+    partial_interval = config.get("LIVE_PARTIAL_INTERVAL", 0.1)
+
+    message = ws.receive(timeout=idle_timeout)
+    if isinstance(message, str):
+        data = _parse_config(message)
+        if data is None:
+            _send(ws, "error", error="invalid config message")
+            return
+        if data.get("type") == "end":
+            return
+        try:
+            sample_rate = int(data.get("sample_rate", sample_rate))
+        except (TypeError, ValueError):
+            _send(ws, "error", error="sample_rate must be an integer")
+            return
+        filename = secure_filename(data.get("filename") or "") or filename
+        message = None
+    if not filename:
+        filename = datetime.now(timezone.utc).strftime("live-%Y%m%d-%H%M%S.wav")
+
+    try:
+        stream = get_transcription_engine("vosk").open_stream(sample_rate)
+    except Exception as e:
+        _send(ws, "error", error=f"recognizer unavailable: {e}")
+        return
+    _send(ws, "ready", sample_rate=sample_rate)
+
+    incoming = Path(config["UPLOAD_FOLDER"]) / ".incoming"
+    incoming.mkdir(parents=True, exist_ok=True)
+    wav_path = incoming / f"{uuid.uuid4()}.part"
+    wf = wave.open(str(wav_path), "wb")
+    wf.setnchannels(1)
+    wf.setsampwidth(2)
+    wf.setframerate(sample_rate)
+    received = 0
+    last_partial = ""
+    last_partial_at = 0.0
+    try:
+        while True:
+            if message is None:
+                message = ws.receive(timeout=idle_timeout)
+            if message is None:
+                break
+            if isinstance(message, str):
+                data = _parse_config(message) or {}
+                message = None
+                if data.get("type") == "end":
+                    break
+                continue
+            data, message = message, None
+            if len(data) % 2:
+                # an odd byte cannot belong to 16-bit samples
+                data = data[:-1]
+            if not data:
+                continue
+            wf.writeframes(data)
+            received += len(data)
+            segment = stream.accept(data)
+            if segment is not None:
+                _send(ws, "final", **segment)
+                last_partial = ""
+                continue
+            now = time.monotonic()
+            if now - last_partial_at >= partial_interval:
+                partial = stream.partial()
+                last_partial_at = now
+                if partial and partial != last_partial:
+                    _send(ws, "partial", text=partial)
+                    last_partial = partial
+    finally:
+        wf.close()
+        # runs when the client disconnects too, so the audio is not lost
+        result = stream.finish()
+        if not received:
+            os.remove(wav_path)
+        else:
+            try:
+                upload, t = _persist(wav_path, filename, sample_rate, result)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Live session could not be stored: {e}")
+            else:
+                try:
+                    _send(ws, "done", upload_id=upload.id, transcription_id=t.id, text=result["text"], segments=result["segments"], duration=result["duration"])
+                except Exception:
+                    # the client already left; the transcription is stored anyway
+                    pass
+
+
+if Sock is not None:
+    sock = Sock()
+    sock.route("/ws", bp=live_bp)(live_session)
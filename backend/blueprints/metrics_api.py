@@ -0,0 +1,28 @@
+from flask import Blueprint, Response, request, g
+import time
+from backend.services import job_queue
+from backend.services.metrics import REGISTRY, HTTP_SECONDS
+from backend.services.model_registry import get_model_registry
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# read at scrape time, so they are always current
+REGISTRY.gauge("voz_queue_depth", "Transcriptions waiting in the queue.", function=job_queue.queue_depth)
+REGISTRY.gauge("voz_models_loaded", "Models held by the model registry.", function=lambda: len(get_model_registry().keys()))
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+def _start_timer():
+    g._request_started = time.monotonic()
+
+def _observe(response):
+    started = g.pop("_request_started", None)
+    if started is not None and request.url_rule is not None and request.endpoint != "metrics.metrics":
+        HTTP_SECONDS.observe(time.monotonic() - started, endpoint=request.url_rule.rule, method=request.method, status=response.status_code)
+    return response
+
+def init_request_metrics(app):
+    app.before_request(_start_timer)
+    app.after_request(_observe)
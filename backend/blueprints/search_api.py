@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify, request
+from backend.services.search_index import search
+
+search_bp = Blueprint("search", __name__)
+
+SEARCH_MAX_LIMIT = 200
+
+@search_bp.route("", methods=["GET"])
+def search_segments():
+    """Segment-level full-text hits: ``q`` plus optional ``speaker``, ``transcription_id``, ``limit``, ``offset``."""
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error":"q required"}),400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), SEARCH_MAX_LIMIT)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return jsonify({"error":"invalid limit or offset"}),400
+    hits = search(query, limit=limit, offset=offset, speaker=request.args.get("speaker"), transcription_id=request.args.get("transcription_id"))
+    return jsonify(hits)
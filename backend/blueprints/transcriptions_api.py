@@ -1,31 +1,218 @@
-from flask import Blueprint, jsonify, request, current_app, send_from_directory
+from flask import Blueprint, jsonify, request, current_app, send_from_directory, send_file, url_for, Response, stream_with_context
+from sqlalchemy import select, cast, bindparam, or_, and_, func, String
+from sqlalchemy.orm import defer
 from backend import db
-from backend.models import Transcription, Upload
-from backend.services.convert import ensure_audio
-from backend.services.transcribe import transcribe_audio
-from backend.services.docx_generator import generate_docx
-from pathlib import Path
+from backend.models import Transcription, TranscriptionSegment, Upload
+from backend.services import job_queue
+from backend.services.jobs import process_transcription, start_transcription_thread
+from backend.services.job_control import cancel_running
+from backend.services.exporters import EXPORTERS, get_exporter, plan_export, stream_export, export_now, needs_worker, enqueue_export
+from backend.services.segment_store import ensure_segment_rows, query_segments, segment_dict
+from datetime import datetime, timedelta
+import base64
+import json
+import os
+import socket
+import time
 
 transcriptions_bp = Blueprint("transcriptions", __name__)
 
+LIST_MAX_LIMIT = 500
+TENANT_MAX_LENGTH = 64
+
+def _parse_date(value, end=False):
+    """ISO date or datetime; a bare ``to_date`` day includes the whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def queue_fields(data):
+    """``(priority, tenant)`` of a new job from the body (or the X-Tenant-Id header); ``ValueError`` if invalid."""
+    priority = int(data.get("priority") or 0)
+    tenant = data.get("tenant") or request.headers.get("X-Tenant-Id") or None
+    if tenant is not None and (not isinstance(tenant, str) or len(tenant) > TENANT_MAX_LENGTH):
+        raise ValueError("tenant")
+    return priority, tenant
+
+def _progress(row):
+    total = row.progress_total
+    processed = total if row.status == "completed" and total else row.progress_seconds
+    fraction = round(min(processed / total, 1.0), 4) if total and processed is not None else None
+    return {"processed_seconds":processed,"total_seconds":total,"fraction":fraction}
+
+def _encode_cursor(created_at, tid):
+    return base64.urlsafe_b64encode(json.dumps([created_at, tid]).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    created_at, tid = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    return str(created_at), str(tid)
+
 @transcriptions_bp.route("", methods=["GET"])
 def list_transcriptions():
+    """Newest first. Only the listed columns are loaded.
+
+    Pages with ``cursor`` (keyset on ``(created_at, id)``, returned in the
+    ``X-Next-Cursor`` header while more rows remain) or, as before, ``offset``.
+    """
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), LIST_MAX_LIMIT)
+        offset = int(request.args.get("offset", 0))
+        from_date = _parse_date(request.args["from_date"]) if request.args.get("from_date") else None
+        to_date = _parse_date(request.args["to_date"], end=True) if request.args.get("to_date") else None
+        cursor = _decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except (ValueError, TypeError):
+        return jsonify({"error":"invalid limit, offset, from_date, to_date or cursor"}),400
+    # the cursor keeps created_at as the database renders it, so SQLite compares the
+    # stored string exactly (rows from CURRENT_TIMESTAMP have no microseconds)
+    created_key = cast(Transcription.created_at, String)
+    q = select(
+        Transcription.id,
+        Transcription.filename,
+        Transcription.status,
+        Transcription.priority,
+        Transcription.duration_seconds,
+        Transcription.progress_seconds,
+        Transcription.progress_total,
+        Transcription.created_at,
+        created_key.label("created_key")
+    )
     status = request.args.get("status")
-    q = Transcription.query
     if status:
-        q = q.filter_by(status=status)
-    items = q.order_by(Transcription.created_at.desc()).limit(int(request.args.get("limit",10))).offset(int(request.args.get("offset",0))).all()
+        q = q.where(Transcription.status == status)
+    if from_date:
+        q = q.where(Transcription.created_at >= from_date)
+    if to_date:
+        q = q.where(Transcription.created_at < to_date)
+    if cursor:
+        created_at, tid = cursor
+        created_at = bindparam("cursor_created_at", created_at, type_=String)
+        q = q.where(or_(
+            Transcription.created_at < created_at,
+            and_(Transcription.created_at == created_at, Transcription.id < tid)
+        ))
+    elif offset:
+        q = q.offset(offset)
+    rows = db.session.execute(q.order_by(Transcription.created_at.desc(), Transcription.id.desc()).limit(limit + 1)).all()
     results = []
-    for t in items:
-        results.append({"id":t.id,"filename":t.filename,"status":t.status,"duration_seconds":t.duration_seconds,"created_at":t.created_at.isoformat() if t.created_at else None})
-    return jsonify(results)
+    for t in rows[:limit]:
+        results.append({"id":t.id,"filename":t.filename,"status":t.status,"priority":t.priority,"duration_seconds":t.duration_seconds,"progress":_progress(t),"created_at":t.created_at.isoformat() if t.created_at else None})
+    resp = jsonify(results)
+    if len(rows) > limit:
+        resp.headers["X-Next-Cursor"] = _encode_cursor(rows[limit - 1].created_key, rows[limit - 1].id)
+    return resp
 
 @transcriptions_bp.route("/<string:tid>", methods=["GET"])
 def get_transcription(tid):
     t = Transcription.query.get(tid)
     if not t:
         return jsonify({"error":"not found"}), 404
-    return jsonify({"id":t.id,"filename":t.filename,"status":t.status,"text":t.text,"duration_seconds":t.duration_seconds,"segments":t.segments,"speakers":t.speakers,"speaker_segments":t.speaker_segments,"created_at":t.created_at.isoformat() if t.created_at else None})
+    return jsonify({"id":t.id,"filename":t.filename,"status":t.status,"priority":t.priority,"tenant":t.tenant,"progress":_progress(t),"text":t.text,"duration_seconds":t.duration_seconds,"segments":t.segments,"speakers":t.speakers,"speaker_segments":t.speaker_segments,"rtf":t.rtf,"timings":t.timings,"created_at":t.created_at.isoformat() if t.created_at else None})
+
+def _sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data))
+    return "\n".join(lines) + "\n\n"
+
+@transcriptions_bp.route("/<string:tid>/stream", methods=["GET"])
+def stream_transcription(tid):
+    """Server-sent events with each segment as it is persisted, plus ``progress`` while it runs.
+
+    Event ids are segment indexes, so a client reconnecting with
+    ``Last-Event-ID`` resumes after the last segment it received. The stream
+    only observes the job: a queued one waits for a worker, unless
+    STREAM_START_QUEUED lets this process claim and run it.
+    """
+    t = db.session.get(Transcription, tid)
+    if not t:
+        return jsonify({"error":"not found"}),404
+    last_event_id = request.headers.get("Last-Event-ID", request.args.get("last_event_id"))
+    try:
+        start = int(last_event_id) + 1 if last_event_id is not None else 0
+    except ValueError:
+        start = 0
+    app = current_app._get_current_object()
+    if t.status == "queued" and app.config.get("STREAM_START_QUEUED", False):
+        worker_id = f"web:{socket.gethostname()}:{os.getpid()}"
+        if job_queue.claim(tid, worker_id):
+            start_transcription_thread(app, tid, worker_id)
+    poll_interval = app.config.get("STREAM_POLL_INTERVAL", 0.5)
+    ensure_segment_rows(tid)
+    columns = select(
+        Transcription.status, Transcription.error, Transcription.progress_seconds, Transcription.progress_total
+    ).where(Transcription.id == tid)
+
+    def generate():
+        sent = start
+        progress = None
+        last_write = time.monotonic()
+        while True:
+            row = db.session.execute(columns).one_or_none()
+            # only new rows are read on each poll
+            segments = query_segments(tid, from_index=sent)
+            # end the read transaction so the next poll sees new commits
+            db.session.rollback()
+            if row is None:
+                yield _sse("end", {"status":"deleted"})
+                return
+            for seg in segments:
+                yield _sse("segment", segment_dict(seg), event_id=seg.segment_index)
+                sent = seg.segment_index + 1
+                last_write = time.monotonic()
+            if row.status == "processing" and _progress(row) != progress:
+                progress = _progress(row)
+                yield _sse("progress", progress)
+                last_write = time.monotonic()
+            if row.status in ("completed", "failed", "cancelled"):
+                # the final result may have replaced streamed rows (e.g. merged speakers)
+                total = db.session.execute(select(func.count()).where(TranscriptionSegment.transcription_id == tid)).scalar()
+                db.session.rollback()
+                yield _sse("end", {"status":row.status,"error":row.error,"segments":total})
+                return
+            if time.monotonic() - last_write >= 15:
+                yield ": keep-alive\n\n"
+                last_write = time.monotonic()
+            time.sleep(poll_interval)
+
+    headers = {"Cache-Control":"no-cache","X-Accel-Buffering":"no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
+SEGMENTS_MAX_LIMIT = 2000
+
+@transcriptions_bp.route("/<string:tid>/segments", methods=["GET"])
+def list_segments(tid):
+    """Segments overlapping ``[from, to)`` seconds, optionally of one ``speaker``, in order.
+
+    Reads the ``transcription_segments`` table, so a player can load the
+    transcript around its position instead of the whole JSON. Pages like
+    the list endpoint: ``X-Next-Cursor`` holds the next segment index.
+    """
+    status = db.session.execute(select(Transcription.status).where(Transcription.id == tid)).scalar()
+    if status is None:
+        return jsonify({"error":"not found"}),404
+    try:
+        start = float(request.args["from"]) if request.args.get("from") else None
+        end = float(request.args["to"]) if request.args.get("to") else None
+        limit = min(max(int(request.args.get("limit", 500)), 1), SEGMENTS_MAX_LIMIT)
+        from_index = int(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError:
+        return jsonify({"error":"invalid from, to, limit or cursor"}),400
+    ensure_segment_rows(tid)
+    rows = query_segments(tid, start, end, request.args.get("speaker"), from_index, limit + 1)
+    words = request.args.get("words", "false").lower() in ("1", "true", "yes")
+    results = []
+    for row in rows[:limit]:
+        seg = segment_dict(row, with_index=True)
+        if not words:
+            seg.pop("words", None)
+        results.append(seg)
+    resp = jsonify(results)
+    if len(rows) > limit:
+        resp.headers["X-Next-Cursor"] = str(rows[limit].segment_index)
+    return resp
 
 @transcriptions_bp.route("", methods=["POST"])
 def create_transcription_sync():
@@ -34,54 +221,130 @@ def create_transcription_sync():
     speaker_segments = data.get("speaker_segments", [])
     if not upload_id:
         return jsonify({"error":"upload_id required"}),400
+    try:
+        _priority, tenant = queue_fields(data)
+    except (ValueError, TypeError):
+        return jsonify({"error":"invalid priority or tenant"}),400
     upload = Upload.query.get(upload_id)
     if not upload:
         return jsonify({"error":"upload not found"}),404
-    audio_path = ensure_audio(upload.stored_at, current_app.config["UPLOAD_FOLDER"])
-    t = Transcription(upload_id=upload.id, filename=upload.filename, content_type=upload.content_type, audio_path=audio_path, speaker_segments=speaker_segments, status="processing")
+    # process_transcription normalizes the audio itself, so ensure_audio is traced with the job
+    t = Transcription(upload_id=upload.id, filename=upload.filename, content_type=upload.content_type, speaker_segments=speaker_segments, tenant=tenant, status="processing")
     db.session.add(t)
     db.session.commit()
-    try:
-        res = transcribe_audio(audio_path, speaker_segments=speaker_segments)
-        t.text = res.get("text")
-        t.segments = res.get("segments")
-        t.duration_seconds = res.get("duration")
-        t.speakers = res.get("speakers")
-        t.status = "completed"
-    except Exception as e:
-        t.status = "failed"
-        t.error = str(e)
-    db.session.commit()
+    process_transcription(t)
     return jsonify({"id":t.id,"status":t.status,"text":t.text,"segments":t.segments,"speakers":t.speakers})
 
 @transcriptions_bp.route("/async", methods=["POST"])
 def create_transcription_async():
     data = request.get_json() or {}
     upload_id = data.get("upload_id")
+    speaker_segments = data.get("speaker_segments", [])
     if not upload_id:
         return jsonify({"error":"upload_id required"}),400
+    try:
+        priority, tenant = queue_fields(data)
+    except (ValueError, TypeError):
+        return jsonify({"error":"invalid priority or tenant"}),400
     upload = Upload.query.get(upload_id)
     if not upload:
         return jsonify({"error":"upload not found"}),404
-    t = Transcription(upload_id=upload.id, filename=upload.filename, content_type=upload.content_type, status="queued")
+    t = Transcription(upload_id=upload.id, filename=upload.filename, content_type=upload.content_type, speaker_segments=speaker_segments, priority=priority, tenant=tenant, status="queued")
     db.session.add(t)
     db.session.commit()
-    return jsonify({"task_id":t.id,"status":"queued"}),202
+    return jsonify({"task_id":t.id,"status":"queued","priority":t.priority}),202
+
+@transcriptions_bp.route("/<string:tid>", methods=["PATCH"])
+def update_transcription(tid):
+    """Change the priority of a job that is still queued."""
+    data = request.get_json(silent=True) or {}
+    try:
+        priority = int(data["priority"])
+    except (KeyError, ValueError, TypeError):
+        return jsonify({"error":"priority (integer) required"}),400
+    t = db.session.get(Transcription, tid)
+    if not t:
+        return jsonify({"error":"not found"}),404
+    if t.status != "queued":
+        return jsonify({"error":f"transcription is {t.status}"}),409
+    t.priority = priority
+    db.session.commit()
+    return jsonify({"id":t.id,"status":t.status,"priority":t.priority})
+
+@transcriptions_bp.route("/<string:tid>/cancel", methods=["POST"])
+def cancel_transcription(tid):
+    """Queued jobs are cancelled at once; running ones stop at the engine's next chunk boundary."""
+    t = db.session.get(Transcription, tid)
+    if not t:
+        return jsonify({"error":"not found"}),404
+    cancelled, flagged = job_queue.cancel(Transcription.id == tid)
+    if cancelled:
+        return jsonify({"id":tid,"status":"cancelled"})
+    if flagged:
+        cancel_running(tid)
+        return jsonify({"id":tid,"status":"cancelling"}),202
+    db.session.refresh(t)
+    return jsonify({"error":f"transcription is {t.status}"}),409
+
+def _export_target(tid):
+    # the content hash is stored, so exports never need the text/segments columns loaded
+    return db.session.get(Transcription, tid, options=[defer(Transcription.text), defer(Transcription.segments)])
+
+def _send_export(export):
+    return send_file(export.path.resolve(), mimetype=export.exporter.mimetype, as_attachment=True, download_name=export.download_name(), etag=export.key)
+
+def _docx_body(export):
+    return {"docx_url":str(export.path),"download_url":url_for("transcriptions.download_docx", filename=export.filename)}
+
+def _queued_export(job):
+    return jsonify({"export_id":job.id,"status":job.status,"status_url":url_for("exports.get_export", eid=job.id)}),202
+
+@transcriptions_bp.route("/<string:tid>/export/<string:fmt>", methods=["GET"])
+def export_transcription(tid, fmt):
+    """Download the transcription as docx, srt, vtt, txt or json; options come from the query string."""
+    exporter = get_exporter(fmt)
+    if exporter is None:
+        return jsonify({"error":"unknown format","formats":sorted(EXPORTERS)}),400
+    t = _export_target(tid)
+    if not t:
+        return jsonify({"error":"not found"}),404
+    if t.status != "completed":
+        return jsonify({"error":"transcription not completed"}),409
+    export = plan_export(t, exporter, request.args)
+    if export.key in request.if_none_match:
+        return Response(status=304)
+    if export.path.exists():
+        return _send_export(export)
+    if exporter.streamable:
+        resp = Response(stream_with_context(stream_export(export)), mimetype=exporter.mimetype)
+        resp.headers.set("Content-Disposition", "attachment", filename=export.download_name())
+        resp.set_etag(export.key)
+        return resp
+    if needs_worker(export):
+        return _queued_export(enqueue_export(export))
+    export_now(t, export)
+    db.session.commit()
+    return _send_export(export)
 
 @transcriptions_bp.route("/<string:tid>/docx", methods=["POST"])
 def generate_docx_endpoint(tid):
-    t = Transcription.query.get(tid)
+    t = _export_target(tid)
     if not t:
         return jsonify({"error":"not found"}),404
-    if t.word_doc_path:
-        return jsonify({"docx_url":t.word_doc_path}),200
-    folder = current_app.config["DOCX_STORAGE_PATH"]
-    Path(folder).mkdir(parents=True, exist_ok=True)
-    outpath = str(Path(folder) / (t.id + ".docx"))
-    generate_docx(t, outpath, options=request.get_json() or {})
-    t.word_doc_path = outpath
+    if t.status != "completed":
+        return jsonify({"error":"transcription not completed"}),409
+    # cached per content and options: a new title or a re-transcription builds a new file
+    export = plan_export(t, EXPORTERS["docx"], request.get_json(silent=True) or {})
+    if export.path.exists():
+        if t.word_doc_path != str(export.path):
+            t.word_doc_path = str(export.path)
+            db.session.commit()
+        return jsonify(_docx_body(export)),200
+    if needs_worker(export):
+        return _queued_export(enqueue_export(export))
+    export_now(t, export)
     db.session.commit()
-    return jsonify({"docx_url":outpath}),201
+    return jsonify(_docx_body(export)),201
 
 @transcriptions_bp.route("/download/<path:filename>", methods=["GET"])
 def download_docx(filename):
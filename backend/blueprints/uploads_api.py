@@ -4,35 +4,106 @@ from pathlib import Path
 import os
 from backend import db
 from backend.models import Upload
+from backend.services.storage import store_stream, get_upload_sessions
+from backend.services.metrics import stage
 
 uploads_bp = Blueprint("uploads", __name__)
 
+VIDEO_EXTENSIONS = (".mp4",".mkv",".mov",".webm")
+
+def _save_upload(filename, content_type, path, size, sha256):
+    upload = Upload(filename=str(filename), content_type=content_type, size_bytes=size, stored_at=str(path), content_sha256=sha256, is_video=str(filename).lower().endswith(VIDEO_EXTENSIONS))
+    db.session.add(upload)
+    db.session.commit()
+    return jsonify({"id":upload.id,"filename":upload.filename,"content_type":upload.content_type,"size":upload.size_bytes,"stored_at":upload.stored_at,"sha256":upload.content_sha256})
+
 @uploads_bp.route("", methods=["POST"])
 def create_upload():
+    folder = current_app.config["UPLOAD_FOLDER"]
+    chunk_size = current_app.config["UPLOAD_CHUNK_SIZE"]
+    Path(folder).mkdir(parents=True, exist_ok=True)
     if request.content_type and request.content_type.startswith("application/octet-stream"):
-        filename = request.headers.get("X-Filename") or request.args.get("filename") or "upload.bin"
-        folder = current_app.config["UPLOAD_FOLDER"]
-        Path(folder).mkdir(parents=True, exist_ok=True)
-        path = Path(folder) / filename
-        with open(path, "wb") as f:
-            f.write(request.get_data())
+        filename = secure_filename(request.headers.get("X-Filename") or request.args.get("filename") or "") or "upload.bin"
+        with stage("upload"):
+            path, size, sha256 = store_stream(request.stream, folder, chunk_size)
         content_type = request.content_type
-        size = path.stat().st_size
     else:
         file = request.files.get("file")
         if not file:
             return jsonify({"error":"missing file"}), 400
-        filename = secure_filename(file.filename or "upload")
-        folder = current_app.config["UPLOAD_FOLDER"]
-        Path(folder).mkdir(parents=True, exist_ok=True)
-        path = Path(folder) / filename
-        file.save(str(path))
+        filename = secure_filename(file.filename or "upload") or "upload"
+        with stage("upload"):
+            path, size, sha256 = store_stream(file.stream, folder, chunk_size)
         content_type = file.mimetype
-        size = path.stat().st_size
-    upload = Upload(filename=str(filename), content_type=content_type, size_bytes=size, stored_at=str(path), is_video=str(filename).lower().endswith((".mp4",".mkv",".mov",".webm")))
-    db.session.add(upload)
-    db.session.commit()
-    return jsonify({"id":upload.id,"filename":upload.filename,"content_type":upload.content_type,"size":upload.size_bytes,"stored_at":upload.stored_at})
+    return _save_upload(filename, content_type, path, size, sha256)
+
+
+@uploads_bp.route("/sessions", methods=["POST"])
+def create_upload_session():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get("filename") or "") or "upload.bin"
+    size = data.get("size")
+    if size is not None:
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            return jsonify({"error":"size must be an integer"}),400
+    sessions = get_upload_sessions(current_app.config["UPLOAD_FOLDER"])
+    session = sessions.create(filename, data.get("content_type") or "application/octet-stream", size)
+    return jsonify(dict(session, chunk_size=current_app.config["UPLOAD_CHUNK_SIZE"])),201
+
+@uploads_bp.route("/sessions/<string:sid>", methods=["GET"])
+def get_upload_session(sid):
+    session = get_upload_sessions(current_app.config["UPLOAD_FOLDER"]).get(sid)
+    if session is None:
+        return jsonify({"error":"not found"}),404
+    return jsonify(session)
+
+@uploads_bp.route("/sessions/<string:sid>", methods=["PUT"])
+def append_upload_chunk(sid):
+    sessions = get_upload_sessions(current_app.config["UPLOAD_FOLDER"])
+    session = sessions.get(sid)
+    if session is None:
+        return jsonify({"error":"not found"}),404
+    try:
+        offset = int(request.headers.get("Upload-Offset", request.args.get("offset", "")))
+    except ValueError:
+        return jsonify({"error":"offset required"}),400
+    try:
+        with stage("upload"):
+            new_offset = sessions.append(sid, offset, request.stream, current_app.config["UPLOAD_CHUNK_SIZE"])
+    except KeyError:
+        # aborted or finalized since the lookup above
+        return jsonify({"error":"not found"}),404
+    if new_offset is None:
+        session = sessions.get(sid)
+        if session is None:
+            return jsonify({"error":"not found"}),404
+        # client and server disagree: tell the client where to resume
+        return jsonify({"error":"offset mismatch","offset":session["offset"]}),409
+    return jsonify({"id":sid,"offset":new_offset})
+
+@uploads_bp.route("/sessions/<string:sid>/finalize", methods=["POST"])
+def finalize_upload_session(sid):
+    folder = current_app.config["UPLOAD_FOLDER"]
+    sessions = get_upload_sessions(folder)
+    try:
+        path, size, sha256, meta = sessions.finalize(sid, folder, current_app.config["UPLOAD_CHUNK_SIZE"])
+    except KeyError:
+        return jsonify({"error":"not found"}),404
+    except ValueError as e:
+        session = sessions.get(sid)
+        if session is None:
+            # aborted while the error was being reported
+            return jsonify({"error":"not found"}),404
+        return jsonify({"error":str(e),"offset":session["offset"]}),409
+    return _save_upload(meta["filename"], meta["content_type"], path, size, sha256)
+
+@uploads_bp.route("/sessions/<string:sid>", methods=["DELETE"])
+def abort_upload_session(sid):
+    if not get_upload_sessions(current_app.config["UPLOAD_FOLDER"]).abort(sid):
+        return jsonify({"error":"not found"}),404
+    return "",204
 
 
 @uploads_bp.route("/download/<path:filename>", methods=["GET"])
@@ -44,5 +115,10 @@ def download_upload(filename):
     safe_name = Path(filename).name
     file_path = Path(folder) / safe_name
     if not file_path.exists():
-        return jsonify({"error": "not found"}), 404
+        # stored objects are named by content hash; fall back to the original name
+        upload = Upload.query.filter_by(filename=safe_name).order_by(Upload.created_at.desc()).first()
+        if not upload or not Path(upload.stored_at).exists():
+            return jsonify({"error": "not found"}), 404
+        stored = Path(upload.stored_at)
+        return send_from_directory(str(stored.parent.resolve()), stored.name, as_attachment=True, download_name=safe_name)
     return send_from_directory(folder, safe_name, as_attachment=True)
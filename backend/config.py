@@ -3,7 +3,10 @@ import os
 class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///data.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # web processes and workers share SQLite locally; wait on locks instead of failing
+    SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 30}} if SQLALCHEMY_DATABASE_URI.startswith("sqlite") else {}
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "uploads")
+    UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
     DOCX_STORAGE_PATH = os.environ.get("DOCX_STORAGE_PATH", "generated/docs")
     FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
     DEFAULT_SAMPLE_RATE = int(os.environ.get("DEFAULT_SAMPLE_RATE", "16000"))
@@ -16,6 +19,12 @@ class Config:
     WHISPER_BEAM_SIZE = int(os.environ.get("WHISPER_BEAM_SIZE", "5"))
     WHISPER_BEST_OF = int(os.environ.get("WHISPER_BEST_OF", "5"))
     WHISPER_TEMPERATURE = float(os.environ.get("WHISPER_TEMPERATURE", "0.0"))
+    WHISPER_CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", "4"))
+    # batch windows of concurrent Whisper requests: flush at WHISPER_BATCH_SIZE windows
+    # or after the oldest waited WHISPER_BATCH_MAX_WAIT_MS
+    WHISPER_BATCHING = os.environ.get("WHISPER_BATCHING", "false").lower() in ("1", "true", "yes")
+    WHISPER_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "8"))
+    WHISPER_BATCH_MAX_WAIT_MS = float(os.environ.get("WHISPER_BATCH_MAX_WAIT_MS", "50"))
     FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "")
     
     VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", "vosk-model-small-es-0.42")
@@ -24,3 +33,72 @@ class Config:
     HUGGINGFACE_API_KEY = os.environ.get("HUGGINGFACE_API_KEY")
     PYANNOTE_MODEL = os.environ.get("PYANNOTE_MODEL", "pyannote/speaker-diarization-3.1")
     PYANNOTE_ACCESS_TOKEN = os.environ.get("HUGGINGFACE_API_KEY")
+    
+    # how client speaker_segments are handled: "single_pass" transcribes the file once
+    # and assigns words to the intervals, "per_segment" transcribes every interval alone
+    SPEAKER_SEGMENTS_MODE = os.environ.get("SPEAKER_SEGMENTS_MODE", "single_pass")
+    # cosine distance under which the offline pass merges over-split Vosk speakers (0 = off)
+    SPEAKER_MERGE_THRESHOLD = float(os.environ.get("SPEAKER_MERGE_THRESHOLD", "0"))
+    
+    # "synthetic" engine: segments from the energy envelope, paced at SYNTHETIC_RTF audio
+    # seconds per second after SYNTHETIC_LATENCY_SECONDS (0 = instant); no model files
+    SYNTHETIC_RTF = float(os.environ.get("SYNTHETIC_RTF", "0"))
+    SYNTHETIC_LATENCY_SECONDS = float(os.environ.get("SYNTHETIC_LATENCY_SECONDS", "0"))
+    SYNTHETIC_SPEAKERS = int(os.environ.get("SYNTHETIC_SPEAKERS", "2"))
+    SYNTHETIC_MAX_SEGMENT_SECONDS = float(os.environ.get("SYNTHETIC_MAX_SEGMENT_SECONDS", "10"))
+    SYNTHETIC_TURN_PAUSE_SECONDS = float(os.environ.get("SYNTHETIC_TURN_PAUSE_SECONDS", "0.8"))
+    
+    # 0 disables the budget; otherwise least recently used models are unloaded
+    MODEL_REGISTRY_MAX_MB = int(os.environ.get("MODEL_REGISTRY_MAX_MB", "0"))
+    MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "false").lower() in ("1", "true", "yes")
+    
+    RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "cache/results")
+    RESULT_CACHE_MAX_MB = int(os.environ.get("RESULT_CACHE_MAX_MB", "1024"))
+    
+    # exports (docx, srt, vtt, txt, json) are cached in DOCX_STORAGE_PATH per content and
+    # options; DOCX builds of at least EXPORT_ASYNC_MIN_SEGMENTS segments go to the worker
+    # (0 builds everything in the request); segment rows are read EXPORT_BATCH_SIZE at a time
+    EXPORT_ASYNC_MIN_SEGMENTS = int(os.environ.get("EXPORT_ASYNC_MIN_SEGMENTS", "2000"))
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "500"))
+    
+    # segments are committed at most once per STREAM_FLUSH_SECONDS while decoding;
+    # /stream polls the row every STREAM_POLL_INTERVAL seconds
+    STREAM_FLUSH_SECONDS = float(os.environ.get("STREAM_FLUSH_SECONDS", "1.0"))
+    STREAM_POLL_INTERVAL = float(os.environ.get("STREAM_POLL_INTERVAL", "0.5"))
+    # true lets /stream claim a queued job and run it in the web process, bypassing the
+    # workers' concurrency limit and priority/fair-share ordering (single-process setups only)
+    STREAM_START_QUEUED = os.environ.get("STREAM_START_QUEUED", "false").lower() in ("1", "true", "yes")
+    # running jobs write audio seconds processed (and pick up cancel requests) at most this often
+    PROGRESS_INTERVAL_SECONDS = float(os.environ.get("PROGRESS_INTERVAL_SECONDS", "2.0"))
+    
+    WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "1"))
+    WORKER_POLL_INTERVAL = float(os.environ.get("WORKER_POLL_INTERVAL", "2.0"))
+    WORKER_HEARTBEAT_SECONDS = float(os.environ.get("WORKER_HEARTBEAT_SECONDS", "15"))
+    WORKER_STALE_SECONDS = float(os.environ.get("WORKER_STALE_SECONDS", "120"))
+    WORKER_MAX_ATTEMPTS = int(os.environ.get("WORKER_MAX_ATTEMPTS", "3"))
+    # POST /api/batches: upload ids or media files of one zip/tar per batch
+    BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "1000"))
+
+    
+    # WebSocket live transcription with Vosk; the model is shared by every session
+    LIVE_TRANSCRIPTION = os.environ.get("LIVE_TRANSCRIPTION", "true").lower() in ("1", "true", "yes")
+    LIVE_MAX_SESSIONS = int(os.environ.get("LIVE_MAX_SESSIONS", "32"))
+    LIVE_PARTIAL_INTERVAL = float(os.environ.get("LIVE_PARTIAL_INTERVAL", "0.1"))
+    LIVE_IDLE_TIMEOUT = float(os.environ.get("LIVE_IDLE_TIMEOUT", "30"))
+    
+    # chunked mode: long normalized files are cut at silences into overlapping windows
+    # decoded by PARALLEL_WORKERS processes with PARALLEL_THREADS_PER_WORKER threads each
+    # (0 workers keeps the sequential single-model path)
+    PARALLEL_WORKERS = int(os.environ.get("PARALLEL_WORKERS", "0"))
+    PARALLEL_THREADS_PER_WORKER = int(os.environ.get("PARALLEL_THREADS_PER_WORKER", "2"))
+    CHUNK_SECONDS = float(os.environ.get("CHUNK_SECONDS", "120"))
+    CHUNK_OVERLAP_SECONDS = float(os.environ.get("CHUNK_OVERLAP_SECONDS", "2.0"))
+    CHUNK_MIN_AUDIO_SECONDS = float(os.environ.get("CHUNK_MIN_AUDIO_SECONDS", "300"))
+    
+    # false: jobs whose mode reads the audio in order (no per-segment cutting, no
+    # chunked pool) decode the upload with ffmpeg straight into the engine instead
+    # of writing a 16 kHz WAV to UPLOAD_FOLDER first; ffmpeg may run up to
+    # PCM_STREAM_BUFFER_SECONDS of audio ahead of the engine
+    PERSIST_NORMALIZED_AUDIO = os.environ.get("PERSIST_NORMALIZED_AUDIO", "true").lower() in ("1", "true", "yes")
+    PCM_STREAM_BUFFER_SECONDS = float(os.environ.get("PCM_STREAM_BUFFER_SECONDS", "30"))
@@ -1,6 +1,8 @@
 import uuid
-from sqlalchemy import Column, JSON, Text, String, Float, Boolean, DateTime, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, JSON, Text, String, Float, Boolean, DateTime, ForeignKey, Integer, Index
+from sqlalchemy.sql import func, literal_column
+# registers the typed to_tsvector() used by the PostgreSQL search index
+import sqlalchemy.dialects.postgresql  # noqa: F401
 from backend import db
 
 class Upload(db.Model):
@@ -10,16 +12,34 @@ class Upload(db.Model):
     content_type = Column(Text, nullable=False)
     size_bytes = Column(db.BigInteger, nullable=False, default=0)
     stored_at = Column(Text, nullable=False)
+    content_sha256 = Column(String(64), index=True)
     original_path = Column(Text)
     is_video = Column(Boolean, nullable=False, default=False)
     metadata_json = Column("metadata", JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # same names as setup/schema_database.sql, so create_all and the SQL script agree
+    __table_args__ = (
+        Index("idx_uploads_filename", "filename"),
+        Index("idx_uploads_created_at", "created_at"),
+    )
+
+class Batch(db.Model):
+    """Transcriptions submitted together; progress is aggregated from its rows."""
+    __tablename__ = "batches"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = Column(Text)
+    source = Column(String(16), nullable=False, default="uploads")
+    total = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 class Transcription(db.Model):
     __tablename__ = "transcriptions"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     upload_id = Column(String, ForeignKey("uploads.id"))
+    batch_id = Column(String, ForeignKey("batches.id"))
     filename = Column(Text)
     content_type = Column(Text)
     audio_path = Column(Text)
@@ -31,7 +51,76 @@ class Transcription(db.Model):
     speaker_segments = Column(JSON)
     status = Column(String(32), nullable=False, default="queued")
     error = Column(Text)
+    # higher runs first; among equal priorities tenants (then batches) share the workers
+    priority = Column(Integer, nullable=False, default=0)
+    tenant = Column(String(64))
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # audio seconds decoded so far out of progress_total, written every PROGRESS_INTERVAL_SECONDS
+    progress_seconds = Column(Float)
+    progress_total = Column(Float)
     transcriber = Column(Text)
     word_doc_path = Column(Text)
+    # digest of text + segments; exports are cached per content and options
+    content_sha256 = Column(String(64))
+    worker_id = Column(Text)
+    claimed_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    attempts = Column(Integer, nullable=False, default=0)
+    timings = Column(JSON)
+    rtf = Column(Float)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("idx_transcriptions_status", "status"),
+        # (created_at, id) is the keyset the list endpoint pages on
+        Index("idx_transcriptions_created_at", "created_at", "id"),
+        Index("idx_transcriptions_upload_id", "upload_id"),
+        # batch progress and the fair-share claim count rows per (batch, status)
+        Index("idx_transcriptions_batch_status", "batch_id", "status"),
+        Index("idx_transcriptions_tenant_status", "tenant", "status"),
+    )
+
+class TranscriptionSegment(db.Model):
+    """One result segment; ``Transcription.segments`` keeps the whole list as JSON for the full response."""
+    __tablename__ = "transcription_segments"
+    transcription_id = Column(String, ForeignKey("transcriptions.id", ondelete="CASCADE"), primary_key=True)
+    segment_index = Column(Integer, primary_key=True)
+    start_time = Column(Float, nullable=False)
+    end_time = Column(Float, nullable=False)
+    text = Column(Text)
+    speaker = Column(String(64))
+    words = Column(JSON)
+    
+    __table_args__ = (
+        Index("idx_transcription_segments_start", "transcription_id", "start_time"),
+        # full-text search on PostgreSQL (services/search_index.py); SQLite uses an FTS5 table
+        Index(
+            "idx_transcription_segments_fts",
+            func.to_tsvector(literal_column("'spanish'"), text),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+class ExportJob(db.Model):
+    """A document build run by the worker (large DOCX files); claimed like transcriptions."""
+    __tablename__ = "export_jobs"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    transcription_id = Column(String, ForeignKey("transcriptions.id", ondelete="CASCADE"), nullable=False)
+    format = Column(String(16), nullable=False)
+    options = Column(JSON)
+    cache_key = Column(String(64), nullable=False)
+    status = Column(String(32), nullable=False, default="queued")
+    path = Column(Text)
+    error = Column(Text)
+    worker_id = Column(Text)
+    claimed_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    attempts = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("idx_export_jobs_status", "status"),
+        Index("idx_export_jobs_cache_key", "cache_key"),
+    )
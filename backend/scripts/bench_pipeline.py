@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the transcription pipeline over test-voices.
+
+Calls the services directly (no server, no database): ``ensure_audio``,
+``transcribe_audio``, ``segment_audio_by_speakers``, the Vosk
+``_cluster_speakers`` pass and ``generate_docx``, for every engine and
+config given. Each step records wall time, CPU time and utilization (CPU
+seconds per wall second, so 4.0 means four busy cores) and peak RSS; the
+run also records its real-time factor (audio seconds per processing
+second, as stored on ``Transcription.rtf``).
+
+``--long`` adds synthetic recordings of the given lengths, made by
+concatenating the normalized test voices, to measure how each step scales
+beyond the short clips. They are built once in ``--work-dir`` and reused.
+
+Results are written as JSON. With ``--baseline`` every step is compared
+against a previous results file and the script exits with status 1 when
+wall time or peak RSS grows, or RTF drops, by more than ``--threshold``.
+
+    python -m backend.scripts.bench_pipeline --engines vosk whisper --long 3600 10800 -o bench.json
+    python -m backend.scripts.bench_pipeline --config WHISPER_BATCHING=1 --config PARALLEL_WORKERS=4
+    python -m backend.scripts.bench_pipeline --engines synthetic --long 3600 10800
+    python -m backend.scripts.bench_pipeline --baseline bench.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import wave
+from datetime import datetime, timezone
+from pathlib import Path
+from flask import Flask
+from backend.services.convert import ensure_audio
+from backend.services.transcribe import transcribe_audio
+from backend.services.audio_segmenter import read_pcm_wav, segment_audio_by_speakers, cleanup_segments
+from backend.services.docx_generator import generate_docx
+from backend.services.transcription_engine import get_transcription_engine
+from backend.scripts.bench_speaker_clustering import synthetic_xvectors
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TEST_DIR = os.environ.get('TEST_VOICES_DIR', os.path.join(os.path.dirname(__file__), '..', '..', 'test-voices'))
+
+# metric -> direction that counts as a regression
+COMPARED = {"wall_seconds": 1, "peak_rss_mb": 1, "rtf": -1}
+
+
+def _rss_bytes():
+    """Resident set size of this process plus its children (pool workers, ffmpeg) when psutil is available."""
+    if psutil is not None:
+        proc = psutil.Process()
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class Measure:
+    """Wall/CPU time and peak RSS of a block; RSS is sampled by a background thread."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.result = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self._times = os.times()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._started
+        end = os.times()
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+        # children_* cover ffmpeg and finished pool processes (zero on Windows)
+        cpu = sum(getattr(end, f) - getattr(self._times, f) for f in ("user", "system", "children_user", "children_system"))
+        self.result = {
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "cpu_utilization": round(cpu / wall, 3) if wall > 0 else None,
+            "peak_rss_mb": round(self.peak / (1024 * 1024), 1),
+        }
+        return False
+
+
+def _parse_value(value):
+    if value.lower() in ("true", "false", "yes", "no"):
+        return value.lower() in ("true", "yes")
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def parse_config(text):
+    """``KEY=VALUE[,KEY=VALUE...]`` into a dict of config overrides."""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        key, _, value = item.partition("=")
+        overrides[key.strip()] = _parse_value(value.strip())
+    return overrides
+
+
+def make_app(engine, overrides, work_dir):
+    app = Flask(__name__)
+    app.config.from_object("backend.config.Config")
+    app.config.update(
+        TRANSCRIPTION_ENGINE=engine,
+        MODEL_WARMUP=False,
+        UPLOAD_FOLDER=str(Path(work_dir) / "uploads"),
+        DOCX_STORAGE_PATH=str(Path(work_dir) / "docs")
+    )
+    app.config.update(overrides)
+    return app
+
+
+def write_pcm_wav(path, chunks, sample_rate):
+    tmp = Path(str(path) + ".part")
+    with wave.open(str(tmp), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        for chunk in chunks:
+            out.writeframes(chunk.tobytes())
+    os.replace(tmp, path)
+    return str(path)
+
+
+def synthetic_long_audio(sources, seconds, work_dir):
+    """A ``seconds`` long WAV cycling through the normalized ``sources``; reused when already built."""
+    pcms = [pcm for pcm in (read_pcm_wav(src) for src in sources) if pcm is not None and len(pcm[0])]
+    if not pcms:
+        raise RuntimeError("no 16-bit mono PCM sources to concatenate")
+    sample_rate = pcms[0][1]
+    pcms = [samples for samples, rate in pcms if rate == sample_rate]
+    path = Path(work_dir) / f"synthetic_{int(seconds)}s.wav"
+    total = int(seconds * sample_rate)
+    existing = read_pcm_wav(path) if path.exists() else None
+    if existing is not None and existing[1] == sample_rate and len(existing[0]) == total:
+        return str(path)
+
+    def chunks():
+        remaining = total
+        n = 0
+        while remaining > 0:
+            samples = pcms[n % len(pcms)][:remaining]
+            remaining -= len(samples)
+            n += 1
+            yield samples
+
+    return write_pcm_wav(path, chunks(), sample_rate)
+
+
+def speaker_turns(result, audio_seconds, turn_seconds=20.0):
+    """Speaker intervals from the transcription, or alternating fixed turns when it has no speakers."""
+    turns = []
+    for seg in result.get("segments") or []:
+        speaker = seg.get("speaker")
+        if not speaker:
+            continue
+        if turns and turns[-1]["speaker_id"] == speaker:
+            turns[-1]["end_time"] = seg["end"]
+        else:
+            turns.append({"speaker_id": speaker, "start_time": seg["start"], "end_time": seg["end"]})
+    if turns:
+        return turns
+    n_turns = max(1, int(audio_seconds // turn_seconds))
+    return [
+        {"speaker_id": f"speaker_{i % 2}", "start_time": i * turn_seconds, "end_time": min(audio_seconds, (i + 1) * turn_seconds)}
+        for i in range(n_turns)
+    ]
+
+
+def bench_file(source, work_dir, args):
+    steps = {}
+    run = {"file": Path(source).name, "steps": steps}
+
+    with Measure() as m:
+        path = ensure_audio(source, Path(work_dir) / "normalized")
+    steps["ensure_audio"] = m.result
+    pcm = read_pcm_wav(path)
+    audio_seconds = len(pcm[0]) / pcm[1] if pcm else None
+    run["audio_seconds"] = audio_seconds
+
+    with Measure() as m:
+        result = transcribe_audio(path, language=args.language)
+    steps["transcribe_audio"] = m.result
+    steps["transcribe_audio"]["segments"] = len(result.get("segments") or [])
+    audio_seconds = audio_seconds or result.get("duration")
+    run["audio_seconds"] = audio_seconds
+
+    turns = speaker_turns(result, audio_seconds or 0)
+    with tempfile.TemporaryDirectory() as pieces_dir:
+        with Measure() as m:
+            pieces = segment_audio_by_speakers(path, turns, pieces_dir)
+            cleanup_segments(pieces)
+        steps["segment_audio_by_speakers"] = dict(m.result, pieces=len(pieces))
+
+    try:
+        vosk = get_transcription_engine("vosk")
+    except RuntimeError as e:
+        steps["cluster_speakers"] = {"skipped": str(e)}
+    else:
+        # one x-vector per segment, at least one per few seconds so long files scale
+        n = max(len(result.get("segments") or []), int((audio_seconds or 0) / 3), 1)
+        embeddings, _labels = synthetic_xvectors(n)
+        with Measure() as m:
+            labels = vosk._cluster_speakers(embeddings, range(n), merge_threshold=args.merge_threshold)
+        steps["cluster_speakers"] = dict(m.result, embeddings=n, speakers=len(set(labels.values())))
+
+    with Measure() as m:
+        generate_docx(result, Path(work_dir) / "docs" / (Path(source).stem + ".docx"), {"title": Path(source).name})
+    steps["generate_docx"] = m.result
+
+    timed = [step for step in steps.values() if "wall_seconds" in step]
+    wall = sum(step["wall_seconds"] for step in timed)
+    cpu = sum(step["cpu_seconds"] for step in timed)
+    run["total"] = {
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "cpu_utilization": round(cpu / wall, 3) if wall > 0 else None,
+        "peak_rss_mb": max(step["peak_rss_mb"] for step in timed),
+        "rtf": round(audio_seconds / wall, 4) if audio_seconds and wall > 0 else None,
+    }
+    steps["transcribe_audio"]["rtf"] = (
+        round(audio_seconds / steps["transcribe_audio"]["wall_seconds"], 4)
+        if audio_seconds and steps["transcribe_audio"]["wall_seconds"] > 0 else None
+    )
+    return run
+
+
+def _run_key(run):
+    return (run["engine"], run["config"], run["file"])
+
+
+def compare(runs, baseline, threshold, min_seconds=0.5):
+    """Regressions of ``runs`` against ``baseline`` runs beyond the relative ``threshold``.
+
+    Steps shorter than ``min_seconds`` in both runs are timer noise and skipped.
+    """
+    previous = {_run_key(run): run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in runs:
+        old = previous.get(_run_key(run))
+        if old is None or "error" in run or "error" in old:
+            continue
+        pairs = [("total", run.get("total", {}), old.get("total", {}))]
+        pairs += [(name, step, old.get("steps", {}).get(name, {})) for name, step in run.get("steps", {}).items()]
+        for name, new_values, old_values in pairs:
+            if max(new_values.get("wall_seconds") or 0, old_values.get("wall_seconds") or 0) < min_seconds:
+                continue
+            for metric, direction in COMPARED.items():
+                new, before = new_values.get(metric), old_values.get(metric)
+                if not new or not before:
+                    continue
+                change = (new - before) / before
+                if change * direction > threshold:
+                    regressions.append({
+                        "engine": run["engine"],
+                        "config": run["config"],
+                        "file": run["file"],
+                        "step": name,
+                        "metric": metric,
+                        "baseline": before,
+                        "current": new,
+                        "change": round(change, 4),
+                    })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voices", default=TEST_DIR, help="directory of input recordings")
+    parser.add_argument("--engines", nargs="+", default=[os.environ.get("TRANSCRIPTION_ENGINE", "vosk")])
+    parser.add_argument("--config", action="append", default=[],
+                        help="KEY=VALUE[,KEY=VALUE] config overrides; repeat to benchmark several configs")
+    parser.add_argument("--long", type=float, nargs="*", default=[], metavar="SECONDS",
+                        help="also benchmark synthetic recordings of these lengths (e.g. 3600 10800)")
+    parser.add_argument("--language", default="es")
+    parser.add_argument("--merge-threshold", type=float, default=0.3)
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "voz-bench"))
+    parser.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="ignore steps faster than this in both runs")
+    args = parser.parse_args()
+
+    voices = sorted(p for p in Path(args.voices).iterdir() if p.is_file() and p.suffix.lower() in (".wav", ".mp3", ".m4a", ".ogg", ".flac"))
+    if not voices:
+        print("No recordings found in", args.voices, file=sys.stderr)
+        return 2
+    work_dir = Path(args.work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    runs = []
+    for engine in args.engines:
+        for config_text in args.config or [""]:
+            overrides = parse_config(config_text)
+            app = make_app(engine, overrides, work_dir)
+            with app.app_context():
+                files = [str(v) for v in voices]
+                if args.long:
+                    normalized = [ensure_audio(v, work_dir / "normalized") for v in files]
+                    files += [synthetic_long_audio(normalized, seconds, work_dir) for seconds in args.long]
+                for source in files:
+                    print(f"{engine} [{config_text or 'default'}] {Path(source).name}", file=sys.stderr)
+                    try:
+                        run = bench_file(source, work_dir, args)
+                    except Exception as e:
+                        run = {"file": Path(source).name, "error": f"{type(e).__name__}: {e}"}
+                    run.update(engine=engine, config=config_text)
+                    runs.append(run)
+                    total = run.get("total")
+                    if total:
+                        print(f"  {total['wall_seconds']:.2f}s rtf={total['rtf']} cpu={total['cpu_utilization']} "
+                              f"rss={total['peak_rss_mb']}MB", file=sys.stderr)
+                    else:
+                        print("  " + run["error"], file=sys.stderr)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "runs": runs,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline"] = args.baseline
+        report["threshold"] = args.threshold
+        report["regressions"] = compare(runs, baseline, args.threshold, args.min_seconds)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['engine']} [{r['config'] or 'default'}] {r['file']} {r['step']}.{r['metric']}: "
+                  f"{r['baseline']} -> {r['current']} ({r['change']:+.1%})", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of OnlineSpeakerClusterer on synthetic 128-d x-vectors.
+
+Embeddings are drawn around a few random speaker directions, like the
+output of vosk-model-spk. The previous list-of-members implementation is
+timed alongside for comparison up to --legacy-max segments, since it is
+quadratic in the number of members.
+
+    python -m backend.scripts.bench_speaker_clustering --sizes 1000 10000 100000
+"""
+import argparse
+import time
+import numpy as np
+from scipy.spatial.distance import cosine
+from backend.services.speaker_clustering import OnlineSpeakerClusterer
+
+
+def synthetic_xvectors(n, speakers=6, dim=128, noise=0.35, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(speakers, dim))
+    labels = rng.integers(0, speakers, size=n)
+    return centers[labels] + noise * np.linalg.norm(centers, axis=1).mean() / np.sqrt(dim) * rng.normal(size=(n, dim)), labels
+
+
+def legacy_cluster(embeddings, threshold=0.7):
+    # the pre-vectorized implementation: re-average every member list per embedding
+    speakers = []
+    labels = []
+    for embedding in embeddings:
+        min_distance = float('inf')
+        best_speaker = -1
+        for j, speaker_embeddings in enumerate(speakers):
+            distance = cosine(embedding, np.mean(speaker_embeddings, axis=0))
+            if distance < min_distance:
+                min_distance = distance
+                best_speaker = j
+        if min_distance < threshold:
+            speakers[best_speaker].append(embedding)
+            labels.append(best_speaker)
+        else:
+            speakers.append([embedding])
+            labels.append(len(speakers) - 1)
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--speakers", type=int, default=6)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--merge-threshold", type=float, default=0.3)
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'segments':>9} {'online s':>9} {'merge s':>8} {'speakers':>9} {'merged':>7} {'legacy s':>9}")
+    for n in args.sizes:
+        embeddings, _labels = synthetic_xvectors(n, speakers=args.speakers)
+        clusterer = OnlineSpeakerClusterer(threshold=args.threshold)
+        start = time.perf_counter()
+        for embedding in embeddings:
+            clusterer.add(embedding)
+        online = time.perf_counter() - start
+        start = time.perf_counter()
+        mapping = clusterer.merge(args.merge_threshold)
+        merge = time.perf_counter() - start
+        legacy = "-"
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            legacy_cluster(embeddings, args.threshold)
+            legacy = f"{time.perf_counter() - start:.3f}"
+        print(f"{n:>9} {online:>9.3f} {merge:>8.4f} {clusterer.size:>9} {len(set(mapping.values())):>7} {legacy:>9}")
+
+
+if __name__ == "__main__":
+    main()
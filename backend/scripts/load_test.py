@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""Concurrent load test of the HTTP API.
+
+Replays a weighted mix of uploads, sync and async transcriptions, list and
+get calls and docx generation, either with ``--concurrency`` closed-loop
+clients or at a fixed ``--rate`` of requests per second (open loop; latency
+is measured from the scheduled start, so a saturated server shows up as
+queueing instead of a lower request rate). Reports count, error rate,
+throughput and p50/p95/p99 latency per endpoint.
+
+``--start`` launches the app (and ``--workers`` queue workers) on a fresh
+SQLite database with the model-free ``synthetic`` engine and the result
+cache off, so the numbers are API, storage and database overhead only;
+``--engine-rtf``/``--engine-latency`` make the engine take realistic time.
+Without it, ``--base-url`` points at a running server.
+
+    python -m backend.scripts.load_test --start --concurrency 50 --duration 60
+    python -m backend.scripts.load_test --start --workers 2 --rate 20 --mix upload=1,async=3,get=6
+    python -m backend.scripts.load_test --base-url http://localhost:5702/api --requests 500 -o load.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import requests
+
+API_BASE = os.environ.get('API_BASE', 'http://localhost:5702/api')
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+DEFAULT_MIX = "upload=2,sync=1,async=2,list=3,get=4,docx=1"
+
+
+def make_wav(path, seconds, sample_rate=16000):
+    """Tone bursts separated by pauses, already 16 kHz mono PCM so no conversion is needed."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = (np.floor(t / 1.5) % 2 == 0).astype(np.float32)
+    samples = (0.3 * envelope * np.sin(2 * np.pi * 220 * t) * 32767).astype('<i2')
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(samples.tobytes())
+    return str(path)
+
+
+def parse_mix(text):
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"unknown operation in --mix: {name} (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # nearest rank
+    rank = max(1, int(np.ceil(q / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, seconds, status):
+        ok = isinstance(status, int) and status < 400
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][str(status)] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self, elapsed):
+        with self._lock:
+            endpoints = sorted(self.latencies)
+            rows = {}
+            everything = []
+            for endpoint in endpoints:
+                values = sorted(self.latencies[endpoint])
+                everything.extend(values)
+                rows[endpoint] = self._row(values, self.errors[endpoint], elapsed, dict(self.statuses[endpoint]))
+            rows["all"] = self._row(sorted(everything), sum(self.errors.values()), elapsed, None)
+        return rows
+
+    @staticmethod
+    def _row(values, errors, elapsed, statuses):
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        row = {
+            "count": len(values),
+            "errors": errors,
+            "error_rate": round(errors / len(values), 4) if values else 0.0,
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1] if values else None),
+        }
+        if statuses is not None:
+            row["statuses"] = statuses
+        return row
+
+
+class LoadClient:
+    """Issues the operations; ids created along the way feed later get/docx/transcription calls."""
+
+    def __init__(self, base_url, audio_path, stats, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.audio = Path(audio_path).read_bytes()
+        self.filename = Path(audio_path).name
+        self.stats = stats
+        self.timeout = timeout
+        self.uploads = []
+        self.transcriptions = []
+        self._ids_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _pick(self, ids):
+        with self._ids_lock:
+            return random.choice(ids) if ids else None
+
+    def _remember(self, ids, value):
+        if value:
+            with self._ids_lock:
+                ids.append(value)
+
+    def call(self, endpoint, method, path, started=None, record=True, **kwargs):
+        started = started if started is not None else time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status = resp.status_code
+        except requests.RequestException as e:
+            resp, status = None, type(e).__name__
+        if record:
+            self.stats.record(endpoint, time.perf_counter() - started, status)
+        return resp if resp is not None and resp.ok else None
+
+    def upload(self, started=None, record=True):
+        resp = self.call("POST /uploads", "POST", "/uploads", started, record,
+                         files={"file": (self.filename, self.audio, "audio/wav")})
+        upload_id = resp.json().get("id") if resp is not None else None
+        self._remember(self.uploads, upload_id)
+        return upload_id
+
+    def sync(self, started=None, record=True):
+        upload_id = self._pick(self.uploads)
+        resp = self.call("POST /transcriptions", "POST", "/transcriptions", started, record, json={"upload_id": upload_id})
+        tid = resp.json().get("id") if resp is not None else None
+        self._remember(self.transcriptions, tid)
+        return tid
+
+    def async_(self, started=None, record=True):
+        upload_id = self._pick(self.uploads)
+        resp = self.call("POST /transcriptions/async", "POST", "/transcriptions/async", started, record,
+                         json={"upload_id": upload_id})
+        self._remember(self.transcriptions, resp.json().get("task_id") if resp is not None else None)
+
+    def list(self, started=None, record=True):
+        self.call("GET /transcriptions", "GET", "/transcriptions", started, record, params={"limit": 20})
+
+    def get(self, started=None, record=True):
+        tid = self._pick(self.transcriptions)
+        self.call("GET /transcriptions/<id>", "GET", f"/transcriptions/{tid}", started, record)
+
+    def docx(self, started=None, record=True):
+        tid = self._pick(self.transcriptions)
+        self.call("POST /transcriptions/<id>/docx", "POST", f"/transcriptions/{tid}/docx", started, record, json={})
+
+
+OPERATIONS = {
+    "upload": LoadClient.upload,
+    "sync": LoadClient.sync,
+    "async": LoadClient.async_,
+    "list": LoadClient.list,
+    "get": LoadClient.get,
+    "docx": LoadClient.docx,
+}
+
+
+def run_closed_loop(client, mix, concurrency, deadline, budget):
+    names, weights = list(mix), list(mix.values())
+
+    def loop():
+        while time.monotonic() < deadline and budget.take():
+            OPERATIONS[random.choices(names, weights)[0]](client)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(client, mix, rate, deadline, budget, max_inflight):
+    names, weights = list(mix), list(mix.values())
+    interval = 1.0 / rate
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        next_at = time.perf_counter()
+        while time.monotonic() < deadline and budget.take():
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(OPERATIONS[random.choices(names, weights)[0]], client, next_at)
+            next_at += interval
+
+
+class Budget:
+    """Optional cap on the total number of requests shared by all clients."""
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def start_local(port, work_dir, workers, engine_rtf=0.0, engine_latency=0.0):
+    """Start the app and ``workers`` queue workers with the synthetic engine on a fresh database."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        DATABASE_URL="sqlite:///" + str(Path(work_dir, "load.db").resolve()),
+        UPLOAD_FOLDER=str(Path(work_dir, "uploads")),
+        DOCX_STORAGE_PATH=str(Path(work_dir, "docs")),
+        TRANSCRIPTION_ENGINE="synthetic",
+        SYNTHETIC_RTF=str(engine_rtf),
+        SYNTHETIC_LATENCY_SECONDS=str(engine_latency),
+        RESULT_CACHE_ENABLED="false",
+        MODEL_WARMUP="false",
+        LIVE_TRANSCRIPTION="false",
+        WORKER_POLL_INTERVAL="0.2",
+    )
+    log = open(Path(work_dir, "server.log"), "ab")
+    procs = [subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "backend:create_app", "run", "--port", str(port), "--with-threads"],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )]
+    base_url = f"http://127.0.0.1:{port}/api"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            if requests.get(base_url + "/transcriptions", params={"limit": 1}, timeout=2).ok:
+                break
+        except requests.RequestException:
+            pass
+        if procs[0].poll() is not None or time.monotonic() > deadline:
+            stop_local(procs)
+            raise SystemExit(f"app did not start; see {Path(work_dir, 'server.log')}")
+        time.sleep(0.2)
+    # workers start after the app so the tables already exist
+    for _ in range(workers):
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "backend.worker"],
+            cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+        ))
+    return base_url, procs
+
+
+def stop_local(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def print_report(rows):
+    print(f"{'endpoint':<32} {'count':>7} {'err%':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, row in rows.items():
+        print(f"{endpoint:<32} {row['count']:>7} {row['error_rate'] * 100:>6.1f} {row['throughput_rps'] or 0:>8.2f} "
+              f"{row['p50_ms'] or 0:>8.1f} {row['p95_ms'] or 0:>8.1f} {row['p99_ms'] or 0:>8.1f} {row['max_ms'] or 0:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=API_BASE)
+    parser.add_argument("--start", action="store_true", help="start a local app with the synthetic engine")
+    parser.add_argument("--port", type=int, default=5799, help="port for --start")
+    parser.add_argument("--workers", type=int, default=0, help="queue workers started with --start")
+    parser.add_argument("--engine-rtf", type=float, default=0.0, help="synthetic engine speed in audio seconds per second (0 = instant)")
+    parser.add_argument("--engine-latency", type=float, default=0.0, help="synthetic engine fixed delay per transcription")
+    parser.add_argument("--work-dir", default=None, help="database/uploads for --start (default: a temp dir)")
+    parser.add_argument("--file", default=None, help="audio to upload (default: generated 16 kHz WAV)")
+    parser.add_argument("--audio-seconds", type=float, default=30.0, help="length of the generated WAV")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--concurrency", type=int, default=None, help="closed-loop clients")
+    group.add_argument("--rate", type=float, default=None, help="target requests per second (open loop)")
+    parser.add_argument("--max-inflight", type=int, default=200, help="open-loop request threads")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--seed-uploads", type=int, default=5, help="uploads and sync transcriptions made before measuring")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-error-rate", type=float, default=None, help="exit with status 1 above this error rate")
+    parser.add_argument("-o", "--output", help="write the report JSON here")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    temp = None
+    work_dir = args.work_dir
+    if work_dir is None:
+        temp = tempfile.TemporaryDirectory(prefix="voz-load-")
+        work_dir = temp.name
+    Path(work_dir).mkdir(parents=True, exist_ok=True)
+    procs = []
+    base_url = args.base_url
+    try:
+        if args.start:
+            base_url, procs = start_local(args.port, work_dir, args.workers, args.engine_rtf, args.engine_latency)
+        audio = args.file or make_wav(Path(work_dir, "load.wav"), args.audio_seconds)
+        stats = Stats()
+        client = LoadClient(base_url, audio, stats, args.timeout)
+        for _ in range(args.seed_uploads):
+            client.upload(record=False)
+            client.sync(record=False)
+        if not client.uploads:
+            raise SystemExit(f"seeding failed: could not upload to {base_url}")
+
+        deadline = time.monotonic() + args.duration
+        budget = Budget(args.requests)
+        started = time.perf_counter()
+        if args.rate:
+            run_open_loop(client, mix, args.rate, deadline, budget, args.max_inflight)
+        else:
+            run_closed_loop(client, mix, args.concurrency or 10, deadline, budget)
+        elapsed = time.perf_counter() - started
+    finally:
+        stop_local(procs)
+        if temp is not None:
+            temp.cleanup()
+
+    rows = stats.report(elapsed)
+    print_report(rows)
+    if args.output:
+        report = {
+            "base_url": base_url,
+            "mode": {"rate": args.rate} if args.rate else {"concurrency": args.concurrency or 10},
+            "mix": mix,
+            "elapsed_seconds": round(elapsed, 3),
+            "endpoints": rows,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.max_error_rate is not None and rows["all"]["error_rate"] > args.max_error_rate:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,13 @@
 import os
+import struct
 import subprocess
 from pathlib import Path
+import numpy as np
 from flask import current_app
+from .job_control import checkpoint
+
+# smallest slice worth transcribing (the ffmpeg path dropped files under 1000 bytes)
+MIN_SEGMENT_SAMPLES = 500
 
 def get_ffmpeg_path():
     ffmpeg_path = current_app.config.get('FFMPEG_PATH')
@@ -9,14 +15,57 @@ def get_ffmpeg_path():
         return os.path.join(ffmpeg_path, 'ffmpeg.exe')
     return 'ffmpeg'
 
-def segment_audio_by_speakers(audio_path, speaker_segments, output_dir):
-    segments_info = []
-    audio_path = Path(audio_path)
-    output_dir = Path(output_dir)
-    output_dir.mkdir(exist_ok=True)
-    
-    ffmpeg_cmd = get_ffmpeg_path()
-    
+def read_pcm_wav(audio_path):
+    """Memory-map the samples of a 16-bit mono PCM WAV file.
+
+    Returns ``(samples, sample_rate)`` where ``samples`` is a read-only int16
+    ``np.memmap``, or ``None`` when the file is not 16-bit mono PCM.
+    """
+    try:
+        with open(audio_path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                return None
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+                if chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size)
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    data_offset = f.tell()
+                    break
+                else:
+                    f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    except OSError:
+        return None
+
+    if not fmt or len(fmt) < 16:
+        return None
+    audio_format, channels, sample_rate, _byte_rate, _block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if audio_format == 0xFFFE and len(fmt) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE: the real format is the first field of the subformat GUID
+        audio_format = struct.unpack('<H', fmt[24:26])[0]
+    if audio_format != 1 or channels != 1 or bits != 16:
+        return None
+
+    # ffmpeg leaves a placeholder size when it cannot seek back; trust the file size
+    available = os.path.getsize(audio_path) - data_offset
+    data_size = chunk_size if 0 < chunk_size <= available else available
+    n_samples = data_size // 2
+    if n_samples <= 0:
+        return np.zeros(0, dtype='<i2'), sample_rate
+    samples = np.memmap(audio_path, dtype='<i2', mode='r', offset=data_offset, shape=(n_samples,))
+    return samples, sample_rate
+
+
+def normalize_speaker_segments(speaker_segments):
+    """Fill in missing ids/end times and drop empty intervals from client speaker segments."""
+    normalized = []
     for i, segment in enumerate(speaker_segments):
         speaker_id = segment.get('speaker_id', f'speaker_{i+1}')
         start_time = segment.get('start_time', 0)
@@ -31,15 +80,71 @@ def segment_audio_by_speakers(audio_path, speaker_segments, output_dir):
         duration = end_time - start_time
         if duration <= 0.1:
             continue
+        normalized.append({
+            'speaker_id': speaker_id,
+            'segment_index': i + 1,
+            'start_time': start_time,
+            'end_time': end_time,
+            'duration': duration,
+            'original_segment': segment
+        })
+    return normalized
+
+
+def segment_audio_by_speakers(audio_path, speaker_segments, output_dir=None, sample_rate=16000):
+    """Cut ``audio_path`` into one piece per speaker segment.
+
+    16-bit mono PCM WAV input (what ``ensure_audio`` produces) is read once
+    through a memory map and every piece is returned as a view of it under
+    ``'audio'`` together with its ``'sample_rate'``; nothing is written to
+    disk. Other inputs (or PCM at a different rate) fall back to ffmpeg,
+    writing one WAV per piece into ``output_dir`` and returning it under
+    ``'audio_path'``.
+    """
+    segments = normalize_speaker_segments(speaker_segments)
+    pcm = read_pcm_wav(audio_path)
+    if pcm is None or pcm[1] != sample_rate:
+        return _segment_with_ffmpeg(audio_path, segments, output_dir)
+    
+    samples = pcm[0]
+    segments_info = []
+    for segment in segments:
+        first = max(0, int(round(segment['start_time'] * sample_rate)))
+        last = min(len(samples), int(round(segment['end_time'] * sample_rate)))
+        if last - first < MIN_SEGMENT_SAMPLES:
+            print(f"Segment too small or empty for {segment['speaker_id']}: {segment['duration']}s")
+            continue
+        segments_info.append(dict(segment, audio=samples[first:last], sample_rate=sample_rate))
+    return segments_info
+
+
+def _segment_with_ffmpeg(audio_path, segments, output_dir):
+    segments_info = []
+    audio_path = Path(audio_path)
+    if output_dir is None:
+        raise ValueError("output_dir is required to segment non-PCM audio")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    
+    ffmpeg_cmd = get_ffmpeg_path()
+    
+    for segment in segments:
+        # one ffmpeg run per piece; a cancelled job stops cutting here
+        checkpoint()
+        speaker_id = segment['speaker_id']
+        start_time = segment['start_time']
+        end_time = segment['end_time']
+        duration = segment['duration']
             
-        output_filename = f"{speaker_id}_segment_{i+1}_{start_time:.1f}s-{end_time:.1f}s.wav"
+        output_filename = f"{speaker_id}_segment_{segment['segment_index']}_{start_time:.1f}s-{end_time:.1f}s.wav"
         output_path = output_dir / output_filename
         
         try:
+            # -ss before -i seeks in the input instead of decoding up to the start
             cmd = [
                 ffmpeg_cmd, '-y',
-                '-i', str(audio_path),
                 '-ss', str(start_time),
+                '-i', str(audio_path),
                 '-t', str(duration),
                 '-acodec', 'pcm_s16le',
                 '-ar', '16000',
@@ -51,15 +156,7 @@ def segment_audio_by_speakers(audio_path, speaker_segments, output_dir):
             result = subprocess.run(cmd, capture_output=True, text=True, check=True)
             
             if output_path.exists() and output_path.stat().st_size > 1000:
-                segments_info.append({
-                    'speaker_id': speaker_id,
-                    'segment_index': i + 1,
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'duration': duration,
-                    'audio_path': str(output_path),
-                    'original_segment': segment
-                })
+                segments_info.append(dict(segment, audio_path=str(output_path)))
             else:
                 print(f"Segment too small or empty for {speaker_id}: {duration}s")
             
@@ -74,7 +171,9 @@ def segment_audio_by_speakers(audio_path, speaker_segments, output_dir):
 
 def cleanup_segments(segments_info):
     for segment in segments_info:
+        if 'audio_path' not in segment:
+            continue
         try:
             os.remove(segment['audio_path'])
-        except (OSError, KeyError):
+        except OSError:
             pass
\ No newline at end of file
@@ -0,0 +1,168 @@
+import mimetypes
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+from flask import url_for
+from sqlalchemy import select, func, case
+from werkzeug.utils import secure_filename
+from backend import db
+from backend.models import Batch, Transcription, Upload
+from .storage import store_stream
+
+# archive members with other extensions (readmes, sidecar files) are skipped
+MEDIA_EXTENSIONS = (
+    ".wav", ".mp3", ".m4a", ".aac", ".flac", ".ogg", ".oga", ".opus", ".wma", ".amr",
+    ".mp4", ".mkv", ".mov", ".webm", ".avi",
+)
+
+
+def _media_name(name):
+    path = PurePosixPath(name.replace("\\", "/"))
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return None
+    if path.suffix.lower() not in MEDIA_EXTENSIONS:
+        return None
+    return secure_filename(path.name) or None
+
+
+def _archive_members(fileobj):
+    """Yield ``(filename, stream)`` for the media files of a zip or tar archive."""
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                name = None if info.is_dir() else _media_name(info.filename)
+                if name:
+                    with archive.open(info) as stream:
+                        yield name, stream
+        return
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.TarError:
+        raise ValueError("expected a zip or tar archive")
+    with archive:
+        for member in archive:
+            name = _media_name(member.name) if member.isfile() else None
+            if name:
+                yield name, archive.extractfile(member)
+
+
+def store_archive(fileobj, folder, chunk_size, max_files):
+    """Store every media file of the archive; returns ``[(filename, path, size, sha256), ...]``.
+
+    Members are streamed straight into content-addressed storage, never
+    unpacked under their archive paths.
+    """
+    stored = []
+    for name, stream in _archive_members(fileobj):
+        if len(stored) >= max_files:
+            raise ValueError(f"archive has more than {max_files} media files")
+        path, size, sha256 = store_stream(stream, folder, chunk_size)
+        stored.append((name, path, size, sha256))
+    if not stored:
+        raise ValueError("archive contains no media files")
+    return stored
+
+
+def guess_content_type(filename):
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def create_batch(uploads, name=None, source="uploads", priority=0, tenant=None):
+    """Queue one transcription per upload in a single transaction; the caller commits.
+
+    ``uploads`` may include new (pending) Upload rows, which are added too.
+    """
+    batch = Batch(name=name, source=source, total=len(uploads))
+    db.session.add(batch)
+    db.session.add_all(uploads)
+    # one flush assigns every id; the rows below are then inserted together
+    db.session.flush()
+    transcriptions = [
+        Transcription(upload_id=upload.id, batch_id=batch.id, filename=upload.filename, content_type=upload.content_type, speaker_segments=[], priority=priority, tenant=tenant, status="queued")
+        for upload in uploads
+    ]
+    db.session.add_all(transcriptions)
+    db.session.flush()
+    return batch, transcriptions
+
+
+def batch_progress(batch):
+    """Aggregate counts, audio seconds and RTF of the batch's transcriptions."""
+    completed = Transcription.status == "completed"
+    timed = completed & (Transcription.rtf > 0)
+    row = db.session.execute(
+        select(
+            func.count(),
+            func.sum(case((completed, 1), else_=0)),
+            func.sum(case((Transcription.status == "failed", 1), else_=0)),
+            func.sum(case((Transcription.status == "processing", 1), else_=0)),
+            func.sum(case((Transcription.status == "cancelled", 1), else_=0)),
+            func.sum(case((completed, Transcription.duration_seconds), else_=0.0)),
+            func.sum(case((timed, Transcription.duration_seconds / Transcription.rtf), else_=0.0)),
+            func.max(Transcription.updated_at),
+        ).where(Transcription.batch_id == batch.id)
+    ).one()
+    total, done, failed, processing, cancelled, audio_seconds, processing_seconds, last_update = row
+    done, failed, processing, cancelled = int(done or 0), int(failed or 0), int(processing or 0), int(cancelled or 0)
+    finished = done + failed + cancelled
+    status = "completed" if finished >= total else ("processing" if finished or processing else "queued")
+    elapsed = None
+    if batch.created_at is not None and last_update is not None and finished:
+        elapsed = round(max(0.0, (last_update - batch.created_at).total_seconds()), 3)
+    return {
+        "id": batch.id,
+        "name": batch.name,
+        "status": status,
+        "total": total,
+        "done": done,
+        "failed": failed,
+        "cancelled": cancelled,
+        "processing": processing,
+        "queued": total - finished - processing,
+        "progress": round(finished / total, 4) if total else 1.0,
+        "audio_seconds": round(float(audio_seconds or 0.0), 3),
+        # audio seconds per second of engine time, summed over finished jobs
+        "rtf": round(float(audio_seconds or 0.0) / processing_seconds, 3) if processing_seconds else None,
+        "elapsed_seconds": elapsed,
+        "created_at": batch.created_at.isoformat() if batch.created_at else None,
+    }
+
+
+def iter_manifest(batch, batch_size=500):
+    """Manifest entries of the batch in a stable order, read ``batch_size`` rows at a time."""
+    columns = (
+        Transcription.id, Transcription.upload_id, Transcription.filename, Transcription.status,
+        Transcription.error, Transcription.duration_seconds, Transcription.rtf, Transcription.created_at,
+        Upload.content_sha256,
+    )
+    offset = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns)
+            .outerjoin(Upload, Upload.id == Transcription.upload_id)
+            .where(Transcription.batch_id == batch.id)
+            .order_by(Transcription.created_at, Transcription.id)
+            .limit(batch_size).offset(offset)
+        ).all()
+        for row in rows:
+            entry = {
+                "transcription_id": row.id,
+                "upload_id": row.upload_id,
+                "filename": row.filename,
+                "sha256": row.content_sha256,
+                "status": row.status,
+                "error": row.error,
+                "duration_seconds": row.duration_seconds,
+                "rtf": row.rtf,
+            }
+            if row.status == "completed":
+                entry["exports"] = {
+                    fmt: url_for("transcriptions.export_transcription", tid=row.id, fmt=fmt)
+                    for fmt in ("txt", "srt", "json")
+                }
+            yield entry
+        if len(rows) < batch_size:
+            return
+        offset += batch_size
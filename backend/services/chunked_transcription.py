@@ -0,0 +1,343 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from flask import Flask, current_app
+from .audio_segmenter import read_pcm_wav
+from .speaker_clustering import OnlineSpeakerClusterer, relabel_segments
+from .metrics import stage
+from .job_control import checkpoint
+
+# energy VAD frame length and the shortest pause a cut may be placed in
+FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = 0.3
+
+
+def frame_energy(samples, sample_rate, block_frames=100000):
+    """RMS level in dBFS of consecutive ``FRAME_SECONDS`` frames, computed block-wise over a memmap."""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    n_frames = len(samples) // frame
+    levels = np.empty(n_frames, dtype=np.float32)
+    for first in range(0, n_frames, block_frames):
+        last = min(n_frames, first + block_frames)
+        block = np.asarray(samples[first * frame:last * frame], dtype=np.float32).reshape(-1, frame)
+        rms = np.sqrt(np.mean(block * block, axis=1)) / 32768.0
+        levels[first:last] = 20.0 * np.log10(np.maximum(rms, 1e-6))
+    return levels, frame
+
+
+def silence_runs(levels, frame_seconds=FRAME_SECONDS, min_silence=MIN_SILENCE_SECONDS):
+    """``(start_frame, end_frame)`` of pauses at least ``min_silence`` long.
+
+    The threshold adapts to the recording: 10 dB above its quietest decile,
+    which separates pauses from speech in room and phone recordings alike.
+    """
+    if not len(levels):
+        return []
+    threshold = max(float(np.percentile(levels, 10)) + 10.0, -70.0)
+    quiet = np.concatenate(([False], levels < threshold, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * frame_seconds >= min_silence
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+def plan_windows(samples, sample_rate, chunk_seconds, overlap_seconds):
+    """Cut points near every ``chunk_seconds`` placed in pauses, as overlapping windows.
+
+    Returns ``(start, end, core_start, core_end)`` sample offsets. Windows
+    cover ``[core_start - overlap, core_end + overlap]``; each core belongs
+    to exactly one window and the cores tile the file. When no pause lies
+    within a quarter chunk of a target, the quietest frame there is used.
+    """
+    total = len(samples)
+    chunk = int(chunk_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    if total <= chunk:
+        return [(0, total, 0, total)]
+    levels, frame = frame_energy(samples, sample_rate)
+    pauses = silence_runs(levels)
+    mids = np.array([(a + b) // 2 for a, b in pauses], dtype=np.int64)
+    reach = max(1, chunk // (4 * frame))
+
+    cuts = [0]
+    target = chunk
+    while total - cuts[-1] > chunk + chunk // 4:
+        t = target // frame
+        lo, hi = max(cuts[-1] // frame + 1, t - reach), min(len(levels), t + reach)
+        cut = None
+        if len(mids):
+            near = mids[(mids >= lo) & (mids < hi)]
+            if len(near):
+                cut = int(near[np.argmin(np.abs(near - t))])
+        if cut is None:
+            cut = lo + int(np.argmin(levels[lo:hi])) if hi > lo else t
+        cuts.append(cut * frame)
+        target = cuts[-1] + chunk
+    cuts.append(total)
+    return [
+        (max(0, a - overlap), min(total, b + overlap), a, b)
+        for a, b in zip(cuts[:-1], cuts[1:])
+    ]
+
+
+def _keep_core(segments, core_start, core_end):
+    """Segments and words of one window whose midpoint lies in its core; overlaps are decoded twice."""
+    kept = []
+    for seg in segments:
+        if seg["start"] >= core_start and seg["end"] <= core_end:
+            kept.append(seg)
+            continue
+        words = seg.get("words")
+        if not words:
+            if core_start <= (seg["start"] + seg["end"]) / 2 < core_end:
+                kept.append(seg)
+            continue
+        inside = [w for w in words if core_start <= (w["start"] + w["end"]) / 2 < core_end]
+        if not inside:
+            continue
+        if len(inside) == len(words):
+            kept.append(seg)
+            continue
+        # a segment running across the cut keeps only this window's words
+        kept.append(dict(
+            seg,
+            start=inside[0]["start"],
+            end=inside[-1]["end"],
+            text=" ".join(w["word"] for w in inside if w["word"]),
+            words=inside
+        ))
+    return kept
+
+
+def _shift(seg, offset):
+    seg = dict(seg, start=round(seg["start"] + offset, 2), end=round(seg["end"] + offset, 2))
+    if seg.get("words"):
+        seg["words"] = [
+            dict(w, start=round(w["start"] + offset, 2), end=round(w["end"] + offset, 2))
+            for w in seg["words"]
+        ]
+    return seg
+
+
+_worker_app = None
+
+
+def _init_worker(config):
+    # one Flask app context per pool process, so engines read config as usual
+    global _worker_app
+    _worker_app = Flask(__name__)
+    _worker_app.config.update(config)
+    _worker_app.app_context().push()
+
+
+def _transcribe_window(audio_path, start, end, options):
+    from .transcription_engine import get_transcription_engine
+    samples, sample_rate = read_pcm_wav(audio_path)
+    engine = get_transcription_engine()
+    result = engine.transcribe(np.array(samples[start:end]), sample_rate=sample_rate, **options)
+    offset = start / sample_rate
+    return [_shift(seg, offset) for seg in result.get("segments") or []]
+
+
+def _picklable_config(config):
+    simple = (str, int, float, bool, type(None), list, tuple, dict)
+    return {k: v for k, v in config.items() if k.isupper() and isinstance(v, simple)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers, threads):
+    """Process pool for the current app config; kept alive so workers reuse their loaded models."""
+    config = _picklable_config(current_app.config)
+    config["WHISPER_CPU_THREADS"] = threads
+    config["PARALLEL_WORKERS"] = 0
+    key = (workers, threads, repr(sorted(config.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            # spawn: forking a process that holds CTranslate2/Kaldi threads is unsafe
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(config,)
+            )
+            _pools[key] = pool
+    return pool
+
+
+def chunking_applies(engine, audio):
+    """Whether ``transcribe_chunked`` should handle this call under the current config."""
+    config = current_app.config
+    if config.get("PARALLEL_WORKERS", 0) <= 0 or not engine.supports_chunking:
+        return False
+    if not isinstance(audio, (str, bytes)) and not hasattr(audio, "__fspath__"):
+        return False
+    pcm = read_pcm_wav(audio)
+    if pcm is None:
+        return False
+    samples, sample_rate = pcm
+    return len(samples) / sample_rate >= config.get("CHUNK_MIN_AUDIO_SECONDS", 300)
+
+
+def transcribe_chunked(engine, audio_path, **kwargs):
+    """Transcribe a normalized WAV as overlapping windows in a process pool.
+
+    Windows are cut at pauses (``plan_windows``), decoded in parallel and
+    stitched by keeping, from each window, the words whose midpoint lies in
+    its core. Segments are passed to ``on_segment`` in file order as soon as
+    every earlier window is done. Vosk speaker labels are assigned here over
+    the whole file from the per-segment x-vectors, as each window's own
+    clustering only sees that window. The result has the same keys as
+    ``engine.transcribe``.
+    """
+    config = current_app.config
+    samples, sample_rate = read_pcm_wav(audio_path)
+    with stage("vad"):
+        windows = plan_windows(
+            samples,
+            sample_rate,
+            config.get("CHUNK_SECONDS", 120),
+            config.get("CHUNK_OVERLAP_SECONDS", 2.0)
+        )
+    stitcher = _Stitcher(kwargs.pop("on_segment", None), kwargs.get("with_words", False))
+    options = dict(kwargs, with_words=True, speaker_embeddings=True)
+    pool = get_pool(config.get("PARALLEL_WORKERS", 1), config.get("PARALLEL_THREADS_PER_WORKER", 2))
+
+    futures = {
+        pool.submit(_transcribe_window, str(audio_path), start, end, options): n
+        for n, (start, end, _core_start, _core_end) in enumerate(windows)
+    }
+    done = {}
+    emitted = 0
+    pending = set(futures)
+    processed = 0.0
+    try:
+        while pending:
+            # windows decode in other processes: wake up now and then to report
+            # progress and to notice a cancel; pending windows are dropped then
+            finished, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            checkpoint(processed)
+            for future in finished:
+                done[futures[future]] = future.result()
+            while emitted in done:
+                _start, _end, core_start, core_end = windows[emitted]
+                stitcher.add(done.pop(emitted), core_start / sample_rate, core_end / sample_rate)
+                processed = core_end / sample_rate
+                emitted += 1
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        raise
+
+    return stitcher.result(engine, len(samples) / sample_rate)
+
+
+def stream_windows(blocks, sample_rate, chunk_seconds, overlap_seconds):
+    """``plan_windows`` over 16-bit PCM ``bytes`` blocks as they arrive.
+
+    Yields ``(samples, start, core_start, core_end)``: a window's int16
+    samples and the stream offsets of its start and core. Each cut is placed
+    as ``plan_windows`` places it, from the audio up to a quarter chunk past
+    the target, so only about one window plus the overlaps is held at a time.
+    """
+    chunk = int(chunk_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    horizon = chunk + chunk // 4
+    buffered = np.zeros(0, dtype="<i2")
+    base = 0
+    core_start = 0
+    pending, pending_samples = [], 0
+
+    def take_pending():
+        return np.concatenate([buffered] + [np.frombuffer(b, dtype="<i2") for b in pending])
+
+    for block in blocks:
+        pending.append(block)
+        pending_samples += len(block) // 2
+        if base + len(buffered) + pending_samples - core_start <= horizon + overlap:
+            continue
+        # joined once per window rather than once per block
+        buffered = take_pending()
+        pending, pending_samples = [], 0
+        while base + len(buffered) - core_start > horizon + overlap:
+            rel = core_start - base
+            _start, _end, _core_start, cut = plan_windows(buffered[rel:rel + horizon + 1], sample_rate, chunk_seconds, 0)[0]
+            core_end = core_start + cut
+            start = max(0, core_start - overlap)
+            yield buffered[start - base:core_end + overlap - base], start, core_start, core_end
+            core_start = core_end
+            keep = max(0, core_start - overlap) - base
+            buffered = buffered[keep:]
+            base += keep
+    buffered = take_pending()
+    total = base + len(buffered)
+    if total > core_start:
+        start = max(0, core_start - overlap)
+        yield buffered[start - base:], start, core_start, total
+
+
+def transcribe_stream_windows(engine, blocks, sample_rate=16000, **kwargs):
+    """Transcribe PCM blocks window by window as they arrive, in this process.
+
+    The sequential counterpart of ``transcribe_chunked`` for audio that is
+    never written to disk: windows come from ``stream_windows`` and are
+    stitched the same way. Progress is reported after every window.
+    """
+    config = current_app.config
+    stitcher = _Stitcher(kwargs.pop("on_segment", None), kwargs.get("with_words", False))
+    options = dict(kwargs, with_words=True, speaker_embeddings=True, sample_rate=sample_rate)
+    total = 0
+    windows = stream_windows(
+        blocks,
+        sample_rate,
+        config.get("CHUNK_SECONDS", 120),
+        config.get("CHUNK_OVERLAP_SECONDS", 2.0)
+    )
+    for samples, start, core_start, core_end in windows:
+        result = engine.transcribe(samples, **options)
+        offset = start / sample_rate
+        stitcher.add(
+            [_shift(seg, offset) for seg in result.get("segments") or []],
+            core_start / sample_rate,
+            core_end / sample_rate
+        )
+        total = core_end
+        checkpoint(total / sample_rate)
+    return stitcher.result(engine, total / sample_rate)
+
+
+class _Stitcher:
+    """Joins window results in file order; Vosk x-vectors are clustered over the whole file."""
+
+    def __init__(self, on_segment, with_words):
+        self.on_segment = on_segment
+        self.with_words = with_words
+        self.clusterer = OnlineSpeakerClusterer()
+        self.segments = []
+
+    def add(self, window_segments, core_start, core_end):
+        for seg in _keep_core(window_segments, core_start, core_end):
+            spk = seg.pop("spk", None)
+            if spk:
+                with stage("clustering"):
+                    seg["speaker"] = self.clusterer.add(spk)
+            if not self.with_words:
+                seg.pop("words", None)
+            self.segments.append(seg)
+            if self.on_segment:
+                self.on_segment(seg)
+
+    def result(self, engine, audio_seconds):
+        merge_threshold = current_app.config.get("SPEAKER_MERGE_THRESHOLD", 0.0)
+        if merge_threshold and self.clusterer.size:
+            with stage("clustering"):
+                relabel_segments(self.segments, self.clusterer.merge(merge_threshold))
+        return {
+            "text": " ".join(seg["text"] for seg in self.segments),
+            "segments": self.segments,
+            "duration": engine.result_duration(self.segments, audio_seconds)
+        }
@@ -1,6 +1,12 @@
 import os
+import json
+import wave
 import subprocess
 import shutil
+import tempfile
+import threading
+import queue
+from functools import lru_cache
 from pathlib import Path
 from backend.config import Config
 
@@ -22,6 +28,7 @@ def _parse_dotenv(dotenv_path: Path):
     return data
 
 
+@lru_cache(maxsize=None)
 def _get_ffmpeg_executable_from_envfile():
     # locate backend/.env (two levels up from this file: services -> backend)
     base = Path(__file__).resolve().parents[1]
@@ -58,7 +65,99 @@ def _get_ffmpeg_executable_from_envfile():
     raise RuntimeError('ffmpeg executable not found. Please set FFMPEG_PATH or FFMPEG_BIN in backend/.env')
 
 
-def ensure_audio(input_path, output_dir, filename=None):
+@lru_cache(maxsize=None)
+def _get_ffprobe_executable():
+    """ffprobe next to the resolved ffmpeg, else from PATH; ``None`` if missing."""
+    try:
+        ffmpeg = _get_ffmpeg_executable_from_envfile()
+    except RuntimeError:
+        ffmpeg = None
+    if ffmpeg:
+        folder, name = os.path.split(ffmpeg)
+        candidate = os.path.join(folder, name.replace('ffmpeg', 'ffprobe'))
+        if candidate != ffmpeg and os.path.exists(candidate):
+            return candidate
+    return shutil.which('ffprobe')
+
+
+def probe_audio(input_path):
+    """Describe the container and first audio stream of ``input_path``.
+
+    Uses ffprobe when available and falls back to the WAV header otherwise.
+    Returns ``None`` when the file cannot be read by either.
+    """
+    ffprobe = _get_ffprobe_executable()
+    if ffprobe:
+        cmd = [ffprobe, "-v", "error", "-show_entries",
+               "format=format_name,duration:stream=codec_type,codec_name,sample_rate,channels",
+               "-of", "json", str(input_path)]
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            data = json.loads(proc.stdout.decode('utf-8', errors='replace') or '{}')
+        except (subprocess.CalledProcessError, OSError, ValueError):
+            return None
+        streams = data.get('streams') or []
+        audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+        fmt = data.get('format') or {}
+        try:
+            duration = float(fmt.get('duration'))
+        except (TypeError, ValueError):
+            duration = None
+        return {
+            "format_name": fmt.get('format_name'),
+            "duration": duration,
+            "stream_count": len(streams),
+            "has_video": any(st.get('codec_type') == 'video' for st in streams),
+            "codec_name": audio.get('codec_name') if audio else None,
+            "sample_rate": int(audio['sample_rate']) if audio and audio.get('sample_rate') else None,
+            "channels": audio.get('channels') if audio else None,
+        }
+    try:
+        with wave.open(str(input_path), 'rb') as wf:
+            if wf.getcomptype() != 'NONE':
+                return None
+            return {
+                "format_name": "wav",
+                "duration": wf.getnframes() / float(wf.getframerate()),
+                "stream_count": 1,
+                "has_video": False,
+                "codec_name": f"pcm_s{wf.getsampwidth() * 8}le" if wf.getsampwidth() > 1 else "pcm_u8",
+                "sample_rate": wf.getframerate(),
+                "channels": wf.getnchannels(),
+            }
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def is_normalized_audio(probe):
+    """True when ``probe`` describes a mono 16-bit PCM WAV at the target sample rate."""
+    if not probe:
+        return False
+    return (
+        'wav' in (probe.get('format_name') or '').split(',')
+        and probe.get('stream_count') == 1
+        and not probe.get('has_video')
+        and probe.get('codec_name') == 'pcm_s16le'
+        and probe.get('sample_rate') == Config.DEFAULT_SAMPLE_RATE
+        and probe.get('channels') == 1
+    )
+
+
+def _link_or_reuse(input_path, output_path):
+    """Hardlink conformant input into the output folder, or use it in place."""
+    try:
+        if output_path.exists():
+            if os.path.samefile(input_path, output_path):
+                return str(output_path)
+            output_path.unlink()
+        os.link(input_path, output_path)
+        return str(output_path)
+    except OSError:
+        return str(input_path)
+
+
+def ensure_audio(input_path, output_dir, filename=None, probe=None):
+    """Return a 16 kHz mono PCM WAV for ``input_path``, converting with ffmpeg only if needed."""
     input_path = str(input_path)
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     out_name = filename or (Path(input_path).stem + ".wav")
@@ -70,6 +169,14 @@ def ensure_audio(input_path, output_dir, filename=None):
     except Exception:
         in_resolved = Path(input_path).absolute()
         out_resolved = output_path.absolute()
+
+    if probe is None:
+        probe = probe_audio(input_path)
+    if is_normalized_audio(probe):
+        if in_resolved == out_resolved:
+            return input_path
+        return _link_or_reuse(input_path, output_path)
+
     if in_resolved == out_resolved:
         out_name = Path(input_path).stem + "_conv.wav"
         output_path = Path(output_dir) / out_name
@@ -82,3 +189,131 @@ def ensure_audio(input_path, output_dir, filename=None):
         stderr = e.stderr.decode('utf-8', errors='replace') if getattr(e, 'stderr', None) else ''
         raise RuntimeError(f"ffmpeg failed (cmd: {cmd}): {stderr}")
     return str(output_path)
+
+
+def _upload_signature(upload):
+    st = os.stat(upload.stored_at)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def upload_probe(upload):
+    """``probe_audio`` of the upload's stored file, kept in ``upload.metadata_json`` (the caller commits)."""
+    signature = _upload_signature(upload)
+    meta = dict(upload.metadata_json or {})
+    if meta.get("probe_source") == signature:
+        return meta.get("probe")
+    probe = probe_audio(upload.stored_at)
+    meta["probe"] = probe
+    meta["probe_source"] = signature
+    upload.metadata_json = meta
+    return probe
+
+
+def converted_audio(upload):
+    """Path of an earlier ``ensure_upload_audio`` result that is still valid, else ``None``."""
+    cached = (upload.metadata_json or {}).get("audio") or {}
+    if cached.get("source") == _upload_signature(upload) and cached.get("path") and os.path.exists(cached["path"]):
+        return cached["path"]
+    return None
+
+
+def ensure_upload_audio(upload, output_dir):
+    """``ensure_audio`` for an ``Upload``, reusing its previous conversion.
+
+    The probe result and the converted path are kept in
+    ``upload.metadata_json`` (the caller commits); they are reused while the
+    stored file keeps the same size and mtime and the converted file exists.
+    """
+    audio_path = converted_audio(upload)
+    if audio_path:
+        return audio_path
+    probe = upload_probe(upload)
+    audio_path = ensure_audio(upload.stored_at, output_dir, filename=f"{upload.id}.wav", probe=probe)
+    meta = dict(upload.metadata_json or {})
+    meta["audio"] = {"path": audio_path, "source": _upload_signature(upload), "converted": not is_normalized_audio(probe)}
+    upload.metadata_json = meta
+    return audio_path
+
+
+class PcmStream:
+    """16-bit mono PCM of ``input_path`` decoded by ffmpeg straight to a pipe.
+
+    Iterating yields ``bytes`` blocks of ``block_samples`` samples (the last
+    one may be shorter). A reader thread moves ffmpeg's stdout into a queue
+    of at most ``buffer_seconds`` of audio: ffmpeg decodes ahead while the
+    engine is busy, and once the queue is full the pipe fills and ffmpeg
+    blocks, so memory stays bounded however long the input is. Nothing is
+    written to disk. ``close`` (or leaving the ``with`` block) stops ffmpeg,
+    e.g. when the job is cancelled halfway.
+    """
+
+    def __init__(self, input_path, sample_rate=None, block_samples=4000, buffer_seconds=30.0):
+        self.input_path = str(input_path)
+        self.sample_rate = sample_rate or Config.DEFAULT_SAMPLE_RATE
+        self.block_bytes = block_samples * 2
+        self.samples_read = 0
+        max_blocks = max(2, int(buffer_seconds * self.sample_rate / block_samples))
+        self._blocks = queue.Queue(maxsize=max_blocks)
+        self._closed = threading.Event()
+        self._error = None
+        # a file, not a pipe: nobody reads stderr until ffmpeg exits
+        self._stderr = tempfile.TemporaryFile()
+        ffmpeg = _get_ffmpeg_executable_from_envfile()
+        self.cmd = [ffmpeg, "-nostdin", "-v", "error", "-i", self.input_path, "-vn",
+                    "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(self.sample_rate), "-ac", "1", "pipe:1"]
+        self._proc = subprocess.Popen(self.cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=self._stderr)
+        self._reader = threading.Thread(target=self._read, name="pcm-stream", daemon=True)
+        self._reader.start()
+
+    @property
+    def seconds_read(self):
+        return self.samples_read / self.sample_rate
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _read(self):
+        try:
+            while not self._closed.is_set():
+                block = self._proc.stdout.read(self.block_bytes)
+                if not block:
+                    break
+                self._put(block)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(None)
+
+    def __iter__(self):
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                break
+            self.samples_read += len(block) // 2
+            yield block
+        if self._error is not None:
+            raise RuntimeError(f"reading ffmpeg output failed: {self._error}")
+        if self._proc.wait() != 0 and not self._closed.is_set():
+            self._stderr.seek(0)
+            stderr = self._stderr.read().decode('utf-8', errors='replace')
+            raise RuntimeError(f"ffmpeg failed (cmd: {self.cmd}): {stderr}")
+
+    def close(self):
+        self._closed.set()
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._reader.join()
+        self._proc.wait()
+        self._proc.stdout.close()
+        self._stderr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
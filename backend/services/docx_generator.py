@@ -4,27 +4,47 @@ from pathlib import Path
 
 
 def generate_docx(transcription, output_path, options=None):
+    """Write ``transcription`` as a Word document.
+
+    ``segments`` may be any iterable (the exporter passes a generator over
+    segment rows), so only the python-docx document itself is held in memory;
+    when it yields nothing, ``text`` is written instead.
+    Options: ``title``, ``author``, ``include_timestamps`` (default on) and
+    ``speaker_labels`` (default off).
+    """
+    options = options or {}
     Path(Path(output_path).parent).mkdir(parents=True, exist_ok=True)
     doc = Document()
-    title = options.get("title") if options else None
+    if options.get("author"):
+        doc.core_properties.author = options["author"]
+    title = options.get("title")
     if title:
         doc.add_heading(title, level=1)
-    segments = None
+    include_timestamps = options.get("include_timestamps", True)
+    speaker_labels = options.get("speaker_labels", False)
     if isinstance(transcription, dict):
         segments = transcription.get("segments")
+        text = transcription.get("text", "")
     else:
         segments = getattr(transcription, "segments", None)
-    if isinstance(segments, list):
+        text = getattr(transcription, "text", "")
+    written = 0
+    if segments is not None and not isinstance(segments, (str, dict)):
         for seg in segments:
             start = seg.get("start") if isinstance(seg, dict) else None
             end = seg.get("end") if isinstance(seg, dict) else None
-            text = seg.get("text") if isinstance(seg, dict) else ""
+            seg_text = seg.get("text") if isinstance(seg, dict) else ""
+            speaker = (seg.get("speaker") or seg.get("speaker_id")) if isinstance(seg, dict) else None
             p = doc.add_paragraph()
-            p.add_run(f"[{float(start):.2f}-{float(end):.2f}] ").bold = True
-            r = p.add_run(text)
+            if include_timestamps:
+                p.add_run(f"[{float(start or 0):.2f}-{float(end or 0):.2f}] ").bold = True
+            if speaker_labels and speaker:
+                p.add_run(f"{speaker}: ").bold = True
+            r = p.add_run(seg_text or "")
             r.font.size = Pt(11)
-    else:
-        text = getattr(transcription, "text", "") if not isinstance(transcription, dict) else transcription.get("text", "")
-        doc.add_paragraph(text)
+            written += 1
+    if not written:
+        # no segments (legacy rows, text-only engines): the plain text
+        doc.add_paragraph(text or "")
     doc.save(output_path)
     return output_path
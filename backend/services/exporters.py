@@ -0,0 +1,356 @@
+import itertools
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from flask import current_app
+from sqlalchemy import select, func
+from backend import db
+from backend.models import Transcription, TranscriptionSegment, ExportJob
+from .docx_generator import generate_docx
+from .result_cache import json_digest
+from .segment_store import ensure_segment_rows, iter_segments
+from .metrics import Trace, stage
+
+# Exports are written once per (transcription content, format, options) under
+# DOCX_STORAGE_PATH as <id>-<content>-<key>.<ext>, so /download serves them
+# all and a re-transcription or new options simply produce a new file.
+
+# text formats reach the client (and the cache file) in blocks of about this size
+STREAM_BUFFER_BYTES = 64 * 1024
+
+
+def _flag(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def _clock(seconds, sep="."):
+    ms = int(round(max(0.0, float(seconds or 0.0)) * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+def _cue_text(seg):
+    # a blank line would end the cue early
+    return " ".join((seg.get("text") or "").split())
+
+
+def _text(meta):
+    # the text column is deferred when exports are planned; load it only here
+    if "text" in meta:
+        return meta["text"]
+    return db.session.execute(select(Transcription.text).where(Transcription.id == meta["id"])).scalar()
+
+
+class Exporter(ABC):
+    name = None
+    extension = None
+    mimetype = "application/octet-stream"
+    streamable = False
+    # option -> default; other request options are dropped so they do not split the cache
+    defaults = {}
+
+    def normalize(self, options):
+        options = options or {}
+        normalized = {}
+        for key, default in self.defaults.items():
+            value = options.get(key)
+            if isinstance(default, bool):
+                normalized[key] = _flag(value, default)
+            else:
+                normalized[key] = str(value) if value not in (None, "") else default
+        return normalized
+
+    @abstractmethod
+    def build(self, meta, segments, options, path):
+        """Write the document to ``path``."""
+
+
+class StreamingExporter(Exporter):
+    # text formats are rendered chunk by chunk straight from the segment rows
+    streamable = True
+
+    @abstractmethod
+    def render(self, meta, segments, options):
+        """Yield the document as ``str`` chunks."""
+
+    def build(self, meta, segments, options, path):
+        with open(path, "w", encoding="utf-8", newline="") as out:
+            for chunk in self.render(meta, segments, options):
+                out.write(chunk)
+
+
+class TextExporter(StreamingExporter):
+    name = "txt"
+    extension = "txt"
+    mimetype = "text/plain"
+    defaults = {"title": None, "include_timestamps": True, "speaker_labels": True}
+
+    def render(self, meta, segments, options):
+        if options["title"]:
+            yield options["title"] + "\n\n"
+        for seg in segments:
+            line = ""
+            if options["include_timestamps"]:
+                line += f"[{_clock(seg.get('start')).split('.')[0]}] "
+            if options["speaker_labels"] and seg.get("speaker"):
+                line += f"{seg['speaker']}: "
+            yield line + _cue_text(seg) + "\n"
+
+
+class SrtExporter(StreamingExporter):
+    name = "srt"
+    extension = "srt"
+    mimetype = "application/x-subrip"
+    defaults = {"speaker_labels": True}
+
+    def render(self, meta, segments, options):
+        for n, seg in enumerate(segments, 1):
+            text = _cue_text(seg)
+            if options["speaker_labels"] and seg.get("speaker"):
+                text = f"{seg['speaker']}: {text}"
+            yield f"{n}\n{_clock(seg.get('start'), ',')} --> {_clock(seg.get('end'), ',')}\n{text}\n\n"
+
+
+class VttExporter(StreamingExporter):
+    name = "vtt"
+    extension = "vtt"
+    mimetype = "text/vtt"
+    defaults = {"title": None, "speaker_labels": True}
+
+    def render(self, meta, segments, options):
+        yield "WEBVTT" + (f" - {options['title']}" if options["title"] else "") + "\n\n"
+        for seg in segments:
+            text = _cue_text(seg)
+            if options["speaker_labels"] and seg.get("speaker"):
+                text = f"<v {seg['speaker']}>{text}"
+            yield f"{_clock(seg.get('start'))} --> {_clock(seg.get('end'))}\n{text}\n\n"
+
+
+class JsonExporter(StreamingExporter):
+    name = "json"
+    extension = "json"
+    mimetype = "application/json"
+
+    def render(self, meta, segments, options):
+        head = {k: meta[k] for k in ("id", "filename", "language", "duration")}
+        yield json.dumps(head, ensure_ascii=False)[:-1] + ', "segments": ['
+        sep = ""
+        for seg in segments:
+            yield sep + json.dumps(seg, ensure_ascii=False)
+            sep = ", "
+        yield "]}"
+
+
+class DocxExporter(Exporter):
+    name = "docx"
+    extension = "docx"
+    mimetype = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    defaults = {"title": None, "author": None, "include_timestamps": True, "speaker_labels": False}
+
+    # python-docx keeps the whole document in memory until save(), so it is never streamed
+    def build(self, meta, segments, options, path):
+        generate_docx({"segments": segments}, path, options)
+
+
+
+EXPORTERS = {cls.name: cls() for cls in (DocxExporter, SrtExporter, VttExporter, TextExporter, JsonExporter)}
+
+
+def get_exporter(fmt):
+    return EXPORTERS.get((fmt or "").lower())
+
+
+def content_digest(text, segments):
+    return json_digest({"text": text, "segments": segments or []})
+
+
+def content_hash(t):
+    """``t.content_sha256``, computed and stored once for rows completed before it existed."""
+    if not t.content_sha256:
+        t.content_sha256 = content_digest(t.text, t.segments)
+        db.session.commit()
+    return t.content_sha256
+
+
+@dataclass
+class Export:
+    exporter: Exporter
+    options: dict
+    key: str
+    path: Path
+    meta: dict
+
+    @property
+    def filename(self):
+        return self.path.name
+
+    def download_name(self):
+        stem = Path(self.meta.get("filename") or "").stem or self.meta["id"]
+        return f"{stem}.{self.exporter.extension}"
+
+
+def plan_export(t, exporter, options=None):
+    """Resolve options, cache key and output path of one export of ``t``; nothing is built yet."""
+    options = exporter.normalize(options)
+    content = content_hash(t)
+    key = json_digest({"content": content, "format": exporter.name, "options": options})
+    folder = Path(current_app.config["DOCX_STORAGE_PATH"])
+    meta = {"id": t.id, "filename": t.filename, "language": t.language, "duration": t.duration_seconds, "content": content}
+    return Export(exporter, options, key, folder / f"{t.id}-{content[:12]}-{key[:12]}.{exporter.extension}", meta)
+
+
+def _segments(export):
+    """Segment rows of the export; rows without any (legacy rows, text-only engines) yield their text as one segment."""
+    segments = iter_segments(export.meta["id"], current_app.config.get("EXPORT_BATCH_SIZE", 500))
+    first = next(segments, None)
+    if first is not None:
+        return itertools.chain((first,), segments)
+    text = _text(export.meta)
+    if not text:
+        return iter(())
+    return iter(({"start": 0.0, "end": export.meta.get("duration") or 0.0, "text": text, "speaker": None},))
+
+
+def _prune(export):
+    """Remove exports of older content of the same transcription."""
+    prefix = f"{export.meta['id']}-"
+    current = f"{prefix}{export.meta['content'][:12]}-"
+    for path in export.path.parent.glob(prefix + "*"):
+        if not path.name.startswith(current) and not path.name.endswith(".part"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def _part_path(export):
+    return export.path.with_name(f"{export.path.name}.{uuid.uuid4().hex}.part")
+
+
+def stream_export(export):
+    """Yield a text export as UTF-8 blocks while writing it to the cache.
+
+    The cache file only appears once the whole document was rendered; a
+    client that disconnects halfway leaves nothing behind.
+    """
+    export.path.parent.mkdir(parents=True, exist_ok=True)
+    part = _part_path(export)
+    try:
+        with open(part, "wb") as out:
+            pending, size = [], 0
+            for chunk in export.exporter.render(export.meta, _segments(export), export.options):
+                data = chunk.encode("utf-8")
+                pending.append(data)
+                size += len(data)
+                if size >= STREAM_BUFFER_BYTES:
+                    block = b"".join(pending)
+                    out.write(block)
+                    yield block
+                    pending, size = [], 0
+            if pending:
+                block = b"".join(pending)
+                out.write(block)
+                yield block
+        os.replace(part, export.path)
+    finally:
+        if part.exists():
+            part.unlink()
+    _prune(export)
+
+
+def build_export(export, trace=None):
+    """Write ``export`` to its cache path (no-op when it already exists) and return the path."""
+    if export.path.exists():
+        return export.path
+    export.path.parent.mkdir(parents=True, exist_ok=True)
+    part = _part_path(export)
+    try:
+        with stage(export.exporter.name, trace):
+            export.exporter.build(export.meta, _segments(export), export.options, str(part))
+        os.replace(part, export.path)
+    finally:
+        if part.exists():
+            part.unlink()
+    _prune(export)
+    return export.path
+
+
+def segment_count(tid):
+    ensure_segment_rows(tid)
+    return db.session.execute(
+        select(func.count()).select_from(TranscriptionSegment).where(TranscriptionSegment.transcription_id == tid)
+    ).scalar() or 0
+
+
+def needs_worker(export):
+    """Documents that cannot stream are built by the worker past EXPORT_ASYNC_MIN_SEGMENTS segments."""
+    threshold = current_app.config.get("EXPORT_ASYNC_MIN_SEGMENTS", 0)
+    if export.exporter.streamable or threshold <= 0:
+        return False
+    return segment_count(export.meta["id"]) >= threshold
+
+
+def enqueue_export(export):
+    """Queue ``export`` for the worker, reusing a pending job for the same cache key."""
+    job = db.session.execute(
+        select(ExportJob)
+        .where(ExportJob.cache_key == export.key, ExportJob.status.in_(("queued", "processing")))
+        .limit(1)
+    ).scalar()
+    if job is None:
+        job = ExportJob(
+            transcription_id=export.meta["id"],
+            format=export.exporter.name,
+            options=export.options,
+            cache_key=export.key,
+            status="queued",
+        )
+        db.session.add(job)
+        db.session.commit()
+    return job
+
+
+def _record_docx(t, export, trace):
+    # word_doc_path keeps pointing at the newest .docx
+    if export.exporter.name == "docx":
+        t.word_doc_path = str(export.path)
+        if "docx" in trace.stages:
+            t.timings = dict(t.timings or {}, docx_seconds=round(trace.stages["docx"], 4))
+
+
+def export_now(t, export):
+    """Build ``export`` in this process; the caller commits."""
+    trace = Trace()
+    build_export(export, trace)
+    _record_docx(t, export, trace)
+    return export.path
+
+
+def run_export_job(job):
+    """Build a queued export in the worker and store the outcome on ``job``."""
+    try:
+        t = db.session.get(Transcription, job.transcription_id)
+        exporter = get_exporter(job.format)
+        if t is None or exporter is None:
+            raise RuntimeError("transcription not found" if t is None else f"unknown format {job.format}")
+        # re-planned: the transcription may have changed since the job was queued
+        export = plan_export(t, exporter, job.options)
+        job.cache_key = export.key
+        export_now(t, export)
+        job.path = str(export.path)
+        job.status = "completed"
+        job.error = None
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    job.worker_id = None
+    db.session.commit()
@@ -0,0 +1,65 @@
+from bisect import bisect_left, bisect_right
+
+
+class IntervalIndex:
+    """Static index over ``(start, end, value)`` intervals.
+
+    Intervals are sorted by start once; a running maximum of the end times
+    lets overlap queries walk back from the query end and stop as soon as
+    no earlier interval can reach the query start. For speaker turns, which
+    barely overlap, a query costs O(log n + hits).
+    """
+
+    def __init__(self, intervals):
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.starts = [item[0] for item in items]
+        self.ends = [item[1] for item in items]
+        self.values = [item[2] for item in items]
+        self._max_end = []
+        running = float("-inf")
+        for end in self.ends:
+            running = max(running, end)
+            self._max_end.append(running)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start, end):
+        """Indexes of intervals overlapping ``[start, end)``, sorted by start."""
+        hits = []
+        i = bisect_left(self.starts, end) - 1
+        while i >= 0 and self._max_end[i] > start:
+            if self.ends[i] > start:
+                hits.append(i)
+            i -= 1
+        hits.reverse()
+        return hits
+
+    def containing(self, point):
+        """Indexes of intervals with ``start <= point < end``."""
+        hits = []
+        i = bisect_right(self.starts, point) - 1
+        while i >= 0 and self._max_end[i] > point:
+            if self.ends[i] > point:
+                hits.append(i)
+            i -= 1
+        hits.reverse()
+        return hits
+
+    def best_overlap(self, start, end):
+        """Index of the interval sharing the most time with ``[start, end]``, or ``None``.
+
+        Zero-length queries (e.g. a word without duration) fall back to the
+        interval containing the point.
+        """
+        if end <= start:
+            hits = self.containing(start)
+            return hits[0] if hits else None
+        best = None
+        best_overlap = 0.0
+        for i in self.overlapping(start, end):
+            overlap = min(end, self.ends[i]) - max(start, self.starts[i])
+            if overlap > best_overlap:
+                best_overlap = overlap
+                best = i
+        return best
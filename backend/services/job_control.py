@@ -0,0 +1,105 @@
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import select, update
+from backend import db
+from backend.models import Transcription
+
+_local = threading.local()
+# controls of the jobs running in this process, so a cancel request here takes effect at once
+_running = {}
+_running_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised at a chunk boundary once cancelling the running job was requested."""
+
+
+class JobControl:
+    """Progress and cancellation of one running transcription.
+
+    Engines call ``checkpoint`` at chunk boundaries with the audio position
+    reached. At most once per ``interval`` seconds that writes the position,
+    reads ``cancel_requested`` and commits the job's session (the same
+    session ``SegmentWriter`` flushes through, so neither waits on the
+    other's write lock), so the frontend sees progress without a database
+    round trip per chunk.
+    """
+
+    def __init__(self, tid, interval=2.0):
+        self.tid = tid
+        self.interval = interval
+        self.processed_seconds = 0.0
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def checkpoint(self, seconds=None):
+        if seconds is not None and seconds > self.processed_seconds:
+            self.processed_seconds = seconds
+        if time.monotonic() - self._last_sync >= self.interval:
+            self.sync()
+        if self._cancelled.is_set():
+            raise JobCancelled(f"transcription {self.tid} cancelled")
+
+    def sync(self):
+        with self._lock:
+            self._last_sync = time.monotonic()
+            processed = round(self.processed_seconds, 2)
+            db.session.execute(
+                update(Transcription).where(Transcription.id == self.tid).values(progress_seconds=processed)
+            )
+            cancel = db.session.execute(
+                select(Transcription.cancel_requested).where(Transcription.id == self.tid)
+            ).scalar()
+            db.session.commit()
+            if cancel:
+                self._cancelled.set()
+
+
+def current_job():
+    return getattr(_local, "job", None)
+
+
+@contextmanager
+def controlling(job):
+    """Make ``job`` the one ``checkpoint`` reports to for this thread."""
+    previous = current_job()
+    _local.job = job
+    with _running_lock:
+        _running[job.tid] = job
+    try:
+        yield job
+    finally:
+        with _running_lock:
+            if _running.get(job.tid) is job:
+                del _running[job.tid]
+        _local.job = previous
+
+
+def checkpoint(seconds=None):
+    """Report progress of the current job and raise ``JobCancelled`` if it was cancelled.
+
+    A no-op outside a job (live sessions, benchmarks) or in helper threads,
+    which have no current job.
+    """
+    job = current_job()
+    if job is not None:
+        job.checkpoint(seconds)
+
+
+def cancel_running(tid):
+    """Flag a job running in this process; ``False`` when it runs elsewhere (or not at all)."""
+    with _running_lock:
+        job = _running.get(tid)
+    if job is None:
+        return False
+    job.cancel()
+    return True
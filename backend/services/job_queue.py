@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, func
+from backend import db
+from backend.models import Transcription
+
+
+# Queue updates commit right away, which expires any loaded rows anyway;
+# skip evaluating the criteria against the identity map.
+_BULK = {"synchronize_session": False}
+
+# Every function takes the job table as ``model``: transcriptions by default,
+# or ``ExportJob`` for document builds; both carry the same queue columns.
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _claim_values(worker_id, model):
+    now = _now()
+    return dict(
+        status="processing",
+        worker_id=worker_id,
+        claimed_at=now,
+        heartbeat_at=now,
+        attempts=func.coalesce(model.attempts, 0) + 1,
+    )
+
+
+# fair share among equal priorities: the tenant, then the batch with the fewest running
+# jobs goes first, so neither can hold the whole pool; rows without one count as idle
+FAIR_SHARE_COLUMNS = ("tenant", "batch_id")
+
+
+def _next_queued(model):
+    q = select(model.id).where(model.status == "queued")
+    if hasattr(model, "priority"):
+        q = q.order_by(model.priority.desc())
+    for name in FAIR_SHARE_COLUMNS:
+        column = getattr(model, name, None)
+        if column is None:
+            continue
+        running = (
+            select(column, func.count().label("running"))
+            .where(model.status == "processing", column.isnot(None))
+            .group_by(column)
+            .subquery()
+        )
+        q = q.outerjoin(running, running.c[name] == column).order_by(func.coalesce(running.c.running, 0))
+    return q.order_by(model.created_at, model.id).limit(1)
+
+
+def claim_next(worker_id, model=Transcription):
+    """Atomically move the next queued job to ``processing``.
+
+    Transcriptions are taken by priority, then fair share across tenants and
+    batches, then age (see ``_next_queued``); other jobs oldest first.
+
+    PostgreSQL uses ``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent workers
+    never wait on each other. Other databases (SQLite) use a conditional
+    ``UPDATE ... WHERE status = 'queued'`` and retry when another worker won
+    the row. Returns the claimed id or ``None`` when the queue is empty.
+    """
+    if db.engine.dialect.name == "postgresql":
+        tid = db.session.execute(_next_queued(model).with_for_update(skip_locked=True, of=model)).scalar()
+        if tid is None:
+            db.session.commit()
+            return None
+        db.session.execute(
+            update(model)
+            .where(model.id == tid)
+            .values(**_claim_values(worker_id, model)),
+            execution_options=_BULK,
+        )
+        db.session.commit()
+        return tid
+
+    for _ in range(5):
+        tid = db.session.execute(_next_queued(model)).scalar()
+        if tid is None:
+            db.session.commit()
+            return None
+        result = db.session.execute(
+            update(model)
+            .where(model.id == tid, model.status == "queued")
+            .values(**_claim_values(worker_id, model)),
+            execution_options=_BULK,
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return tid
+    return None
+
+
+def claim(tid, worker_id, model=Transcription):
+    """Claim one specific queued job; ``False`` if it is not queued anymore."""
+    result = db.session.execute(
+        update(model)
+        .where(model.id == tid, model.status == "queued")
+        .values(**_claim_values(worker_id, model)),
+        execution_options=_BULK,
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def heartbeat(worker_id, ids, model=Transcription):
+    if not ids:
+        return
+    db.session.execute(
+        update(model)
+        .where(
+            model.id.in_(list(ids)),
+            model.worker_id == worker_id,
+            model.status == "processing",
+        )
+        .values(heartbeat_at=_now()),
+        execution_options=_BULK,
+    )
+    db.session.commit()
+
+
+def recover_stale(stale_seconds, max_attempts, model=Transcription):
+    """Requeue jobs whose worker stopped sending heartbeats.
+
+    Only rows claimed by a worker are considered, so synchronous requests
+    (which never set ``worker_id``) are left alone. Jobs that already used
+    ``max_attempts`` are marked failed instead of being retried forever.
+    Returns ``(requeued, failed)`` counts.
+    """
+    cutoff = _now() - timedelta(seconds=stale_seconds)
+    stale = (
+        model.status == "processing",
+        model.worker_id.isnot(None),
+        model.heartbeat_at < cutoff,
+    )
+    failed = db.session.execute(
+        update(model)
+        .where(*stale, model.attempts >= max_attempts)
+        .values(status="failed", error="worker stopped responding", worker_id=None),
+        execution_options=_BULK,
+    ).rowcount
+    requeued = db.session.execute(
+        update(model)
+        .where(*stale, model.attempts < max_attempts)
+        .values(status="queued", worker_id=None),
+        execution_options=_BULK,
+    ).rowcount
+    db.session.commit()
+    return requeued, failed
+
+
+def queue_depth(model=Transcription):
+    return db.session.execute(
+        select(func.count()).select_from(model).where(model.status == "queued")
+    ).scalar() or 0
+
+
+def cancel(*criteria):
+    """Cancel queued transcriptions matching ``criteria`` and flag running ones.
+
+    Running jobs stop at their next checkpoint (``job_control``). The flag
+    is set on queued rows too, so one claimed in between stops before it
+    starts. Returns ``(cancelled, flagged)`` counts.
+    """
+    active = Transcription.status.in_(("queued", "processing"))
+    flagged = db.session.execute(
+        update(Transcription).where(*criteria, active).values(cancel_requested=True),
+        execution_options=_BULK,
+    ).rowcount
+    cancelled = db.session.execute(
+        update(Transcription)
+        .where(*criteria, Transcription.status == "queued")
+        .values(status="cancelled"),
+        execution_options=_BULK,
+    ).rowcount
+    db.session.commit()
+    return cancelled, flagged - cancelled
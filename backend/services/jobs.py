@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+from flask import current_app
+from backend import db
+from backend.models import Transcription, Upload
+from . import job_queue
+from .convert import ensure_upload_audio, upload_probe, converted_audio, is_normalized_audio, PcmStream
+from .transcribe import transcribe_audio, streaming_applies
+from .transcription_engine import get_transcription_engine
+from .audio_segmenter import read_pcm_wav
+from .result_cache import get_result_cache, engine_config
+from .segment_store import segment_rows, insert_rows, clear_segments
+from .search_index import index_segments
+from .exporters import content_digest
+from .job_control import JobControl, JobCancelled, controlling
+from .metrics import Trace, tracing, stage, ACTIVE_JOBS, JOBS_TOTAL, JOB_SECONDS, JOB_RTF
+
+
+def apply_transcription_result(t, res):
+    t.text = res.get("text")
+    t.segments = res.get("segments")
+    t.duration_seconds = res.get("duration")
+    t.speakers = res.get("speakers")
+    t.content_sha256 = content_digest(t.text, t.segments)
+    t.error = None
+    t.status = "completed"
+
+
+def process_transcription(t):
+    """Normalize the upload's audio if needed, transcribe it and store the outcome on ``t``.
+
+    Stage durations and the real-time factor end up in ``t.timings`` and ``t.rtf``.
+    """
+    trace = Trace()
+    control = JobControl(t.id, interval=current_app.config.get("PROGRESS_INTERVAL_SECONDS", 2.0))
+    ACTIVE_JOBS.inc()
+    try:
+        with tracing(trace), controlling(control):
+            try:
+                if t.cancel_requested:
+                    raise JobCancelled(f"transcription {t.id} cancelled")
+                source = None
+                if not t.audio_path:
+                    upload = db.session.get(Upload, t.upload_id) if t.upload_id else None
+                    if upload is None:
+                        raise RuntimeError("upload not found")
+                    with stage("ensure_audio"):
+                        source = _stream_source(t, upload)
+                        if source is None:
+                            t.audio_path = ensure_upload_audio(upload, current_app.config["UPLOAD_FOLDER"])
+                t.progress_total = _audio_seconds(t) if source is None else (upload_probe(upload) or {}).get("duration")
+                t.progress_seconds = 0.0
+                with stage("db_commit"):
+                    db.session.commit()
+                writer = SegmentWriter(t, current_app.config.get("STREAM_FLUSH_SECONDS", 1.0))
+                with stage("transcribe"):
+                    res = _cached_transcription(t, source, on_segment=writer)
+                apply_transcription_result(t, res)
+                t.progress_seconds = t.progress_total
+                writer.finish(t.segments)
+                index_segments(t.id, t.segments)
+            except JobCancelled:
+                # segments streamed so far stay readable; the result is not cached
+                t.status = "cancelled"
+                t.error = None
+                t.progress_seconds = round(control.processed_seconds, 2)
+            except Exception as e:
+                t.status = "failed"
+                t.error = str(e)
+            _record_timings(t, trace)
+            with stage("db_commit"):
+                db.session.commit()
+    finally:
+        ACTIVE_JOBS.dec()
+    return t
+
+
+def _audio_seconds(t):
+    # Vosk's duration only counts recognized speech; prefer the file length,
+    # then the probed length of a streamed upload
+    pcm = read_pcm_wav(t.audio_path) if t.audio_path and os.path.exists(t.audio_path) else None
+    if pcm is not None and pcm[1]:
+        return round(len(pcm[0]) / pcm[1], 3)
+    return t.progress_total or t.duration_seconds
+
+
+def _stream_source(t, upload):
+    """The upload file to decode straight into the engine, or ``None`` when a WAV is needed.
+
+    Only with PERSIST_NORMALIZED_AUDIO off, and not when a normalized WAV
+    is already at hand (an earlier conversion, or an upload that is one).
+    """
+    if current_app.config.get("PERSIST_NORMALIZED_AUDIO", True) or converted_audio(upload):
+        return None
+    probe = upload_probe(upload)
+    if probe is None or is_normalized_audio(probe):
+        return None
+    if not streaming_applies(get_transcription_engine(), t.speaker_segments, probe.get("duration")):
+        return None
+    return upload.stored_at
+
+
+def _record_timings(t, trace):
+    summary = trace.summary(_audio_seconds(t) if t.status == "completed" else None)
+    t.timings = summary
+    # audio seconds per processing second: above 1 is faster than real time
+    t.rtf = summary["rtf"]
+    JOBS_TOTAL.inc(status=t.status)
+    JOB_SECONDS.observe(summary["total_seconds"], status=t.status)
+    if summary["rtf"] is not None:
+        JOB_RTF.observe(summary["rtf"])
+
+
+class SegmentWriter:
+    """Persist segments to ``transcription_segments`` while the engine produces them.
+
+    New segments are bulk inserted at most once per ``interval`` seconds,
+    so readers (the SSE stream, ``/segments``) see progress without a
+    commit per segment. ``finish`` stores the final result, which may
+    differ from what was streamed (merged speakers, sorted pieces).
+    """
+
+    def __init__(self, t, interval):
+        self.t = t
+        self.interval = interval
+        self.segments = []
+        self._rows = []
+        self._last_flush = time.monotonic()
+        # rows of an earlier, interrupted attempt of this job
+        clear_segments(t.id)
+
+    def __call__(self, segment):
+        self.segments.append(segment)
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        # rows are snapshotted now: engines may relabel emitted segments in place later
+        rows = segment_rows(self.t.id, self.segments[len(self._rows):], len(self._rows))
+        insert_rows(rows)
+        self._rows.extend(rows)
+        with stage("db_commit"):
+            db.session.commit()
+        self._last_flush = time.monotonic()
+
+    def finish(self, segments):
+        """Make the table match ``segments``; the caller commits with the result."""
+        rows = segment_rows(self.t.id, segments or [])
+        if rows[:len(self._rows)] == self._rows:
+            insert_rows(rows[len(self._rows):])
+        else:
+            clear_segments(self.t.id)
+            insert_rows(rows)
+        self._rows = rows
+
+
+def start_transcription_thread(app, tid, worker_id):
+    """Process a job already claimed by ``worker_id`` in a background thread of this process.
+
+    A companion thread keeps the row's heartbeat fresh so worker stale-job
+    recovery does not requeue it while it runs.
+    """
+    done = threading.Event()
+
+    def heartbeat():
+        interval = app.config.get("WORKER_HEARTBEAT_SECONDS", 15)
+        while not done.wait(interval):
+            with app.app_context():
+                try:
+                    job_queue.heartbeat(worker_id, [tid])
+                except Exception as e:
+                    print(f"Heartbeat for {tid} failed: {e}")
+                finally:
+                    db.session.remove()
+
+    def run():
+        try:
+            with app.app_context():
+                try:
+                    t = db.session.get(Transcription, tid)
+                    if t is not None:
+                        process_transcription(t)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            print(f"Job {tid} crashed: {e}")
+        finally:
+            done.set()
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _cached_transcription(t, source=None, on_segment=None):
+    """Transcribe ``t.audio_path``, or the upload file ``source`` decoded on the fly, via the result cache."""
+    speaker_segments = t.speaker_segments or []
+
+    def run():
+        if source is None:
+            return transcribe_audio(t.audio_path, speaker_segments=speaker_segments, on_segment=on_segment)
+        config = current_app.config
+        with PcmStream(source, config.get("DEFAULT_SAMPLE_RATE", 16000), buffer_seconds=config.get("PCM_STREAM_BUFFER_SECONDS", 30.0)) as stream:
+            return transcribe_audio(stream, speaker_segments=speaker_segments, on_segment=on_segment)
+
+    cache = get_result_cache()
+    if cache is None:
+        return run()
+    config = engine_config(language=t.language, speaker_segments=speaker_segments)
+    if source is not None:
+        # keyed by the upload itself; windowed decoding may differ slightly from a whole-file pass
+        config["input"] = "stream"
+    key = cache.make_key(t.audio_path if source is None else source, config)
+    res = cache.get(key)
+    if res is None:
+        res = run()
+        cache.put(key, res, meta={"engine": config["engine"], "model": config["model"]})
+    return res
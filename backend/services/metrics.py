@@ -0,0 +1,236 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds; covers sub-millisecond DB commits up to multi-hour decodes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _labels_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels_text(self.labelnames, key)} {_number(value)}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """A settable value; with ``function`` it is read at scrape time instead."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                # a failing probe (e.g. no database) drops the sample, not the scrape
+                return self.header()
+            return self.header() + [f"{self.name} {_number(value)}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels_text(self.labelnames, key)} {_number(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, n)) for key, (counts, total, n) in self._values.items())
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _labels_text(self.labelnames + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self._add(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-local like every other cache here: with several web/worker processes,
+# scrape each one (or aggregate in the scraper).
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram("voz_stage_duration_seconds", "Time spent per pipeline stage.", ("stage",))
+JOB_SECONDS = REGISTRY.histogram("voz_transcription_duration_seconds", "Processing time per transcription job.", ("status",))
+JOB_RTF = REGISTRY.histogram(
+    "voz_transcription_realtime_factor",
+    "Audio seconds transcribed per processing second.",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100)
+)
+JOBS_TOTAL = REGISTRY.counter("voz_transcriptions_total", "Finished transcription jobs.", ("status",))
+ACTIVE_JOBS = REGISTRY.gauge("voz_active_jobs", "Transcription jobs running in this process.")
+MODEL_LOAD_SECONDS = REGISTRY.histogram("voz_model_load_seconds", "Model load time.", ("engine",))
+CACHE_REQUESTS = REGISTRY.counter("voz_result_cache_requests_total", "Result cache lookups.", ("result",))
+HTTP_SECONDS = REGISTRY.histogram("voz_http_request_duration_seconds", "HTTP request latency.", ("endpoint", "method", "status"))
+
+
+_local = threading.local()
+
+
+class Trace:
+    """Per-job stage durations; repeated stages (e.g. every clustering call) add up."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self, audio_seconds=None):
+        total = self.elapsed()
+        with self._lock:
+            stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        return {
+            "stages": stages,
+            "total_seconds": round(total, 4),
+            "audio_seconds": audio_seconds,
+            "rtf": round(audio_seconds / total, 4) if audio_seconds and total > 0 else None,
+        }
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def tracing(trace):
+    """Make ``trace`` the one ``stage`` records into for this thread."""
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def stage(name, trace=None):
+    """Time a block into the stage histogram and the current (or given) trace.
+
+    Stages may nest: ``transcribe`` includes ``model_load`` and ``vad``.
+    Pass ``trace`` explicitly from helper threads, which have no current one.
+    """
+    trace = trace or current_trace()
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        seconds = time.monotonic() - started
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if trace is not None:
+            trace.add(name, seconds)
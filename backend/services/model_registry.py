@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from .metrics import MODEL_LOAD_SECONDS, stage
+
+
+MB = 1024 * 1024
+
+# Approximate resident size of the CTranslate2 Whisper models at float32.
+# Used for the memory budget, the exact footprint depends on the backend.
+_WHISPER_SIZES_MB = {
+    "tiny": 150,
+    "base": 300,
+    "small": 1000,
+    "medium": 3000,
+    "large": 6000,
+    "large-v1": 6000,
+    "large-v2": 6000,
+    "large-v3": 6000,
+    "large-v3-turbo": 3300,
+    "turbo": 3300,
+}
+
+_COMPUTE_TYPE_FACTORS = {
+    "float32": 1.0,
+    "float16": 0.5,
+    "bfloat16": 0.5,
+    "int8_float32": 0.35,
+    "int8_float16": 0.3,
+    "int8_bfloat16": 0.3,
+    "int8": 0.25,
+}
+
+
+def estimate_whisper_size(model_name, compute_type):
+    base = _WHISPER_SIZES_MB.get(str(model_name).lower())
+    if base is None:
+        # local path to a converted model: use the weights on disk
+        return directory_size(model_name)
+    return int(base * _COMPUTE_TYPE_FACTORS.get(compute_type, 1.0) * MB)
+
+
+def directory_size(path):
+    total = 0
+    if not path or not os.path.isdir(path):
+        return 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models.
+
+    Keys are tuples starting with the engine name, ``(engine, model_name,
+    device, compute_type)``; Whisper keys add ``cpu_threads`` as a fifth item.
+    Each key is loaded at most once even when several request threads ask for
+    it at the same time; other keys keep being served while a load is in
+    progress. A key's load lock only lives while threads are loading it.
+    When ``max_bytes`` is set, least recently used models are dropped until the
+    estimated total fits the budget (the model just requested is always kept).
+    A model evicted while a request still uses it stays alive until that
+    request releases it. Eviction listeners are called with ``(key, model)``
+    for every model dropped, so helpers holding on to it (such as the Whisper
+    batcher) can let go too.
+    """
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> [lock, threads using it], dropped when the last one is done
+        self._key_locks = {}
+        self._listeners = []
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def get(self, key, loader, size_bytes=0):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            pending = self._key_locks.get(key)
+            if pending is None:
+                pending = self._key_locks[key] = [threading.Lock(), 0]
+            pending[1] += 1
+
+        try:
+            with pending[0]:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return entry[0]
+                started = time.monotonic()
+                with stage("model_load"):
+                    model = loader()
+                MODEL_LOAD_SECONDS.observe(time.monotonic() - started, engine=key[0])
+                with self._lock:
+                    self._entries[key] = (model, int(size_bytes or 0))
+                    self.loads += 1
+                    evicted = self._evict(keep=key)
+                self._notify(evicted)
+                return model
+        finally:
+            with self._lock:
+                pending[1] -= 1
+                if not pending[1]:
+                    del self._key_locks[key]
+
+    def add_eviction_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _notify(self, dropped):
+        # called without the lock held: listeners may take locks of their own
+        with self._lock:
+            listeners = list(self._listeners)
+        for key, model in dropped:
+            for listener in listeners:
+                listener(key, model)
+
+    def _evict(self, keep):
+        """Drop least recently used models over the budget; returns ``[(key, model), ...]``."""
+        evicted = []
+        if not self.max_bytes:
+            return evicted
+        total = sum(size for _model, size in self._entries.values())
+        for key in list(self._entries.keys()):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            model, size = self._entries.pop(key)
+            total -= size
+            self.evictions += 1
+            evicted.append((key, model))
+        return evicted
+
+    def remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._notify([(key, entry[0])])
+        return True
+
+    def clear(self):
+        with self._lock:
+            dropped = [(key, model) for key, (model, _size) in self._entries.items()]
+            self._entries.clear()
+        self._notify(dropped)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": [
+                    {"key": list(key), "size_bytes": size}
+                    for key, (_model, size) in self._entries.items()
+                ],
+                "total_bytes": sum(size for _model, size in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+            }
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    try:
+        max_mb = current_app.config.get("MODEL_REGISTRY_MAX_MB", 0)
+    except RuntimeError:
+        max_mb = None
+    if max_mb is not None:
+        _registry.max_bytes = int(max_mb) * MB
+    return _registry
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from flask import current_app
+from .metrics import CACHE_REQUESTS
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def audio_digest(path):
+    """SHA-256 of a file, memoized per (path, size, mtime) for the process lifetime."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+    if digest is None:
+        digest = file_sha256(path)
+        with _digests_lock:
+            _digests[memo_key] = digest
+    return digest
+
+
+def json_digest(value):
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# settings each engine reads that change its output (pacing and thread counts do not)
+ENGINE_SETTINGS = {
+    "whisper": (
+        "WHISPER_MODEL", "WHISPER_DEVICE", "WHISPER_COMPUTE_TYPE", "WHISPER_BEAM_SIZE",
+        "WHISPER_BEST_OF", "WHISPER_TEMPERATURE",
+        # batched decoding drops conditioning on the previous window
+        "WHISPER_BATCHING",
+    ),
+    "pyannote-whisper": ("WHISPER_MODEL", "WHISPER_DEVICE", "WHISPER_COMPUTE_TYPE", "PYANNOTE_MODEL"),
+    "vosk": ("VOSK_MODEL_PATH", "VOSK_SPEAKER_MODEL_PATH", "SPEAKER_MERGE_THRESHOLD"),
+    "synthetic": ("SYNTHETIC_SPEAKERS", "SYNTHETIC_MAX_SEGMENT_SECONDS", "SYNTHETIC_TURN_PAUSE_SECONDS"),
+}
+
+# the setting reported as ``model`` (cache metadata and admin invalidation)
+ENGINE_MODEL_SETTING = {
+    "whisper": "WHISPER_MODEL",
+    "pyannote-whisper": "WHISPER_MODEL",
+    "vosk": "VOSK_MODEL_PATH",
+}
+
+
+def engine_config(language=None, speaker_segments=None):
+    """Settings that change the transcription of a given audio file."""
+    config = current_app.config
+    engine = config.get("TRANSCRIPTION_ENGINE", "vosk").lower()
+    model_setting = ENGINE_MODEL_SETTING.get(engine)
+    return {
+        "engine": engine,
+        "model": config.get(model_setting) if model_setting else None,
+        "settings": {name: config.get(name) for name in ENGINE_SETTINGS.get(engine, ())},
+        "language": language,
+        "speaker_segments": json_digest(speaker_segments or []),
+        "speaker_segments_mode": config.get("SPEAKER_SEGMENTS_MODE") if speaker_segments else None,
+        # window cuts can change the text at their edges; the worker count cannot
+        "chunking": [config.get("CHUNK_SECONDS"), config.get("CHUNK_OVERLAP_SECONDS"), config.get("CHUNK_MIN_AUDIO_SECONDS")] if config.get("PARALLEL_WORKERS", 0) > 0 else None,
+    }
+
+
+class ResultCache:
+    """Size-bounded on-disk store of transcription results.
+
+    Each entry is ``<key>.json`` with a metadata line (engine, model, size)
+    followed by the result JSON, so invalidation only reads first lines.
+    Reads refresh the file's mtime, and eviction drops the oldest mtimes
+    first, which makes the store LRU across every process sharing the
+    directory. Hit/miss counters are per process.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def make_key(self, audio_path, config):
+        return json_digest({"audio": audio_digest(audio_path), "config": config})
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                f.readline()
+                result = json.loads(f.readline())
+            os.utime(path, None)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        with self._lock:
+            self.hits += 1
+        CACHE_REQUESTS.inc(result="hit")
+        return result
+
+    def put(self, key, result, meta=None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = dict(meta or {}, key=key, stored_at=time.time())
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(meta, default=str) + "\n")
+            f.write(json.dumps(result, default=str) + "\n")
+        os.replace(tmp, path)
+        with self._lock:
+            self.stores += 1
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        if not self.directory.exists():
+            return entries
+        for path in self.directory.glob("*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        if not self.max_bytes:
+            return
+        entries = self._entries()
+        total = sum(size for _mtime, size, _path in entries)
+        if total <= self.max_bytes:
+            return
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def invalidate(self, engine=None, model=None):
+        """Delete entries matching ``engine`` and/or ``model`` (all entries if both are None)."""
+        removed = 0
+        for _mtime, _size, path in self._entries():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    meta = json.loads(f.readline())
+            except (OSError, ValueError):
+                meta = {}
+            if engine is not None and meta.get("engine") != engine:
+                continue
+            if model is not None and meta.get("model") != model:
+                continue
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self.invalidations += removed
+        return removed
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                "entries": len(entries),
+                "size_bytes": sum(size for _mtime, size, _path in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Cache configured by the current app, or ``None`` when disabled."""
+    config = current_app.config
+    if not config.get("RESULT_CACHE_ENABLED", True):
+        return None
+    directory = os.path.abspath(config.get("RESULT_CACHE_DIR", "cache/results"))
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = ResultCache(directory, 0)
+            _caches[directory] = cache
+        cache.max_bytes = int(config.get("RESULT_CACHE_MAX_MB", 1024)) * 1024 * 1024
+    return cache
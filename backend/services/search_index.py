@@ -0,0 +1,190 @@
+import re
+import threading
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from backend import db
+from backend.models import Transcription, TranscriptionSegment
+from .segment_store import ensure_segment_rows, segment_dict
+
+try:
+    import snowballstemmer
+except ImportError:
+    snowballstemmer = None
+
+# SQLite: an FTS5 table over stemmed segment text. ``doc`` holds the
+# transcription id as one token so a transcription's rows can be found
+# (and replaced) through the index instead of a full scan.
+FTS_TABLE = "segment_search"
+_CREATE_FTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "terms, doc, transcription_id UNINDEXED, segment_index UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+# PostgreSQL: the GIN index on to_tsvector('spanish', text) declared on
+# TranscriptionSegment; it is maintained by the segment inserts themselves.
+PG_CONFIG = "spanish"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_local = threading.local()
+_fts_available = None
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _stemmer():
+    # snowballstemmer stemmers keep state while stemming; one per thread
+    stemmer = getattr(_local, "stemmer", None)
+    if stemmer is None and snowballstemmer is not None:
+        stemmer = _local.stemmer = snowballstemmer.stemmer("spanish")
+    return stemmer
+
+
+def search_terms(value):
+    """Lowercased words of ``value``, reduced to their Spanish stems when snowballstemmer is installed."""
+    words = _WORD.findall((value or "").lower())
+    stemmer = _stemmer()
+    return stemmer.stemWords(words) if stemmer is not None else words
+
+
+def _doc_token(tid):
+    return re.sub(r"\W", "", str(tid)).lower()
+
+
+def init_search_index():
+    """Create the SQLite FTS5 table if needed; PostgreSQL needs nothing beyond ``create_all``."""
+    global _fts_available
+    if _dialect() != "sqlite":
+        return True
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text(_CREATE_FTS))
+        _fts_available = True
+    except OperationalError as e:
+        print(f"Warning: SQLite FTS5 not available ({e}). /api/search falls back to substring matching.")
+        _fts_available = False
+    if snowballstemmer is None:
+        print("Warning: snowballstemmer not installed. SQLite search matches word prefixes instead of Spanish stems.")
+    return _fts_available
+
+
+def _fts():
+    global _fts_available
+    if _fts_available is None:
+        init_search_index()
+    return _fts_available
+
+
+def index_segments(tid, segments):
+    """Replace the search rows of one transcription; the caller commits.
+
+    Called once when a transcription completes, so the index grows
+    incrementally. On PostgreSQL the GIN index already covers the rows.
+    """
+    if _dialect() != "sqlite" or not _fts():
+        return
+    doc = _doc_token(tid)
+    db.session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match)"),
+        {"match": f'doc : "{doc}"'}
+    )
+    rows = [
+        {"terms": " ".join(search_terms(seg.get("text"))), "doc": doc, "tid": tid, "n": n}
+        for n, seg in enumerate(segments or [])
+    ]
+    if rows:
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE} (terms, doc, transcription_id, segment_index) VALUES (:terms, :doc, :tid, :n)"),
+            rows
+        )
+
+
+def _fts_query(terms):
+    # without stems, a prefix match stands in for Spanish inflection
+    suffix = "" if _stemmer() is not None else "*"
+    return "terms : (" + " AND ".join('"%s"%s' % (term.replace('"', ""), suffix) for term in terms) + ")"
+
+
+_HIT_COLUMNS = (
+    "seg.transcription_id, seg.segment_index, seg.start_time, seg.end_time, seg.speaker, seg.text, t.filename"
+)
+
+
+def search(query, limit=20, offset=0, speaker=None, transcription_id=None):
+    """Segment-level hits for ``query`` in completed transcriptions, best first."""
+    params = {"limit": limit, "offset": offset}
+    filters = ["t.status = 'completed'"]
+    if speaker:
+        filters.append("seg.speaker = :speaker")
+        params["speaker"] = speaker
+    if transcription_id:
+        filters.append("seg.transcription_id = :tid")
+        params["tid"] = transcription_id
+
+    dialect = _dialect()
+    if dialect == "postgresql":
+        params["q"] = query
+        sql = (
+            f"SELECT {_HIT_COLUMNS}, ts_rank(to_tsvector('{PG_CONFIG}', seg.text), q) AS score "
+            "FROM transcription_segments seg JOIN transcriptions t ON t.id = seg.transcription_id, "
+            f"websearch_to_tsquery('{PG_CONFIG}', :q) q "
+            f"WHERE to_tsvector('{PG_CONFIG}', seg.text) @@ q AND " + " AND ".join(filters) +
+            " ORDER BY score DESC, seg.transcription_id, seg.segment_index LIMIT :limit OFFSET :offset"
+        )
+    elif dialect == "sqlite" and _fts():
+        terms = search_terms(query)
+        if not terms:
+            return []
+        params["match"] = _fts_query(terms)
+        # bm25 is lower for better matches
+        sql = (
+            f"SELECT {_HIT_COLUMNS}, -bm25({FTS_TABLE}) AS score "
+            f"FROM {FTS_TABLE} f "
+            "JOIN transcription_segments seg ON seg.transcription_id = f.transcription_id AND seg.segment_index = f.segment_index "
+            "JOIN transcriptions t ON t.id = seg.transcription_id "
+            f"WHERE {FTS_TABLE} MATCH :match AND " + " AND ".join(filters) +
+            f" ORDER BY bm25({FTS_TABLE}) LIMIT :limit OFFSET :offset"
+        )
+    else:
+        params["like"] = f"%{query.lower()}%"
+        sql = (
+            f"SELECT {_HIT_COLUMNS}, 1.0 AS score "
+            "FROM transcription_segments seg JOIN transcriptions t ON t.id = seg.transcription_id "
+            "WHERE lower(seg.text) LIKE :like AND " + " AND ".join(filters) +
+            " ORDER BY t.created_at DESC, seg.segment_index LIMIT :limit OFFSET :offset"
+        )
+    rows = db.session.execute(text(sql), params).all()
+    return [
+        {
+            "transcription_id": row.transcription_id,
+            "filename": row.filename,
+            "segment_index": row.segment_index,
+            "start": row.start_time,
+            "end": row.end_time,
+            "speaker": row.speaker,
+            "text": row.text,
+            "score": round(float(row.score or 0.0), 4),
+        }
+        for row in rows
+    ]
+
+
+def reindex(transcription_ids=None):
+    """Index completed transcriptions from their segment rows (existing databases, or after a stemmer change)."""
+    if transcription_ids is None:
+        transcription_ids = db.session.execute(
+            select(Transcription.id).where(Transcription.status == "completed")
+        ).scalars().all()
+    count = 0
+    for tid in transcription_ids:
+        ensure_segment_rows(tid)
+        rows = db.session.execute(
+            select(TranscriptionSegment)
+            .where(TranscriptionSegment.transcription_id == tid)
+            .order_by(TranscriptionSegment.segment_index)
+        ).scalars().all()
+        index_segments(tid, [segment_dict(row) for row in rows])
+        db.session.commit()
+        count += 1
+    return count
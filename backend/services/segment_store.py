@@ -0,0 +1,99 @@
+from sqlalchemy import select, insert, delete, exists
+from sqlalchemy.exc import IntegrityError
+from backend import db
+from backend.models import Transcription, TranscriptionSegment
+
+
+def _row(tid, index, seg):
+    return {
+        "transcription_id": tid,
+        "segment_index": index,
+        "start_time": float(seg.get("start") or 0.0),
+        "end_time": float(seg.get("end") or 0.0),
+        "text": seg.get("text"),
+        "speaker": seg.get("speaker") or seg.get("speaker_id"),
+        "words": seg.get("words") or None,
+    }
+
+
+def segment_rows(tid, segments, first_index=0):
+    return [_row(tid, first_index + n, seg) for n, seg in enumerate(segments)]
+
+
+def insert_rows(rows):
+    """One multi-row INSERT (executemany) for all ``rows``; the caller commits."""
+    if rows:
+        db.session.execute(insert(TranscriptionSegment), rows)
+
+
+def insert_segments(tid, segments, first_index=0):
+    insert_rows(segment_rows(tid, segments, first_index))
+
+
+def clear_segments(tid):
+    db.session.execute(delete(TranscriptionSegment).where(TranscriptionSegment.transcription_id == tid))
+
+
+def replace_segments(tid, segments):
+    clear_segments(tid)
+    insert_segments(tid, segments)
+
+
+def segment_dict(row, with_index=False):
+    """The segment in the shape stored in ``Transcription.segments``."""
+    seg = {"start": row.start_time, "end": row.end_time, "text": row.text, "speaker": row.speaker}
+    if row.words:
+        seg["words"] = row.words
+    if with_index:
+        seg["index"] = row.segment_index
+    return seg
+
+
+def ensure_segment_rows(tid):
+    """Fill the table from the JSON column for transcriptions stored before it existed."""
+    has_rows = db.session.execute(select(exists().where(TranscriptionSegment.transcription_id == tid))).scalar()
+    if has_rows:
+        return
+    segments = db.session.execute(select(Transcription.segments).where(Transcription.id == tid)).scalar()
+    if not segments:
+        return
+    try:
+        insert_segments(tid, segments)
+        db.session.commit()
+    except IntegrityError:
+        # another request backfilled it first
+        db.session.rollback()
+
+
+def query_segments(tid, start=None, end=None, speaker=None, from_index=None, limit=None):
+    """Rows of ``tid`` overlapping ``[start, end)`` seconds in segment order, from ``from_index`` on."""
+    q = select(TranscriptionSegment).where(TranscriptionSegment.transcription_id == tid)
+    if start is not None:
+        q = q.where(TranscriptionSegment.end_time > start)
+    if end is not None:
+        q = q.where(TranscriptionSegment.start_time < end)
+    if speaker:
+        q = q.where(TranscriptionSegment.speaker == speaker)
+    if from_index is not None:
+        q = q.where(TranscriptionSegment.segment_index >= from_index)
+    q = q.order_by(TranscriptionSegment.segment_index)
+    if limit is not None:
+        q = q.limit(limit)
+    return db.session.execute(q).scalars().all()
+
+
+def iter_segments(tid, batch_size=500):
+    """Segment dicts of ``tid`` in order, read ``batch_size`` rows at a time.
+
+    Exports walk huge transcriptions through this instead of loading the
+    ``segments`` JSON column, so memory stays bounded by one batch.
+    """
+    ensure_segment_rows(tid)
+    next_index = 0
+    while True:
+        rows = query_segments(tid, from_index=next_index, limit=batch_size)
+        for row in rows:
+            yield segment_dict(row)
+        if len(rows) < batch_size:
+            return
+        next_index = rows[-1].segment_index + 1
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class OnlineSpeakerClusterer:
+    """Greedy online speaker clustering over x-vector embeddings.
+
+    Each embedding joins the speaker whose mean embedding is closest in
+    cosine distance, or starts a new speaker when no mean is closer than
+    ``threshold``. Labels are final when returned, so callers can emit
+    segments while audio is still being decoded.
+
+    Speakers are kept as running sums in a NumPy matrix with a matching
+    matrix of unit-length means, so each ``add`` is one matrix-vector
+    product against every speaker instead of re-averaging member lists.
+    """
+
+    def __init__(self, threshold=0.7):
+        self.threshold = threshold
+        self.sums = None
+        self.units = None
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.size = 0
+
+    def _grow(self, dim):
+        capacity = max(8, 2 * len(self.counts))
+        sums = np.zeros((capacity, dim))
+        units = np.zeros((capacity, dim))
+        counts = np.zeros(capacity, dtype=np.int64)
+        if self.size:
+            sums[:self.size] = self.sums[:self.size]
+            units[:self.size] = self.units[:self.size]
+            counts[:self.size] = self.counts[:self.size]
+        self.sums, self.units, self.counts = sums, units, counts
+
+    def add(self, embedding):
+        embedding = np.asarray(embedding, dtype=np.float64)
+        norm = np.linalg.norm(embedding)
+        best = -1
+        if self.size and norm > 0:
+            similarities = self.units[:self.size] @ (embedding / norm)
+            best = int(np.argmax(similarities))
+            if 1.0 - similarities[best] >= self.threshold:
+                best = -1
+        if best < 0:
+            if self.sums is None or self.size == len(self.counts):
+                self._grow(len(embedding))
+            best = self.size
+            self.size += 1
+        self.sums[best] += embedding
+        self.counts[best] += 1
+        mean_norm = np.linalg.norm(self.sums[best])
+        if mean_norm > 0:
+            # the direction of the sum is the direction of the mean
+            self.units[best] = self.sums[best] / mean_norm
+        return f"speaker_{best}"
+
+    def merge(self, threshold):
+        """Offline pass: agglomerate speakers whose means are closer than ``threshold``.
+
+        The closest pair is merged first (centroid linkage, weighted by
+        member count) until no pair is under ``threshold``. Returns a
+        ``{old_label: new_label}`` map with labels renumbered in order of
+        first appearance; the clusterer itself is left unchanged.
+        """
+        n = self.size
+        if n < 2:
+            return {f"speaker_{i}": f"speaker_{i}" for i in range(n)}
+        sums = self.sums[:n].copy()
+        units = self.units[:n].copy()
+        distances = 1.0 - units @ units.T
+        np.fill_diagonal(distances, np.inf)
+        alive = np.ones(n, dtype=bool)
+        parent = np.arange(n)
+        while True:
+            flat = int(np.argmin(distances))
+            i, j = divmod(flat, n)
+            if distances[i, j] >= threshold:
+                break
+            a, b = min(i, j), max(i, j)
+            sums[a] += sums[b]
+            units[a] = sums[a] / (np.linalg.norm(sums[a]) or 1.0)
+            alive[b] = False
+            parent[parent == b] = a
+            distances[b, :] = np.inf
+            distances[:, b] = np.inf
+            row = 1.0 - units @ units[a]
+            row[~alive] = np.inf
+            row[a] = np.inf
+            distances[a, :] = row
+            distances[:, a] = row
+        renumber = {}
+        for root in parent:
+            renumber.setdefault(int(root), len(renumber))
+        return {f"speaker_{i}": f"speaker_{renumber[int(parent[i])]}" for i in range(n)}
+
+
+def relabel_segments(segments, mapping):
+    """Apply a ``merge`` map to the ``speaker`` of result segments, in place."""
+    for seg in segments:
+        speaker = seg.get("speaker")
+        if speaker in mapping:
+            seg["speaker"] = mapping[speaker]
+    return segments
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+
+def copy_stream(stream, out, chunk_size, digest=None):
+    """Copy ``stream`` into the open file ``out`` in ``chunk_size`` blocks; return bytes written."""
+    written = 0
+    while True:
+        block = stream.read(chunk_size)
+        if not block:
+            break
+        out.write(block)
+        if digest is not None:
+            digest.update(block)
+        written += len(block)
+    return written
+
+
+def commit_object(tmp_path, folder, sha256):
+    """Move a fully written temp file to its content-addressed name.
+
+    Objects are named by their SHA-256 alone (ffmpeg detects formats from
+    the content), so when an identical file is already stored the temp file
+    is discarded and every upload of that content shares one object.
+    """
+    final = Path(folder) / sha256
+    if final.exists():
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, final)
+    return final
+
+
+def store_stream(stream, folder, chunk_size):
+    """Stream a request body to disk while hashing it. Returns ``(path, size, sha256)``."""
+    incoming = Path(folder) / ".incoming"
+    incoming.mkdir(parents=True, exist_ok=True)
+    tmp_path = incoming / f"{uuid.uuid4()}.part"
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as out:
+            size = copy_stream(stream, out, chunk_size, digest)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    sha256 = digest.hexdigest()
+    return commit_object(tmp_path, folder, sha256), size, sha256
+
+
+class UploadSessions:
+    """Resumable uploads kept as ``<id>.part`` + ``<id>.json`` under ``<folder>/.sessions``.
+
+    The size of the part file is the session offset, so any process sharing
+    the folder can continue a session. The running hash of chunks appended by
+    this process is kept in memory and reused at finalize when it still
+    covers the whole file; otherwise the part file is hashed again.
+    Chunks are written under a lock of their own session only, so a slow
+    client does not hold up the others.
+    """
+
+    def __init__(self, folder):
+        self.root = Path(folder) / ".sessions"
+        # guards the two dicts below, never held during file I/O
+        self._lock = threading.Lock()
+        self._digests = {}
+        self._session_locks = {}
+
+    def _session_lock(self, sid):
+        sid = str(uuid.UUID(sid))
+        with self._lock:
+            return self._session_locks.setdefault(sid, threading.Lock())
+
+    def _forget(self, sid):
+        sid = str(uuid.UUID(sid))
+        with self._lock:
+            self._digests.pop(sid, None)
+            self._session_locks.pop(sid, None)
+
+    def _paths(self, sid):
+        sid = str(uuid.UUID(sid))
+        return self.root / f"{sid}.part", self.root / f"{sid}.json"
+
+    def create(self, filename, content_type, size=None):
+        self.root.mkdir(parents=True, exist_ok=True)
+        sid = str(uuid.uuid4())
+        part, meta_path = self._paths(sid)
+        meta = {"id": sid, "filename": filename, "content_type": content_type, "size": size}
+        part.touch()
+        meta_path.write_text(json.dumps(meta), encoding="utf-8")
+        with self._lock:
+            self._digests[sid] = (hashlib.sha256(), 0)
+        return dict(meta, offset=0)
+
+    def get(self, sid):
+        try:
+            part, meta_path = self._paths(sid)
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            return dict(meta, offset=part.stat().st_size)
+        except (ValueError, OSError):
+            return None
+
+    def append(self, sid, offset, stream, chunk_size):
+        """Append ``stream`` at ``offset``. Returns the new offset, or ``None`` on offset mismatch.
+
+        Raises ``KeyError`` when the session is gone (aborted or finalized meanwhile).
+        """
+        part, _meta_path = self._paths(sid)
+        sid = part.stem
+        with self._session_lock(sid):
+            try:
+                # r+b, not ab: a session removed meanwhile must not be recreated
+                out = open(part, "r+b")
+            except FileNotFoundError:
+                self._forget(sid)
+                raise KeyError(sid)
+            with out:
+                current = out.seek(0, os.SEEK_END)
+                if offset != current:
+                    return None
+                with self._lock:
+                    digest, hashed = self._digests.get(sid, (None, None))
+                if hashed != current:
+                    digest = None
+                written = copy_stream(stream, out, chunk_size, digest)
+            with self._lock:
+                if digest is not None:
+                    self._digests[sid] = (digest, current + written)
+                else:
+                    self._digests.pop(sid, None)
+            return current + written
+
+    def finalize(self, sid, folder, chunk_size):
+        """Turn a complete session into a stored object. Returns ``(path, size, sha256, meta)``."""
+        try:
+            lock = self._session_lock(sid)
+        except ValueError:
+            raise KeyError(sid)
+        # waits for a chunk still being written to this session
+        with lock:
+            meta = self.get(sid)
+            if meta is None:
+                self._forget(sid)
+                raise KeyError(sid)
+            part, meta_path = self._paths(sid)
+            sid = part.stem
+            size = meta["offset"]
+            if meta.get("size") is not None and int(meta["size"]) != size:
+                raise ValueError(f"upload incomplete: {size} of {meta['size']} bytes received")
+            with self._lock:
+                digest, hashed = self._digests.get(sid, (None, None))
+            if digest is None or hashed != size:
+                digest = hashlib.sha256()
+                with open(part, "rb") as f:
+                    for block in iter(lambda: f.read(chunk_size), b""):
+                        digest.update(block)
+            sha256 = digest.hexdigest()
+            path = commit_object(part, folder, sha256)
+            try:
+                meta_path.unlink()
+            except OSError:
+                pass
+        self._forget(sid)
+        return path, size, sha256, meta
+
+    def abort(self, sid):
+        try:
+            part, meta_path = self._paths(sid)
+        except ValueError:
+            return False
+        self._forget(sid)
+        found = False
+        for path in (part, meta_path):
+            try:
+                path.unlink()
+                found = True
+            except OSError:
+                pass
+        return found
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_upload_sessions(folder):
+    folder = os.path.abspath(folder)
+    with _sessions_lock:
+        sessions = _sessions.get(folder)
+        if sessions is None:
+            sessions = UploadSessions(folder)
+            _sessions[folder] = sessions
+    return sessions
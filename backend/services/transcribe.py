@@ -1,30 +1,76 @@
 from .transcription_engine import get_transcription_engine
-from .audio_segmenter import segment_audio_by_speakers, cleanup_segments
+from .audio_segmenter import segment_audio_by_speakers, cleanup_segments, normalize_speaker_segments
+from .intervals import IntervalIndex
+from .chunked_transcription import chunking_applies, transcribe_chunked
+from .job_control import checkpoint, JobCancelled
+from .convert import PcmStream
+from flask import current_app
 import tempfile
 import os
 from pathlib import Path
 
 
+def _speaker_text(speaker_id, text):
+    return f"[{speaker_id.replace('speaker_', 'Ponente ')}]: {text}"
+
+
+def streaming_applies(engine, speaker_segments=None, audio_seconds=None):
+    """Whether ``transcribe_audio`` can take a ``PcmStream`` instead of a WAV path.
+
+    Cutting per client speaker segment and the parallel chunked mode read
+    the file at arbitrary offsets, so they keep needing it on disk.
+    """
+    config = current_app.config
+    if not engine.supports_streaming:
+        return False
+    if speaker_segments and config.get("SPEAKER_SEGMENTS_MODE", "single_pass") != "single_pass":
+        return False
+    if config.get("PARALLEL_WORKERS", 0) > 0 and engine.supports_chunking:
+        return audio_seconds is not None and audio_seconds < config.get("CHUNK_MIN_AUDIO_SECONDS", 300)
+    return True
+
+
+def _run_engine(engine, path, **kwargs):
+    if isinstance(path, PcmStream):
+        return engine.transcribe_stream(path, sample_rate=path.sample_rate, **kwargs)
+    # long normalized files go through the parallel chunked path when it is enabled
+    if chunking_applies(engine, path):
+        return transcribe_chunked(engine, path, **kwargs)
+    return engine.transcribe(path, **kwargs)
+
+
 def transcribe_audio(path, **kwargs):
     engine = get_transcription_engine()
     speaker_segments = kwargs.get('speaker_segments', [])
+    mode = kwargs.pop('speaker_segments_mode', None) or current_app.config.get("SPEAKER_SEGMENTS_MODE", "single_pass")
     
     if not speaker_segments:
-        return engine.transcribe(path, **kwargs)
+        return _run_engine(engine, path, **kwargs)
+    
+    if mode == "single_pass":
+        return _transcribe_single_pass(engine, path, speaker_segments, **kwargs)
+    if isinstance(path, PcmStream):
+        raise ValueError(f"speaker segments mode {mode!r} needs the audio as a file")
     
     with tempfile.TemporaryDirectory() as temp_dir:
         segments_info = segment_audio_by_speakers(path, speaker_segments, temp_dir)
         
         if not segments_info:
-            return engine.transcribe(path, **kwargs)
+            return _run_engine(engine, path, **kwargs)
         
+        # engine segments are relative to each piece; emit them once shifted
+        on_segment = kwargs.pop('on_segment', None)
         speaker_transcriptions = {}
         all_segments = []
         full_text_parts = []
         
         for segment in segments_info:
+            checkpoint(segment['start_time'])
             try:
-                segment_result = engine.transcribe(segment['audio_path'], language='es', **kwargs)
+                source = segment['audio'] if 'audio' in segment else segment['audio_path']
+                if 'sample_rate' in segment:
+                    kwargs['sample_rate'] = segment['sample_rate']
+                segment_result = engine.transcribe(source, language='es', **kwargs)
                 speaker_id = segment['speaker_id']
                 
                 if speaker_id not in speaker_transcriptions:
@@ -48,6 +94,8 @@ def transcribe_audio(path, **kwargs):
                         }
                         all_segments.append(adjusted_seg)
                         speaker_transcriptions[speaker_id]['segments'].append(adjusted_seg)
+                        if on_segment:
+                            on_segment(adjusted_seg)
                 
                 if segment_text:
                     full_text_parts.append({
@@ -56,6 +104,8 @@ def transcribe_audio(path, **kwargs):
                         'text': segment_text
                     })
                 
+            except JobCancelled:
+                raise
             except Exception as e:
                 print(f"Error transcribing segment for {segment['speaker_id']}: {e}")
                 continue
@@ -65,7 +115,7 @@ def transcribe_audio(path, **kwargs):
         all_segments.sort(key=lambda x: x['start'])
         full_text_parts.sort(key=lambda x: x['start_time'])
         
-        full_text = '\n'.join([f"[{part['speaker_id'].replace('speaker_', 'Ponente ')}]: {part['text']}" for part in full_text_parts if part['text'].strip()])
+        full_text = '\n'.join([_speaker_text(part['speaker_id'], part['text']) for part in full_text_parts if part['text'].strip()])
         
         total_duration = max((seg['end'] for seg in all_segments), default=0)
         if not total_duration and segments_info:
@@ -78,3 +128,88 @@ def transcribe_audio(path, **kwargs):
             'duration': total_duration,
             'speaker_segments_processed': len(segments_info)
         }
+
+
+def _transcribe_single_pass(engine, path, client_segments, **kwargs):
+    """Transcribe the whole file once and split the words at the client's speaker intervals.
+
+    Each word goes to the interval it overlaps most; words outside every
+    interval are dropped, as the per-segment mode never decodes that audio.
+    Output segments break at engine segment boundaries and at speaker changes.
+    """
+    intervals = normalize_speaker_segments(client_segments)
+    if not intervals:
+        return _run_engine(engine, path, **kwargs)
+    index = IntervalIndex([(s['start_time'], s['end_time'], n) for n, s in enumerate(intervals)])
+    
+    all_segments = []
+    interval_words = [[] for _ in intervals]
+    on_segment = kwargs.get('on_segment')
+    
+    def split_engine_segment(seg):
+        # called as the engine emits each segment, so output streams too
+        words = seg.get('words') or [{'start': seg['start'], 'end': seg['end'], 'word': seg.get('text', '')}]
+        current = None
+        current_interval = None
+        pieces = []
+        for word in words:
+            text = (word.get('word') or '').strip()
+            if not text:
+                continue
+            n = index.best_overlap(word['start'], word['end'])
+            if n is None:
+                current = None
+                continue
+            n = index.values[n]
+            interval_words[n].append(text)
+            if current is not None and current_interval == n:
+                current['end'] = word['end']
+                current['text'] += ' ' + text
+                continue
+            current = {
+                'start': word['start'],
+                'end': word['end'],
+                'text': text,
+                'speaker': intervals[n]['speaker_id']
+            }
+            current_interval = n
+            pieces.append(current)
+        for piece in pieces:
+            all_segments.append(piece)
+            if on_segment:
+                on_segment(piece)
+    
+    kwargs['language'] = kwargs.get('language', 'es')
+    kwargs['with_words'] = True
+    kwargs['on_segment'] = split_engine_segment
+    result = _run_engine(engine, path, **kwargs)
+    
+    speaker_transcriptions = {}
+    full_text_parts = []
+    for interval, words in zip(intervals, interval_words):
+        speaker_id = interval['speaker_id']
+        speaker = speaker_transcriptions.setdefault(speaker_id, {
+            'speaker_id': speaker_id,
+            'text': '',
+            'segments': []
+        })
+        if words:
+            text = ' '.join(words)
+            speaker['text'] = f"{speaker['text']} {text}".strip()
+            full_text_parts.append((interval['start_time'], speaker_id, text))
+    for seg in all_segments:
+        speaker_transcriptions[seg['speaker']]['segments'].append(seg)
+    
+    all_segments.sort(key=lambda x: x['start'])
+    full_text_parts.sort(key=lambda x: x[0])
+    full_text = '\n'.join(_speaker_text(speaker_id, text) for _start, speaker_id, text in full_text_parts)
+    
+    total_duration = result.get('duration') or max((seg['end'] for seg in all_segments), default=0)
+    
+    return {
+        'text': full_text,
+        'segments': all_segments,
+        'speakers': list(speaker_transcriptions.values()),
+        'duration': total_duration,
+        'speaker_segments_processed': len(intervals)
+    }
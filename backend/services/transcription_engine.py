@@ -1,14 +1,174 @@
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
+from .model_registry import get_model_registry, estimate_whisper_size, directory_size
+from .speaker_clustering import OnlineSpeakerClusterer, relabel_segments
+from .intervals import IntervalIndex
+from .whisper_batching import get_whisper_batcher
+from .metrics import stage, current_trace
+from .audio_segmenter import read_pcm_wav
+from .job_control import checkpoint, JobCancelled
 
 
 class TranscriptionEngine(ABC):
     @abstractmethod
     def transcribe(self, audio_path, **kwargs):
+        """Transcribe a WAV path or an in-memory int16/float32 sample array.
+
+        Arrays are 16 kHz mono unless ``sample_rate`` is passed in kwargs.
+        With ``with_words=True`` every segment also carries a ``words`` list
+        of ``{start, end, word}``. ``on_segment``, when given, is called with
+        each result segment as soon as it is final.
+        """
+        pass
+
+    def load_models(self):
+        """Load the models this engine needs into the registry (warm-up)."""
         pass
 
+    # whether windows of a file can be transcribed independently and stitched
+    # (see chunked_transcription); engines that need the whole file say False
+    supports_chunking = False
+
+    def result_duration(self, segments, audio_seconds):
+        """``duration`` of a stitched chunked result, matching what ``transcribe`` reports."""
+        return audio_seconds
+
+    # whether transcribe_stream can take audio that only arrives in order
+    # (convert.PcmStream); engines that need the whole file at once say False
+    supports_streaming = False
+
+    def transcribe_stream(self, blocks, sample_rate=16000, **kwargs):
+        """Transcribe 16-bit mono PCM ``bytes`` blocks as they arrive.
+
+        By default the blocks are cut into windows and stitched like the
+        chunked mode, so only about one window is in memory at a time.
+        Returns the same keys as ``transcribe``.
+        """
+        from .chunked_transcription import transcribe_stream_windows
+        return transcribe_stream_windows(self, blocks, sample_rate, **kwargs)
+
+
+def _is_samples(audio):
+    return hasattr(audio, "dtype") and hasattr(audio, "shape")
+
+
+def _as_float32(audio):
+    """faster-whisper takes paths or float32 arrays in [-1, 1]; convert int16 PCM views."""
+    if _is_samples(audio) and audio.dtype.kind == "i":
+        return audio.astype("float32") / 32768.0
+    return audio
+
+
+def _whisper_words(seg):
+    return [
+        {"start": round(w.start, 2), "end": round(w.end, 2), "word": w.word.strip()}
+        for w in (seg.words or [])
+    ]
+
+
+def _vosk_words(result):
+    return [
+        {"start": w.get("start"), "end": w.get("end"), "word": w.get("word", "")}
+        for w in result.get("result", [])
+    ]
+
+
+def _split_at_speaker_changes(seg, turns, with_words=False):
+    """Result segments for one ASR segment, split where the diarized speaker changes.
+
+    ``seg`` is a stage dict (``_asr_segment``). Each word takes the turn it
+    overlaps most (looked up in the ``turns`` IntervalIndex); words outside
+    every turn keep the previous speaker. An unsplit segment keeps Whisper's
+    own bounds and text.
+    """
+    words = seg["words"]
+    speakers = []
+    previous = None
+    for w in words:
+        i = turns.best_overlap(w["start"], w["end"])
+        previous = turns.values[i] if i is not None else previous
+        speakers.append(previous)
+    # leading words before any turn belong to the first diarized speaker
+    first = next((speaker for speaker in speakers if speaker is not None), None)
+    speakers = [speaker or first for speaker in speakers]
+    if first is None or len(set(speakers)) == 1:
+        if first is None:
+            i = turns.best_overlap(seg["start"], seg["end"])
+            first = turns.values[i] if i is not None else "speaker_0"
+        result_segment = {"start": seg["start"], "end": seg["end"], "text": seg["text"], "speaker": first}
+        if with_words:
+            result_segment["words"] = _stage_words(words)
+        return [result_segment]
+    
+    pieces = []
+    for w, speaker in zip(words, speakers):
+        if pieces and pieces[-1]["speaker"] == speaker:
+            pieces[-1]["_words"].append(w)
+        else:
+            pieces.append({"speaker": speaker, "_words": [w]})
+    result_segments = []
+    for n, piece in enumerate(pieces):
+        piece_words = piece.pop("_words")
+        result_segment = {
+            "start": seg["start"] if n == 0 else piece_words[0]["start"],
+            "end": seg["end"] if n == len(pieces) - 1 else piece_words[-1]["end"],
+            "text": "".join(w["word"] for w in piece_words),
+            "speaker": piece["speaker"]
+        }
+        if with_words:
+            result_segment["words"] = _stage_words(piece_words)
+        result_segments.append(result_segment)
+    return result_segments
+
+
+def _asr_segment(seg):
+    # word text keeps Whisper's leading space so split pieces join like the original
+    return {
+        "start": seg.start,
+        "end": seg.end,
+        "text": seg.text,
+        "words": [{"start": w.start, "end": w.end, "word": w.word} for w in (seg.words or [])]
+    }
+
+
+def _stage_words(words):
+    return [{"start": round(w["start"], 2), "end": round(w["end"], 2), "word": w["word"].strip()} for w in words]
+
+
+def _whisper_model_key():
+    device = current_app.config.get("WHISPER_DEVICE", "cpu")
+    return (
+        "whisper",
+        current_app.config.get("WHISPER_MODEL", "large-v3"),
+        device,
+        current_app.config.get("WHISPER_COMPUTE_TYPE", "float32"),
+        current_app.config.get("WHISPER_CPU_THREADS", 4) if device == "cpu" else 0
+    )
+
+
+def _load_whisper_model(WhisperModel):
+    key = _whisper_model_key()
+    _kind, model_name, device, compute_type, cpu_threads = key
+    return get_model_registry().get(
+        key,
+        lambda: WhisperModel(
+            model_name,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads
+        ),
+        size_bytes=estimate_whisper_size(model_name, compute_type)
+    )
+
 
 class WhisperEngine(TranscriptionEngine):
+    supports_chunking = True
+    supports_streaming = True
+    
     def __init__(self):
         try:
             from faster_whisper import WhisperModel
@@ -16,59 +176,78 @@ class WhisperEngine(TranscriptionEngine):
         except ImportError:
             self.WhisperModel = None
     
+    def load_models(self):
+        if self.WhisperModel is None:
+            raise RuntimeError("faster-whisper not available")
+        return _load_whisper_model(self.WhisperModel)
+    
     def transcribe(self, audio_path, **kwargs):
         if self.WhisperModel is None:
             raise RuntimeError("faster-whisper not available")
-        model_name = current_app.config.get("WHISPER_MODEL", "large-v3")
-        device = current_app.config.get("WHISPER_DEVICE", "cpu")
         language = kwargs.get("language", "es")
         
         try:
-            compute_type = current_app.config.get("WHISPER_COMPUTE_TYPE", "float32")
             beam_size = current_app.config.get("WHISPER_BEAM_SIZE", 5)
             best_of = current_app.config.get("WHISPER_BEST_OF", 5)
             temperature = current_app.config.get("WHISPER_TEMPERATURE", 0.0)
             
-            model = self.WhisperModel(
-                model_name, 
-                device=device,
-                compute_type=compute_type,
-                cpu_threads=4 if device == "cpu" else 0
-            )
-            segments, info = model.transcribe(
-                audio_path, 
-                language=language,
-                word_timestamps=True,
-                vad_filter=True,
-                vad_parameters=dict(
-                    min_silence_duration_ms=300,
-                    threshold=0.5,
-                    min_speech_duration_ms=250
-                ),
-                beam_size=beam_size,
-                best_of=best_of,
-                temperature=temperature,
-                condition_on_previous_text=True,
-                compression_ratio_threshold=2.4,
-                log_prob_threshold=-1.0,
-                no_speech_threshold=0.6,
-                repetition_penalty=1.0,
-                length_penalty=1.0
-            )
+            model = self.load_models()
+            transcribe = model.transcribe
+            options = {}
+            if current_app.config.get("WHISPER_BATCHING"):
+                # windows of concurrent requests share encoder/decoder batches
+                transcribe = get_whisper_batcher(
+                    _whisper_model_key(),
+                    model,
+                    current_app.config.get("WHISPER_BATCH_SIZE", 8),
+                    current_app.config.get("WHISPER_BATCH_MAX_WAIT_MS", 50) / 1000.0
+                ).transcribe
+                options["without_timestamps"] = False
+            # faster-whisper runs VAD and feature extraction before returning the generator
+            with stage("vad"):
+                segments, info = transcribe(
+                    _as_float32(audio_path), 
+                    language=language,
+                    word_timestamps=True,
+                    vad_filter=True,
+                    vad_parameters=dict(
+                        min_silence_duration_ms=300,
+                        threshold=0.5,
+                        min_speech_duration_ms=250
+                    ),
+                    beam_size=beam_size,
+                    best_of=best_of,
+                    temperature=temperature,
+                    condition_on_previous_text=True,
+                    compression_ratio_threshold=2.4,
+                    log_prob_threshold=-1.0,
+                    no_speech_threshold=0.6,
+                    repetition_penalty=1.0,
+                    length_penalty=1.0,
+                    **options
+                )
             
             result_segments = []
             full_text = []
             
-            for seg in segments:
-                text = seg.text.strip()
-                if text:
-                    result_segments.append({
-                        "start": round(seg.start, 2),
-                        "end": round(seg.end, 2),
-                        "text": text,
-                        "speaker": kwargs.get("speaker", "speaker_0")
-                    })
-                    full_text.append(text)
+            with stage("decode"):
+                for seg in segments:
+                    # the generator decodes lazily: stopping here stops the decode
+                    checkpoint(seg.end)
+                    text = seg.text.strip()
+                    if text:
+                        result_segment = {
+                            "start": round(seg.start, 2),
+                            "end": round(seg.end, 2),
+                            "text": text,
+                            "speaker": kwargs.get("speaker", "speaker_0")
+                        }
+                        if kwargs.get("with_words"):
+                            result_segment["words"] = _whisper_words(seg)
+                        result_segments.append(result_segment)
+                        full_text.append(text)
+                        if kwargs.get("on_segment"):
+                            kwargs["on_segment"](result_segment)
             
             duration = None
             try:
@@ -83,172 +262,225 @@ class WhisperEngine(TranscriptionEngine):
                 "duration": duration
             }
             
+        except JobCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error transcribing with Whisper: {e}")
 
 
 class VoskEngine(TranscriptionEngine):
+    supports_chunking = True
+    supports_streaming = True
+    
     def __init__(self):
         try:
             import vosk
             import json
             import wave
             import numpy as np
-            from scipy.spatial.distance import cosine
             self.vosk = vosk
             self.json = json
             self.wave = wave
             self.np = np
-            self.cosine = cosine
         except ImportError as e:
             raise RuntimeError(f"Vosk dependencies not available: {e}")
     
-    def transcribe(self, audio_path, **kwargs):
+    def load_models(self):
         model_path = current_app.config.get("VOSK_MODEL_PATH", "vosk-model-small-es-0.42")
         speaker_model_path = current_app.config.get("VOSK_SPEAKER_MODEL_PATH", "vosk-model-spk-0.4")
+        registry = get_model_registry()
         
         try:
-            model = self.vosk.Model(model_path)
+            model = registry.get(
+                ("vosk", model_path, "cpu", None),
+                lambda: self.vosk.Model(model_path),
+                size_bytes=directory_size(model_path)
+            )
             spk_model = None
             try:
-                spk_model = self.vosk.SpkModel(speaker_model_path)
+                spk_model = registry.get(
+                    ("vosk-spk", speaker_model_path, "cpu", None),
+                    lambda: self.vosk.SpkModel(speaker_model_path),
+                    size_bytes=directory_size(speaker_model_path)
+                )
             except Exception:
                 pass
         except Exception as e:
             raise RuntimeError(f"Error loading Vosk models: {e}")
+        return model, spk_model
+    
+    def transcribe(self, audio_path, **kwargs):
+        model, spk_model = self.load_models()
         
-        try:
-            wf = self.wave.open(audio_path, 'rb')
-            sample_rate = wf.getframerate()
-            if wf.getnchannels() != 1:
-                raise RuntimeError("Audio must be mono")
-            if wf.getsampwidth() != 2:
-                raise RuntimeError("Audio must be 16-bit")
-        except Exception as e:
-            raise RuntimeError(f"Error opening audio file: {e}")
+        if _is_samples(audio_path):
+            wf = None
+            sample_rate = kwargs.get("sample_rate", 16000)
+            samples = audio_path
+            if samples.dtype.kind == "f":
+                samples = (self.np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+            chunks = (samples[i:i + 4000].tobytes() for i in range(0, len(samples), 4000))
+        else:
+            try:
+                wf = self.wave.open(audio_path, 'rb')
+                sample_rate = wf.getframerate()
+                if wf.getnchannels() != 1:
+                    raise RuntimeError("Audio must be mono")
+                if wf.getsampwidth() != 2:
+                    raise RuntimeError("Audio must be 16-bit")
+            except Exception as e:
+                raise RuntimeError(f"Error opening audio file: {e}")
+            chunks = iter(lambda: wf.readframes(4000), b"")
         
-        rec = self.vosk.KaldiRecognizer(model, sample_rate)
-        rec.SetWords(True)
+        try:
+            return self._decode(chunks, sample_rate, (model, spk_model), kwargs)
+        finally:
+            if wf is not None:
+                wf.close()
+    
+    def transcribe_stream(self, blocks, sample_rate=16000, **kwargs):
+        # the recognizer takes PCM in order anyway: no windows needed
+        return self._decode(blocks, sample_rate, self.load_models(), kwargs)
+    
+    def _decode(self, chunks, sample_rate, models, kwargs):
+        stream = self.open_stream(
+            sample_rate,
+            with_words=kwargs.get("with_words", False),
+            on_segment=kwargs.get("on_segment"),
+            models=models,
+            speaker_embeddings=kwargs.get("speaker_embeddings", False)
+        )
+        with stage("decode"):
+            for data in chunks:
+                stream.accept(data)
+                checkpoint(stream.current_time)
+        return stream.finish()
+    
+    def open_stream(self, sample_rate, with_words=False, on_segment=None, models=None, speaker_embeddings=False):
+        """Incremental recognizer for 16-bit mono PCM pushed in arbitrary chunks."""
+        model, spk_model = models or self.load_models()
+        return VoskStream(
+            self, model, spk_model, sample_rate,
+            with_words=with_words,
+            on_segment=on_segment,
+            speaker_embeddings=speaker_embeddings,
+            merge_threshold=current_app.config.get("SPEAKER_MERGE_THRESHOLD", 0.0)
+        )
+    
+    def result_duration(self, segments, audio_seconds):
+        # transcribe reports the summed length of the recognized segments
+        return sum((seg["end"] - seg["start"]) for seg in segments) if segments else None
+    
+    def _cluster_speakers(self, embeddings, segment_indices, threshold=0.7, merge_threshold=0.0):
+        clusterer = OnlineSpeakerClusterer(threshold=threshold)
+        labels = {seg_idx: clusterer.add(embedding) for embedding, seg_idx in zip(embeddings, segment_indices)}
+        if merge_threshold:
+            mapping = clusterer.merge(merge_threshold)
+            labels = {seg_idx: mapping[label] for seg_idx, label in labels.items()}
+        return labels
+
+
+class VoskStream:
+    """One KaldiRecognizer fed with PCM bytes as they arrive.
+
+    ``accept`` returns the segment completed by the chunk, if any; speakers
+    are clustered online so segments are final when returned. The shared
+    models come from the registry; only the recognizer is per stream.
+    With ``speaker_embeddings`` each segment also keeps its raw x-vector
+    under ``spk`` so windows decoded apart can be clustered together.
+    A ``merge_threshold`` runs the offline merge pass in ``finish``, so
+    only the returned labels (not those already emitted) are merged.
+    """
+    
+    def __init__(self, engine, model, spk_model, sample_rate, with_words=False, on_segment=None, speaker_embeddings=False, merge_threshold=0.0):
+        self.json = engine.json
+        self.sample_rate = sample_rate
+        self.with_words = with_words
+        self.on_segment = on_segment
+        self.speaker_embeddings = speaker_embeddings
+        self.merge_threshold = merge_threshold
+        self.spk_model = spk_model
+        self.rec = engine.vosk.KaldiRecognizer(model, sample_rate)
+        self.rec.SetWords(True)
         if spk_model:
-            rec.SetSpkModel(spk_model)
-        
-        segments = []
-        speakers_embeddings = []
-        speaker_segments = []
-        current_time = 0.0
-        frame_duration = 4000 / sample_rate
-        
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            
-            if rec.AcceptWaveform(data):
-                result = self.json.loads(rec.Result())
-                if result.get('text'):
-                    words = result.get('result', [])
-                    if words:
-                        start_time = words[0].get('start', current_time)
-                        end_time = words[-1].get('end', current_time + frame_duration)
-                    else:
-                        start_time = current_time
-                        end_time = current_time + frame_duration
-                    
-                    segment = {
-                        "start": start_time,
-                        "end": end_time,
-                        "text": result.get('text'),
-                        "spk": result.get('spk', []) if spk_model else []
-                    }
-                    segments.append(segment)
-                    if spk_model and segment['spk']:
-                        speakers_embeddings.append(segment['spk'])
-                        speaker_segments.append(len(segments) - 1)
-            
-            current_time += frame_duration
-        
-        final_result = self.json.loads(rec.FinalResult())
+            self.rec.SetSpkModel(spk_model)
+        self.clusterer = OnlineSpeakerClusterer() if spk_model else None
+        self.segments = []
+        self.full_text = []
+        self.current_time = 0.0
+        self._chunk_duration = 0.0
+    
+    def accept(self, data):
+        # fallback timestamps use the time before this chunk, as the file loop always did
+        self._chunk_duration = len(data) / 2 / self.sample_rate
+        segment = None
+        if self.rec.AcceptWaveform(bytes(data)):
+            result = self.json.loads(self.rec.Result())
+            if result.get('text'):
+                segment = self._add_segment(result)
+        self.current_time += self._chunk_duration
+        return segment
+    
+    def partial(self):
+        return self.json.loads(self.rec.PartialResult()).get('partial', '')
+    
+    def finish(self):
+        final_result = self.json.loads(self.rec.FinalResult())
         if final_result.get('text'):
-            words = final_result.get('result', [])
-            if words:
-                start_time = words[0].get('start', current_time)
-                end_time = words[-1].get('end', current_time + frame_duration)
-            else:
-                start_time = current_time
-                end_time = current_time + frame_duration
-            
-            segment = {
-                "start": start_time,
-                "end": end_time,
-                "text": final_result.get('text'),
-                "spk": final_result.get('spk', []) if spk_model else []
-            }
-            segments.append(segment)
-            if spk_model and segment['spk']:
-                speakers_embeddings.append(segment['spk'])
-                speaker_segments.append(len(segments) - 1)
+            self._add_segment(final_result)
+        if self.clusterer is not None and self.merge_threshold:
+            with stage("clustering"):
+                relabel_segments(self.segments, self.clusterer.merge(self.merge_threshold))
         
-        wf.close()
-        
-        speaker_labels = {}
-        if spk_model and speakers_embeddings:
-            speaker_labels = self._cluster_speakers(speakers_embeddings, speaker_segments)
-        
-        result_segments = []
-        full_text = []
-        
-        for i, seg in enumerate(segments):
-            speaker_id = speaker_labels.get(i, "speaker_0")
-            result_segments.append({
-                "start": seg["start"],
-                "end": seg["end"],
-                "text": seg["text"],
-                "speaker": speaker_id
-            })
-            full_text.append(seg["text"])
-        
-        duration = sum((seg["end"] - seg["start"]) for seg in result_segments) if result_segments else None
+        duration = sum((seg["end"] - seg["start"]) for seg in self.segments) if self.segments else None
         
         return {
-            "text": " ".join(full_text),
-            "segments": result_segments,
+            "text": " ".join(self.full_text),
+            "segments": self.segments,
             "duration": duration
         }
     
-    def _cluster_speakers(self, embeddings, segment_indices, threshold=0.7):
-        if not embeddings:
-            return {}
-        
-        speaker_labels = {}
-        speakers = []
-        
-        for i, (embedding, seg_idx) in enumerate(zip(embeddings, segment_indices)):
-            if not speakers:
-                speakers.append([embedding])
-                speaker_labels[seg_idx] = f"speaker_{len(speakers)-1}"
-                continue
-            
-            min_distance = float('inf')
-            best_speaker = -1
-            
-            for j, speaker_embeddings in enumerate(speakers):
-                avg_embedding = self.np.mean(speaker_embeddings, axis=0)
-                distance = self.cosine(embedding, avg_embedding)
-                if distance < min_distance:
-                    min_distance = distance
-                    best_speaker = j
-            
-            if min_distance < threshold:
-                speakers[best_speaker].append(embedding)
-                speaker_labels[seg_idx] = f"speaker_{best_speaker}"
-            else:
-                speakers.append([embedding])
-                speaker_labels[seg_idx] = f"speaker_{len(speakers)-1}"
-        
-        return speaker_labels
+    def _add_segment(self, result):
+        words = result.get('result', [])
+        if words:
+            start_time = words[0].get('start', self.current_time)
+            end_time = words[-1].get('end', self.current_time + self._chunk_duration)
+        else:
+            start_time = self.current_time
+            end_time = self.current_time + self._chunk_duration
+        spk = result.get('spk', []) if self.spk_model else []
+        speaker = "speaker_0"
+        if spk:
+            with stage("clustering"):
+                speaker = self.clusterer.add(spk)
+        result_segment = {
+            "start": start_time,
+            "end": end_time,
+            "text": result.get('text'),
+            "speaker": speaker
+        }
+        if self.with_words:
+            result_segment["words"] = _vosk_words(result)
+        if self.speaker_embeddings and spk:
+            result_segment["spk"] = spk
+        self.segments.append(result_segment)
+        self.full_text.append(result_segment["text"])
+        if self.on_segment:
+            self.on_segment(result_segment)
+        return result_segment
 
 
 class PyannoteWhisperEngine(TranscriptionEngine):
+    """Whisper ASR plus pyannote diarization, merged word by word.
+
+    The two stages run concurrently (diarization on a shared worker thread,
+    ASR in the caller) and each is cached on its own in the result cache,
+    keyed by the audio hash and only that stage's settings, so changing
+    ``WHISPER_MODEL`` reuses the diarization and vice versa.
+    """
+    # pyannote pipelines keep per-call state, so one diarization runs at a time
+    _diarization_lock = threading.Lock()
+    _diarization_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="diarization")
+    
     def __init__(self):
         try:
             from faster_whisper import WhisperModel
@@ -264,10 +496,17 @@ class PyannoteWhisperEngine(TranscriptionEngine):
         except ImportError as e:
             raise RuntimeError(f"PyannoteWhisper dependencies not available: {e}")
     
-    def transcribe(self, audio_path, **kwargs):
-        model_name = current_app.config.get("WHISPER_MODEL", "small")
+    def load_models(self):
+        return self._load_whisper(), self._load_pipeline()
+    
+    def _load_whisper(self):
+        try:
+            return _load_whisper_model(self.WhisperModel)
+        except Exception as e:
+            raise RuntimeError(f"Error loading Whisper model: {e}")
+    
+    def _load_pipeline(self):
         device = current_app.config.get("WHISPER_DEVICE", "cpu")
-        language = kwargs.get("language")
         hf_token = current_app.config.get("HUGGINGFACE_API_KEY")
         pyannote_model = current_app.config.get("PYANNOTE_MODEL", "pyannote/speaker-diarization-3.1")
         
@@ -276,90 +515,283 @@ class PyannoteWhisperEngine(TranscriptionEngine):
         
         self.os.environ["HF_TOKEN"] = hf_token
         
-        try:
-            whisper_model = self.WhisperModel(model_name, device=device)
-        except Exception as e:
-            raise RuntimeError(f"Error loading Whisper model: {e}")
-        
-        try:
-            diarization_pipeline = self.Pipeline.from_pretrained(
+        def load_pipeline():
+            pipeline = self.Pipeline.from_pretrained(
                 pyannote_model,
                 use_auth_token=hf_token
             )
             if device != "cpu":
-                diarization_pipeline = diarization_pipeline.to(self.torch.device(device))
+                pipeline = pipeline.to(self.torch.device(device))
+            return pipeline
+        
+        try:
+            return get_model_registry().get(
+                ("pyannote", pyannote_model, device, None),
+                load_pipeline,
+                size_bytes=100 * 1024 * 1024
+            )
         except Exception as e:
             raise RuntimeError(f"Error loading Pyannote model: {e}")
-        
+    
+    def _stage_keys(self, audio_path, language):
+        """Stage cache keys, or ``(None, None, None)`` for in-memory audio or a disabled cache."""
+        from .result_cache import get_result_cache
+        cache = get_result_cache()
+        if cache is None or _is_samples(audio_path):
+            return None, None, None
+        config = current_app.config
+        asr_config = {
+            "stage": "asr",
+            "model": config.get("WHISPER_MODEL"),
+            "device": config.get("WHISPER_DEVICE"),
+            "compute_type": config.get("WHISPER_COMPUTE_TYPE"),
+            "language": language,
+        }
+        diarization_config = {
+            "stage": "diarization",
+            "model": config.get("PYANNOTE_MODEL"),
+        }
+        return cache, cache.make_key(audio_path, asr_config), cache.make_key(audio_path, diarization_config)
+    
+    def _diarize(self, pipeline, diarization_input, trace=None):
         try:
-            segments, info = whisper_model.transcribe(audio_path, language=language)
-            whisper_segments = list(segments)
+            with self._diarization_lock, stage("diarization", trace):
+                diarization = pipeline(diarization_input)
+        except Exception as e:
+            raise RuntimeError(f"Error with speaker diarization: {e}")
+        return [
+            [turn.start, turn.end, speaker]
+            for turn, _, speaker in diarization.itertracks(yield_label=True)
+        ]
+    
+    def _recognize(self, whisper_model, audio, language):
+        try:
+            segments, info = whisper_model.transcribe(
+                audio,
+                language=language,
+                # word times are needed to split segments at speaker changes
+                word_timestamps=True
+            )
+            asr_segments = []
+            for seg in segments:
+                checkpoint(seg.end)
+                asr_segments.append(_asr_segment(seg))
+        except JobCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error transcribing with Whisper: {e}")
+        duration = None
+        try:
+            duration = float(info.duration)
+        except Exception:
+            if asr_segments:
+                duration = max(seg["end"] for seg in asr_segments)
+        return {"segments": asr_segments, "duration": duration}
+    
+    def transcribe(self, audio_path, **kwargs):
+        language = kwargs.get("language")
+        
+        diarization_input = audio_path
+        if _is_samples(audio_path):
+            audio_path = _as_float32(audio_path)
+            diarization_input = {
+                "waveform": self.torch.from_numpy(audio_path).unsqueeze(0),
+                "sample_rate": kwargs.get("sample_rate", 16000)
+            }
         
+        cache, asr_key, diarization_key = self._stage_keys(audio_path, language)
+        asr = cache.get(asr_key) if cache else None
+        turns = cache.get(diarization_key) if cache else None
+        
+        pending = None
+        if turns is None:
+            pending = self._diarization_executor.submit(self._diarize, self._load_pipeline(), diarization_input, current_trace())
         try:
-            diarization = diarization_pipeline(audio_path)
-        except Exception as e:
-            raise RuntimeError(f"Error with speaker diarization: {e}")
+            if asr is None:
+                whisper_model = self._load_whisper()
+                with stage("decode"):
+                    asr = self._recognize(whisper_model, audio_path, language)
+                if cache:
+                    cache.put(asr_key, asr, meta={"engine": "pyannote-whisper", "stage": "asr", "model": current_app.config.get("WHISPER_MODEL")})
+        except BaseException:
+            # a failed request must not leave its diarization running behind it
+            if pending is not None and not pending.cancel():
+                pending.exception()
+            raise
+        if pending is not None:
+            turns = pending.result()
+            if cache:
+                cache.put(diarization_key, turns, meta={"engine": "pyannote-whisper", "stage": "diarization", "model": current_app.config.get("PYANNOTE_MODEL")})
         
-        speaker_segments = []
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            speaker_segments.append({
-                "start": turn.start,
-                "end": turn.end,
-                "speaker": speaker
-            })
+        index = IntervalIndex(tuple(turn) for turn in turns)
         
         result_segments = []
         full_text = []
         
-        for whisper_seg in whisper_segments:
-            seg_start = whisper_seg.start
-            seg_end = whisper_seg.end
-            seg_text = whisper_seg.text
-            
-            assigned_speaker = "speaker_0"
-            max_overlap = 0
-            
-            for spk_seg in speaker_segments:
-                overlap_start = max(seg_start, spk_seg["start"])
-                overlap_end = min(seg_end, spk_seg["end"])
-                overlap_duration = max(0, overlap_end - overlap_start)
-                
-                if overlap_duration > max_overlap:
-                    max_overlap = overlap_duration
-                    assigned_speaker = spk_seg["speaker"]
-            
-            result_segments.append({
-                "start": seg_start,
-                "end": seg_end,
-                "text": seg_text,
-                "speaker": assigned_speaker
-            })
-            full_text.append(seg_text)
-        
-        duration = None
-        try:
-            duration = float(info.duration)
-        except Exception:
-            if result_segments:
-                duration = max(seg["end"] for seg in result_segments)
+        for asr_seg in asr["segments"]:
+            for result_segment in _split_at_speaker_changes(asr_seg, index, kwargs.get("with_words")):
+                result_segments.append(result_segment)
+                full_text.append(result_segment["text"])
+                if kwargs.get("on_segment"):
+                    kwargs["on_segment"](result_segment)
         
         return {
             "text": " ".join(full_text),
             "segments": result_segments,
-            "duration": duration
+            "duration": asr["duration"]
+        }
+
+
+# deterministic filler text for the synthetic engine
+SYNTHETIC_WORDS = (
+    "buenos", "d\u00edas", "gracias", "por", "la", "reuni\u00f3n", "de", "hoy", "vamos", "a", "revisar",
+    "el", "informe", "del", "proyecto", "con", "todo", "equipo", "siguiente", "punto", "es", "presupuesto",
+    "creo", "que", "podemos", "avanzar", "semana", "pr\u00f3xima", "entonces", "queda", "acordado"
+)
+
+
+class SyntheticEngine(TranscriptionEngine):
+    """Model-free engine for benchmarks and load tests.
+
+    Segments follow the audio's energy envelope: speech runs between the
+    pauses found by the chunked mode's VAD, split at
+    ``SYNTHETIC_MAX_SEGMENT_SECONDS``. The speaker changes after every pause
+    of ``SYNTHETIC_TURN_PAUSE_SECONDS`` or more, cycling through
+    ``SYNTHETIC_SPEAKERS``. Text is drawn from a fixed vocabulary seeded by
+    the segment start, so the same audio always gives the same result.
+
+    Decoding is simulated by pacing the segments: ``SYNTHETIC_LATENCY_SECONDS``
+    before the first one, then ``SYNTHETIC_RTF`` audio seconds per second
+    (0 returns at once). The pipeline around the engine (upload, conversion,
+    segmentation, database, docx, queue) runs as usual.
+    """
+    supports_chunking = True
+    supports_streaming = True
+
+    def transcribe(self, audio_path, **kwargs):
+        from .chunked_transcription import frame_energy, silence_runs, FRAME_SECONDS
+        config = current_app.config
+        started = time.monotonic()
+        if _is_samples(audio_path):
+            samples, sample_rate = audio_path, kwargs.get("sample_rate", 16000)
+            if samples.dtype.kind == "f":
+                samples = samples * 32768.0
+        else:
+            pcm = read_pcm_wav(audio_path)
+            if pcm is None:
+                raise RuntimeError("synthetic engine needs 16-bit mono PCM WAV input")
+            samples, sample_rate = pcm
+        audio_seconds = len(samples) / sample_rate
+
+        with stage("vad"):
+            levels, frame = frame_energy(samples, sample_rate)
+            pauses = silence_runs(levels, FRAME_SECONDS)
+        frame_seconds = frame / sample_rate
+        speakers = max(1, config.get("SYNTHETIC_SPEAKERS", 2))
+        max_seconds = config.get("SYNTHETIC_MAX_SEGMENT_SECONDS", 10.0)
+        turn_pause = config.get("SYNTHETIC_TURN_PAUSE_SECONDS", 0.8)
+        latency = config.get("SYNTHETIC_LATENCY_SECONDS", 0.0)
+        rtf = config.get("SYNTHETIC_RTF", 0.0)
+        with_words = kwargs.get("with_words", False)
+        on_segment = kwargs.get("on_segment")
+
+        # speech runs are the gaps between pauses: (start, end, pause_before)
+        runs = []
+        position = 0.0
+        pause_before = 0.0
+        for first, last in pauses:
+            if first * frame_seconds - position > 0.2:
+                runs.append((position, first * frame_seconds, pause_before))
+            pause_before = (last - first) * frame_seconds
+            position = last * frame_seconds
+        if audio_seconds - position > 0.2:
+            runs.append((position, audio_seconds, pause_before))
+
+        segments = []
+        turn = 0
+        with stage("decode"):
+            for run_start, run_end, pause in runs:
+                if segments and pause >= turn_pause:
+                    turn += 1
+                start = run_start
+                while start < run_end - 0.05:
+                    checkpoint(start)
+                    end = min(run_end, start + max_seconds)
+                    seg, words = self._segment(start, end, f"speaker_{turn % speakers}")
+                    if with_words:
+                        seg["words"] = words
+                    if rtf > 0 or latency > 0:
+                        delay = started + latency + (end / rtf if rtf > 0 else 0) - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    segments.append(seg)
+                    if on_segment:
+                        on_segment(seg)
+                    start = end
+        if latency > 0 and not segments:
+            time.sleep(max(0.0, started + latency - time.monotonic()))
+        return {
+            "text": " ".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "duration": audio_seconds
         }
 
+    @staticmethod
+    def _segment(start, end, speaker):
+        rng = random.Random(int(start * 100))
+        n_words = max(1, int(round((end - start) * 2.5)))
+        step = (end - start) / n_words
+        words = [
+            {
+                "start": round(start + i * step, 2),
+                "end": round(start + (i + 1) * step, 2),
+                "word": rng.choice(SYNTHETIC_WORDS)
+            }
+            for i in range(n_words)
+        ]
+        seg = {
+            "start": round(start, 2),
+            "end": round(end, 2),
+            "text": " ".join(w["word"] for w in words),
+            "speaker": speaker
+        }
+        return seg, words
+
+
+ENGINES = {
+    "whisper": WhisperEngine,
+    "vosk": VoskEngine,
+    "pyannote-whisper": PyannoteWhisperEngine,
+    "synthetic": SyntheticEngine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
 
-def get_transcription_engine():
-    engine_name = current_app.config.get("TRANSCRIPTION_ENGINE", "vosk").lower()
+
+def get_transcription_engine(engine_name=None):
+    engine_name = (engine_name or current_app.config.get("TRANSCRIPTION_ENGINE", "vosk")).lower()
     
-    if engine_name == "whisper":
-        return WhisperEngine()
-    elif engine_name == "vosk":
-        return VoskEngine()
-    elif engine_name == "pyannote-whisper":
-        return PyannoteWhisperEngine()
-    else:
-        raise ValueError(f"Unknown transcription engine: {engine_name}")
\ No newline at end of file
+    engine_cls = ENGINES.get(engine_name)
+    if engine_cls is None:
+        raise ValueError(f"Unknown transcription engine: {engine_name}")
+    engine = _engines.get(engine_name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(engine_name)
+            if engine is None:
+                engine = engine_cls()
+                _engines[engine_name] = engine
+    return engine
+
+
+def warmup_models(app):
+    with app.app_context():
+        names = [app.config.get("TRANSCRIPTION_ENGINE", "vosk").lower()]
+        if app.config.get("LIVE_TRANSCRIPTION") and "vosk" not in names:
+            names.append("vosk")
+        for name in names:
+            try:
+                get_transcription_engine(name).load_models()
+            except Exception as e:
+                print(f"Warning: model warm-up failed for {name}: {e}")
\ No newline at end of file
@@ -0,0 +1,195 @@
+import dataclasses
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from .model_registry import get_model_registry
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+class WhisperBatcher:
+    """Cross-request batching of Whisper encoder/decoder calls for one model.
+
+    Every request runs faster-whisper's ``BatchedInferencePipeline`` (VAD,
+    features, tokenizer and timestamp handling stay upstream) but its
+    ``forward`` step is handed to this scheduler instead of the model. A
+    single thread collects pending windows from all requests until
+    ``max_batch`` windows are queued or the oldest has waited ``max_wait``
+    seconds, then runs one batched encode + beam search for every request
+    with the same tokenizer and decoding options, and splits the outputs
+    back. Windows from incompatible requests wait for the next batch.
+
+    Word timestamps in a combined batch start from a fresh "last speech"
+    position, as requests do not share a timeline.
+    """
+
+    def __init__(self, model, max_batch=8, max_wait=0.05, window=1000):
+        from faster_whisper import BatchedInferencePipeline
+        batcher = self
+
+        class RequestPipeline(BatchedInferencePipeline):
+            def forward(self, features, tokenizer, chunks_metadata, options):
+                return batcher._submit(features, tokenizer, chunks_metadata, options)
+
+        self._request_pipeline = RequestPipeline
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pipeline = BatchedInferencePipeline(model)
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.windows = 0
+        self.requests = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+        self._closed = False
+        self._waits = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._sizes = deque(maxlen=window)
+        threading.Thread(target=self._run, name="whisper-batcher", daemon=True).start()
+
+    def transcribe(self, audio, **kwargs):
+        """Same contract as ``BatchedInferencePipeline.transcribe``; windows are batched across callers."""
+        with self._lock:
+            self.requests += 1
+        kwargs.setdefault("batch_size", self.max_batch)
+        return self._request_pipeline(self.model).transcribe(audio, **kwargs)
+
+    def _submit(self, features, tokenizer, chunks_metadata, options):
+        future = Future()
+        key = (tokenizer.task, tokenizer.language, repr(dataclasses.replace(options, clip_timestamps=None)))
+        with self._cond:
+            self._pending.append((key, features, tokenizer, chunks_metadata, options, future, time.monotonic()))
+            self._cond.notify()
+        return future.result()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            deadline = self._pending[0][-1] + self.max_wait
+            while sum(len(item[1]) for item in self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            key = self._pending[0][0]
+            batch, rest, size = [], deque(), 0
+            for item in self._pending:
+                if item[0] == key and (not batch or size + len(item[1]) <= self.max_batch):
+                    batch.append(item)
+                    size += len(item[1])
+                else:
+                    rest.append(item)
+            self._pending = rest
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.monotonic()
+            try:
+                _key, _features, tokenizer, _meta, options, _future, _queued = batch[0]
+                self._pipeline.last_speech_timestamp = 0.0
+                outputs = self._pipeline.forward(
+                    np.concatenate([item[1] for item in batch]),
+                    tokenizer,
+                    [meta for item in batch for meta in item[3]],
+                    options
+                )
+            except BaseException as e:
+                for item in batch:
+                    item[5].set_exception(e)
+                continue
+            finished = time.monotonic()
+            offset = 0
+            for item in batch:
+                n = len(item[1])
+                item[5].set_result(outputs[offset:offset + n])
+                offset += n
+            with self._lock:
+                self.batches += 1
+                self.windows += offset
+                self.busy_seconds += finished - started
+                self._sizes.append(offset)
+                for item in batch:
+                    self._waits.append(started - item[-1])
+                    self._latencies.append(finished - item[-1])
+
+    def close(self):
+        """Stop the scheduler thread once the windows already queued are decoded."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._lock:
+            waits = list(self._waits)
+            latencies = list(self._latencies)
+            sizes = list(self._sizes)
+            elapsed = time.monotonic() - self.started_at
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "requests": self.requests,
+                "batches": self.batches,
+                "windows": self.windows,
+                "queued_windows": sum(len(item[1]) for item in list(self._pending)),
+                "mean_batch_size": sum(sizes) / len(sizes) if sizes else None,
+                "windows_per_second": self.windows / elapsed if elapsed else None,
+                "utilization": self.busy_seconds / elapsed if elapsed else None,
+                "queue_wait_ms": {"p50": _ms(_percentile(waits, 50)), "p95": _ms(_percentile(waits, 95))},
+                "latency_ms": {"p50": _ms(_percentile(latencies, 50)), "p95": _ms(_percentile(latencies, 95))},
+            }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_whisper_batcher(key, model, max_batch, max_wait):
+    """The process-wide batcher for the model registered under ``key``; one scheduler thread each."""
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None or batcher.model is not model:
+            # a reloaded model (e.g. after registry eviction) gets a fresh batcher
+            if batcher is not None:
+                batcher.close()
+            batcher = WhisperBatcher(model, max_batch=max_batch, max_wait=max_wait)
+            _batchers[key] = batcher
+        batcher.max_batch = max_batch
+        batcher.max_wait = max_wait
+    return batcher
+
+
+def _drop_batcher(key, model):
+    # the registry let go of the model: so must its batcher and scheduler thread
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None or batcher.model is not model:
+            return
+        del _batchers[key]
+    batcher.close()
+
+
+get_model_registry().add_eviction_listener(_drop_batcher)
+
+
+def batcher_stats():
+    with _batchers_lock:
+        items = list(_batchers.items())
+    return [dict(batcher.stats(), model=list(key)) for key, batcher in items]
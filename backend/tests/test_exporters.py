@@ -0,0 +1,85 @@
+import io
+import json
+
+import pytest
+from docx import Document
+
+from backend import create_app, db
+from backend.config import Config
+from backend.models import Transcription
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setattr(Config, "DOCX_STORAGE_PATH", str(tmp_path / "docs"))
+    monkeypatch.setattr(Config, "LIVE_TRANSCRIPTION", False)
+    monkeypatch.setattr(Config, "MODEL_WARMUP", False)
+    app = create_app()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _paragraphs(data):
+    return [p.text for p in Document(io.BytesIO(data)).paragraphs if p.text]
+
+
+def _text_only(app):
+    with app.app_context():
+        t = Transcription(filename="legacy.wav", status="completed", text="Hola a todos.", duration_seconds=2.5,
+                          segments=[], speaker_segments=[])
+        db.session.add(t)
+        db.session.commit()
+        return t.id
+
+
+def test_docx_export_falls_back_to_text_without_segments(app):
+    tid = _text_only(app)
+
+    resp = app.test_client().get(f"/api/transcriptions/{tid}/export/docx")
+
+    assert resp.status_code == 200
+    assert _paragraphs(resp.data) == ["[0.00-2.50] Hola a todos."]
+
+
+@pytest.mark.parametrize("fmt, expected", [
+    ("txt", "[00:00:00] Hola a todos.\n"),
+    ("srt", "1\n00:00:00,000 --> 00:00:02,500\nHola a todos.\n\n"),
+    ("vtt", "WEBVTT\n\n00:00:00.000 --> 00:00:02.500\nHola a todos.\n\n"),
+])
+def test_text_export_falls_back_to_text_without_segments(app, fmt, expected):
+    tid = _text_only(app)
+
+    resp = app.test_client().get(f"/api/transcriptions/{tid}/export/{fmt}")
+
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True) == expected
+
+
+def test_json_export_falls_back_to_text_without_segments(app):
+    tid = _text_only(app)
+
+    resp = app.test_client().get(f"/api/transcriptions/{tid}/export/json")
+
+    assert resp.status_code == 200
+    assert json.loads(resp.data)["segments"] == [{"start": 0.0, "end": 2.5, "text": "Hola a todos.", "speaker": None}]
+
+
+def test_docx_export_writes_segments(app):
+    with app.app_context():
+        t = Transcription(
+            filename="a.wav", status="completed", text="Hola. Adiós.", speaker_segments=[],
+            segments=[{"start": 0.0, "end": 1.0, "text": "Hola.", "speaker": "speaker_0"},
+                      {"start": 1.0, "end": 2.0, "text": "Adiós.", "speaker": "speaker_1"}],
+        )
+        db.session.add(t)
+        db.session.commit()
+        tid = t.id
+
+    resp = app.test_client().get(f"/api/transcriptions/{tid}/export/docx?include_timestamps=false")
+
+    assert resp.status_code == 200
+    assert _paragraphs(resp.data) == ["Hola.", "Adiós."]
@@ -0,0 +1,52 @@
+import pytest
+from flask import Flask
+
+from backend.config import Config
+from backend.services.result_cache import ResultCache, engine_config
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"RIFF....WAVE")
+    return str(path)
+
+
+def _key(cache, audio):
+    return cache.make_key(audio, engine_config(language="es"))
+
+
+@pytest.mark.parametrize("engine, setting, value", [
+    ("pyannote-whisper", "PYANNOTE_MODEL", "pyannote/speaker-diarization-3.0"),
+    ("pyannote-whisper", "WHISPER_DEVICE", "cuda"),
+    ("vosk", "VOSK_SPEAKER_MODEL_PATH", "other-spk-model"),
+    ("whisper", "WHISPER_BEST_OF", 1),
+    ("whisper", "WHISPER_TEMPERATURE", 0.4),
+    ("synthetic", "SYNTHETIC_SPEAKERS", 5),
+])
+def test_changing_an_engine_setting_misses_the_cache(app, audio, tmp_path, engine, setting, value):
+    cache = ResultCache(str(tmp_path / "cache"), 0)
+    app.config["TRANSCRIPTION_ENGINE"] = engine
+    cache.put(_key(cache, audio), {"text": "hola", "segments": []})
+    assert cache.get(_key(cache, audio)) is not None
+
+    app.config[setting] = value
+
+    assert cache.get(_key(cache, audio)) is None
+
+
+def test_model_is_reported_per_engine(app):
+    app.config["TRANSCRIPTION_ENGINE"] = "synthetic"
+    assert engine_config()["model"] is None
+    app.config["TRANSCRIPTION_ENGINE"] = "vosk"
+    assert engine_config()["model"] == app.config["VOSK_MODEL_PATH"]
+    app.config["TRANSCRIPTION_ENGINE"] = "pyannote-whisper"
+    assert engine_config()["model"] == app.config["WHISPER_MODEL"]
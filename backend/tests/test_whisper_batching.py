@@ -0,0 +1,61 @@
+import gc
+import time
+import sys
+import types
+import weakref
+
+import pytest
+
+from backend.services import whisper_batching
+from backend.services.model_registry import ModelRegistry
+
+
+class FakeModel:
+    pass
+
+
+class FakePipeline:
+    def __init__(self, model):
+        self.model = model
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # the batcher only needs BatchedInferencePipeline from faster-whisper
+    monkeypatch.setitem(sys.modules, "faster_whisper", types.SimpleNamespace(BatchedInferencePipeline=FakePipeline))
+    registry = ModelRegistry(max_bytes=10)
+    registry.add_eviction_listener(whisper_batching._drop_batcher)
+    yield registry
+    registry.clear()
+
+
+def test_eviction_releases_the_batched_model(registry):
+    key = ("whisper", "small", "cpu", "float32", 4)
+    model = registry.get(key, FakeModel, size_bytes=6)
+    batcher = whisper_batching.get_whisper_batcher(key, model, 8, 0.05)
+    released = weakref.ref(model)
+    del model, batcher
+
+    registry.get(("whisper", "base", "cpu", "float32", 4), FakeModel, size_bytes=6)
+
+    assert key not in registry.keys()
+    assert key not in whisper_batching._batchers
+    for _ in range(50):
+        gc.collect()
+        if released() is None:
+            break
+        # the scheduler thread exits on its next wake-up
+        time.sleep(0.01)
+    assert released() is None
+
+
+def test_batcher_of_a_reloaded_model_is_kept(registry):
+    key = ("whisper", "small", "cpu", "float32", 4)
+    old, new = FakeModel(), FakeModel()
+    batcher = whisper_batching.get_whisper_batcher(key, new, 8, 0.05)
+
+    whisper_batching._drop_batcher(key, old)
+
+    assert whisper_batching._batchers[key] is batcher
+    registry._notify([(key, new)])
+    assert key not in whisper_batching._batchers
@@ -0,0 +1,177 @@
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Allow running this file when cwd is ./backend by ensuring project root is on sys.path
+here = os.path.dirname(__file__)
+project_root = os.path.abspath(os.path.join(here, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend import create_app, db
+from backend.models import Transcription, ExportJob
+from backend.services import job_queue
+from backend.services.jobs import process_transcription
+from backend.services.exporters import run_export_job
+
+# export builds first: they are short and a user is usually waiting on them
+JOB_MODELS = (ExportJob, Transcription)
+
+
+class Worker:
+    """Claims queued transcriptions (and export builds) from the database and processes them.
+
+    Several workers (processes, possibly on different hosts) can share one
+    database; claiming is atomic in ``job_queue.claim_next``. Each worker runs
+    up to ``concurrency`` jobs in threads that share the loaded models.
+    """
+
+    def __init__(self, app, concurrency=None, worker_id=None):
+        self.app = app
+        config = app.config
+        self.concurrency = max(1, int(concurrency or config.get("WORKER_CONCURRENCY", 1)))
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = config.get("WORKER_POLL_INTERVAL", 2.0)
+        self.heartbeat_interval = config.get("WORKER_HEARTBEAT_SECONDS", 15)
+        self.stale_seconds = config.get("WORKER_STALE_SECONDS", 120)
+        self.max_attempts = config.get("WORKER_MAX_ATTEMPTS", 3)
+        self._slots = threading.Semaphore(self.concurrency)
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+
+    def stop(self, *_args):
+        self._stop.set()
+
+    def run(self):
+        print(f"Worker {self.worker_id} started (concurrency={self.concurrency})")
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        last_recovery = 0.0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self._stop.is_set():
+                if time.monotonic() - last_recovery >= self.heartbeat_interval:
+                    self._recover()
+                    last_recovery = time.monotonic()
+                if not self._slots.acquire(timeout=self.poll_interval):
+                    continue
+                try:
+                    job = self._claim()
+                except Exception as e:
+                    print(f"Worker {self.worker_id}: claim failed: {e}")
+                    job = None
+                if job is None:
+                    self._slots.release()
+                    self._stop.wait(self.poll_interval)
+                    continue
+                with self._active_lock:
+                    self._active.add(job)
+                executor.submit(self._process, *job)
+        # heartbeats keep running while in-flight jobs drain
+        self._finished.set()
+        print(f"Worker {self.worker_id} stopped")
+
+    def _claim(self):
+        """``(model, id)`` of the claimed job, or ``None``."""
+        with self.app.app_context():
+            try:
+                for model in JOB_MODELS:
+                    job_id = job_queue.claim_next(self.worker_id, model=model)
+                    if job_id is not None:
+                        return model, job_id
+                return None
+            finally:
+                db.session.remove()
+
+    def _recover(self):
+        with self.app.app_context():
+            try:
+                for model in JOB_MODELS:
+                    requeued, failed = job_queue.recover_stale(self.stale_seconds, self.max_attempts, model=model)
+                    if requeued or failed:
+                        print(f"Worker {self.worker_id}: recovered stale {model.__tablename__} (requeued={requeued}, failed={failed})")
+            except Exception as e:
+                print(f"Worker {self.worker_id}: stale job recovery failed: {e}")
+            finally:
+                db.session.remove()
+
+    def _process(self, model, job_id):
+        try:
+            with self.app.app_context():
+                try:
+                    job = db.session.get(model, job_id)
+                    if isinstance(job, ExportJob):
+                        run_export_job(job)
+                    elif job is not None:
+                        process_transcription(job)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            print(f"Worker {self.worker_id}: job {job_id} crashed: {e}")
+        finally:
+            with self._active_lock:
+                self._active.discard((model, job_id))
+            self._slots.release()
+
+    def _heartbeat_loop(self):
+        while not self._finished.wait(self.heartbeat_interval):
+            with self._active_lock:
+                jobs = list(self._active)
+            if not jobs:
+                continue
+            with self.app.app_context():
+                try:
+                    for model in JOB_MODELS:
+                        job_queue.heartbeat(self.worker_id, [job_id for m, job_id in jobs if m is model], model=model)
+                except Exception as e:
+                    print(f"Worker {self.worker_id}: heartbeat failed: {e}")
+                finally:
+                    db.session.remove()
+
+
+def serve_metrics(app, port):
+    """Expose this worker's /metrics on ``port`` (jobs run here, not in the web process)."""
+    from werkzeug.serving import make_server
+    from backend.services.metrics import REGISTRY
+
+    def metrics_app(environ, start_response):
+        if environ.get("PATH_INFO") != "/metrics":
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"not found\n"]
+        with app.app_context():
+            try:
+                body = REGISTRY.render().encode("utf-8")
+            finally:
+                db.session.remove()
+        start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4; charset=utf-8")])
+        return [body]
+
+    server = make_server("0.0.0.0", port, metrics_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued transcriptions")
+    parser.add_argument("--concurrency", type=int, default=None, help="jobs run in parallel by this worker (default: WORKER_CONCURRENCY)")
+    parser.add_argument("--worker-id", default=None, help="identifier stored on claimed rows (default: host:pid)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.metrics_port:
+        serve_metrics(app, args.metrics_port)
+    worker = Worker(app, concurrency=args.concurrency, worker_id=args.worker_id)
+    signal.signal(signal.SIGINT, worker.stop)
+    signal.signal(signal.SIGTERM, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -59,13 +59,49 @@ const HomePage = () => {
 
     const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:5702/api';
 
+    // Subida por partes: si se corta la red, continúa desde el offset que reporta el servidor
+    const uploadResumable = async (blob, filename) => {
+        const initRes = await fetch(`${API_BASE}/uploads/sessions`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename, size: blob.size, content_type: blob.type || 'application/octet-stream' }),
+        });
+        if (!initRes.ok) throw new Error(`Upload failed: ${initRes.status}`);
+        const session = await initRes.json();
+        const sessionUrl = `${API_BASE}/uploads/sessions/${encodeURIComponent(session.id)}`;
+        const chunkSize = session.chunk_size || 1024 * 1024;
+        let offset = 0;
+        let retries = 0;
+        while (offset < blob.size) {
+            try {
+                const res = await fetch(sessionUrl, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': String(offset) },
+                    body: blob.slice(offset, offset + chunkSize),
+                });
+                const json = await res.json().catch(() => null);
+                if ((res.ok || res.status === 409) && json && typeof json.offset === 'number') {
+                    offset = json.offset;
+                    retries = 0;
+                    continue;
+                }
+                throw new Error(`status ${res.status}`);
+            } catch (e) {
+                retries += 1;
+                if (retries > 5) throw new Error(`Upload failed: ${e.message}`);
+                await new Promise(res => setTimeout(res, 1000 * retries));
+                const status = await fetch(sessionUrl).then(r => (r.ok ? r.json() : null)).catch(() => null);
+                if (status && typeof status.offset === 'number') offset = status.offset;
+            }
+        }
+        const finRes = await fetch(`${sessionUrl}/finalize`, { method: 'POST' });
+        if (!finRes.ok) throw new Error(`Upload failed: ${finRes.status}`);
+        return finRes.json();
+    };
+
     const uploadAndTranscribe = async (blob, filename, segments = speakerSegments) => {
         try {
-            const form = new FormData();
-            form.append('file', blob, filename);
-            const upRes = await fetch(`${API_BASE}/uploads`, { method: 'POST', body: form });
-            if (!upRes.ok) throw new Error(`Upload failed: ${upRes.status}`);
-            const upJson = await upRes.json();
+            const upJson = await uploadResumable(blob, filename);
             const uploadId = upJson.id;
             
             console.log('Sending transcription request with segments:', segments);
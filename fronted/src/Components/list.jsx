@@ -1,31 +1,75 @@
 import React, { useState, useEffect } from 'react';
 import './list.css'; 
 
+const PENDING_STATUSES = ['queued', 'processing'];
+const POLL_INTERVAL_MS = 3000;
+const STATUS_LABELS = {
+    queued: 'En cola',
+    processing: 'Procesando',
+    completed: 'Completado',
+    failed: 'Error',
+    cancelled: 'Cancelado',
+};
+
+const JobStatus = ({ item }) => {
+    const label = STATUS_LABELS[item.status] || item.status;
+    if (!PENDING_STATUSES.includes(item.status)) return <span>{label}</span>;
+    const fraction = item.progress && item.progress.fraction;
+    return (
+        <div className="job-progress">
+            {/* sin fracción conocida (en cola) la barra queda indeterminada */}
+            <progress max="1" value={fraction == null ? undefined : fraction} />
+            <span>{fraction == null ? label : `${Math.round(fraction * 100)}%`}</span>
+        </div>
+    );
+};
+
 const ListPage = () => {
     const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:5702/api';
     const [files, setFiles] = useState([]);
+    const [reload, setReload] = useState(0);
 
     useEffect(() => {
         let mounted = true;
+        let timer = null;
         const fetchList = async () => {
             try {
-                const res = await fetch(`${API_BASE}/transcriptions?status=completed&limit=100`);
+                const res = await fetch(`${API_BASE}/transcriptions?limit=100`);
                 if (!res.ok) throw new Error(`Failed to fetch: ${res.status}`);
                 const json = await res.json();
-                // json is an array of {id, filename, status, duration_seconds, created_at}
-                if (mounted) setFiles(json.map(item => ({
+                // json is an array of {id, filename, status, progress, duration_seconds, created_at}
+                if (!mounted) return;
+                setFiles(json.map(item => ({
                     id: item.id,
                     name: item.filename || item.id,
                     date: item.created_at || '',
                     raw: item,
                 })));
+                // refresh while jobs are still queued or running so their progress bars move
+                if (json.some(item => PENDING_STATUSES.includes(item.status))) {
+                    timer = setTimeout(fetchList, POLL_INTERVAL_MS);
+                }
             } catch (e) {
                 console.error(e);
             }
         };
         fetchList();
-        return () => { mounted = false };
-    }, []);
+        return () => { mounted = false; clearTimeout(timer); };
+    }, [reload]);
+
+    const cancelJob = async (file) => {
+        try {
+            const res = await fetch(`${API_BASE}/transcriptions/${encodeURIComponent(file.id)}/cancel`, { method: 'POST' });
+            if (!res.ok) {
+                const err = await res.json().catch(()=>null);
+                throw new Error(err && err.error ? err.error : `status ${res.status}`);
+            }
+            setReload((n) => n + 1);
+        } catch (e) {
+            console.error(e);
+            alert('Error al cancelar: ' + (e.message || e));
+        }
+    };
 
     const handleDownload = (file) => {
         // file may include raw.word_doc_path with a server path; build download URL
@@ -44,6 +88,19 @@ const ListPage = () => {
         window.open(downloadUrl, '_blank');
     };
 
+    const waitForExport = async (exportId) => {
+        for (;;) {
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+            const res = await fetch(`${API_BASE}/exports/${encodeURIComponent(exportId)}`);
+            const json = await res.json().catch(()=>null);
+            if (!res.ok || !json) {
+                throw new Error(json && json.error ? json.error : `status ${res.status}`);
+            }
+            if (json.status === 'completed') return json;
+            if (json.status === 'failed') throw new Error(json.error || 'export failed');
+        }
+    };
+
     const generateAndDownload = async (file) => {
         const raw = file.raw || {};
         const id = raw.id;
@@ -61,7 +118,11 @@ const ListPage = () => {
                 const err = await res.json().catch(()=>null);
                 throw new Error(err && err.error ? err.error : `status ${res.status}`);
             }
-            const json = await res.json();
+            let json = await res.json();
+            if (res.status === 202 && json && json.export_id) {
+                // large documents are built by the worker; poll until ready
+                json = await waitForExport(json.export_id);
+            }
             // expected { docx_url: outpath }
             let url = json && json.docx_url;
             if (url) {
@@ -92,6 +153,7 @@ const ListPage = () => {
                             <th className="column-hash">#</th>
                             <th className="column-name">Nombre del Archivo</th>
                             <th className="column-date">Fecha de Creación</th> {/* Añadido para mejor contexto */}
+                            <th className="column-status">Estado</th>
                             <th className="column-actions">Acciones</th>
                         </tr>
                     </thead>
@@ -101,13 +163,24 @@ const ListPage = () => {
                                 <td className="column-hash">{index + 1}</td>
                                 <td className="column-name">{file.name}</td>
                                 <td className="column-date">{file.date}</td>
+                                <td className="column-status"><JobStatus item={file.raw} /></td>
                                 <td className="column-actions">
-                                    <button 
-                                        className="btn-gendoc" 
-                                        onClick={() => generateAndDownload(file)}
-                                    >
-                                        Descargar
-                                    </button>
+                                    {file.raw.status === 'completed' && (
+                                        <button 
+                                            className="btn-gendoc" 
+                                            onClick={() => generateAndDownload(file)}
+                                        >
+                                            Descargar
+                                        </button>
+                                    )}
+                                    {PENDING_STATUSES.includes(file.raw.status) && (
+                                        <button 
+                                            className="btn-cancel" 
+                                            onClick={() => cancelJob(file)}
+                                        >
+                                            Cancelar
+                                        </button>
+                                    )}
                                 </td>
                             </tr>
                         ))}
@@ -115,7 +188,7 @@ const ListPage = () => {
                         {/* Mensaje si no hay archivos */}
                         {files.length === 0 && (
                             <tr>
-                                <td colSpan="4" style={{ textAlign: 'center', padding: '20px' }}>
+                                <td colSpan="5" style={{ textAlign: 'center', padding: '20px' }}>
                                     No hay archivos disponibles.
                                 </td>
                             </tr>
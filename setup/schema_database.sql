@@ -1,6 +1,6 @@
 -- Schema PostgreSQL para Voz-Orden-Oscura
 -- Basado en docs/SPEC.md
--- Incluye tablas: uploads, transcriptions
+-- Incluye tablas: uploads, batches, transcriptions
 -- Recomendación: ejecutar en una base de datos PostgreSQL 12+
 
 -- Habilitar extensiones útiles
@@ -14,6 +14,7 @@ CREATE TABLE IF NOT EXISTS uploads (
 	content_type TEXT NOT NULL,
 	size_bytes BIGINT NOT NULL DEFAULT 0,
 	stored_at TEXT NOT NULL, -- ruta o ubicación relativa en disco
+	content_sha256 VARCHAR(64), -- hash del contenido; archivos idénticos comparten stored_at
 	original_path TEXT, -- ruta al archivo original si difiere
 	is_video BOOLEAN NOT NULL DEFAULT FALSE,
 	metadata JSONB, -- metadatos detectados (ffprobe, etc.)
@@ -23,11 +24,23 @@ CREATE TABLE IF NOT EXISTS uploads (
 
 CREATE INDEX IF NOT EXISTS idx_uploads_filename ON uploads (filename);
 CREATE INDEX IF NOT EXISTS idx_uploads_created_at ON uploads (created_at);
+CREATE INDEX IF NOT EXISTS idx_uploads_content_sha256 ON uploads (content_sha256);
+
+-- Tabla: batches (lotes enviados juntos por POST /api/batches; el progreso se agrega de transcriptions)
+CREATE TABLE IF NOT EXISTS batches (
+	id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+	name TEXT,
+	source VARCHAR(16) NOT NULL DEFAULT 'uploads', -- uploads|archive
+	total INTEGER NOT NULL DEFAULT 0,
+	created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+	updated_at TIMESTAMPTZ
+);
 
 -- Tabla: transcriptions
 CREATE TABLE IF NOT EXISTS transcriptions (
 	id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
 	upload_id UUID REFERENCES uploads(id) ON DELETE SET NULL,
+	batch_id UUID REFERENCES batches(id), -- lote al que pertenece, si lo hay
 	filename TEXT, -- nombre original o generado
 	content_type TEXT,
 	audio_path TEXT, -- ruta local al audio convertido/normalizado
@@ -36,18 +49,70 @@ CREATE TABLE IF NOT EXISTS transcriptions (
 	text TEXT, -- transcripción completa
 	segments JSONB, -- lista de segmentos: [{start, end, text, speaker_id}, ...]
 	speakers JSONB, -- {speaker_id: {label, confidence}}
-	status VARCHAR(32) NOT NULL DEFAULT 'queued', -- queued|processing|completed|failed
+	status VARCHAR(32) NOT NULL DEFAULT 'queued', -- queued|processing|completed|failed|cancelled
 	error TEXT,
+	priority INTEGER NOT NULL DEFAULT 0, -- mayor se reclama antes
+	tenant VARCHAR(64), -- cliente; el worker reparte los trabajos entre clientes
+	cancel_requested BOOLEAN NOT NULL DEFAULT FALSE, -- el trabajo en curso se detiene en el siguiente bloque
+	progress_seconds DOUBLE PRECISION, -- segundos de audio procesados
+	progress_total DOUBLE PRECISION, -- duración total del audio
 	transcriber TEXT,
 	word_doc_path TEXT,
+	content_sha256 VARCHAR(64), -- hash de text + segments; clave de caché de las exportaciones
+	worker_id TEXT, -- worker (host:pid) que reclamó la tarea
+	claimed_at TIMESTAMPTZ,
+	heartbeat_at TIMESTAMPTZ, -- último latido del worker; usado para recuperar tareas colgadas
+	attempts INTEGER NOT NULL DEFAULT 0,
+	timings JSONB, -- duración por etapa (ensure_audio, model_load, vad, decode, clustering, db_commit, docx)
+	rtf DOUBLE PRECISION, -- segundos de audio por segundo de procesamiento
 	created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
 	updated_at TIMESTAMPTZ
 );
 
 -- Índices recomendados
 CREATE INDEX IF NOT EXISTS idx_transcriptions_status ON transcriptions (status);
-CREATE INDEX IF NOT EXISTS idx_transcriptions_created_at ON transcriptions (created_at);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_created_at ON transcriptions (created_at, id); -- paginación por cursor (created_at, id)
 CREATE INDEX IF NOT EXISTS idx_transcriptions_upload_id ON transcriptions (upload_id);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_batch_status ON transcriptions (batch_id, status); -- progreso del lote y reparto justo entre lotes
+CREATE INDEX IF NOT EXISTS idx_transcriptions_tenant_status ON transcriptions (tenant, status); -- reparto justo entre clientes
+
+-- Tabla: transcription_segments (un segmento por fila; transcriptions.segments conserva el JSON completo)
+CREATE TABLE IF NOT EXISTS transcription_segments (
+	transcription_id UUID NOT NULL REFERENCES transcriptions(id) ON DELETE CASCADE,
+	segment_index INTEGER NOT NULL, -- orden del segmento en el resultado
+	start_time DOUBLE PRECISION NOT NULL,
+	end_time DOUBLE PRECISION NOT NULL,
+	text TEXT,
+	speaker VARCHAR(64),
+	words JSONB, -- [{start, end, word}] si el motor los devolvió
+	PRIMARY KEY (transcription_id, segment_index)
+);
+
+-- consultas por rango de tiempo: /api/transcriptions/{id}/segments?from=&to=
+CREATE INDEX IF NOT EXISTS idx_transcription_segments_start ON transcription_segments (transcription_id, start_time);
+-- búsqueda de texto completo con stemming en español: /api/search?q=
+CREATE INDEX IF NOT EXISTS idx_transcription_segments_fts ON transcription_segments USING GIN (to_tsvector('spanish', text));
+
+-- Tabla: export_jobs (documentos grandes que genera el worker; misma cola que transcriptions)
+CREATE TABLE IF NOT EXISTS export_jobs (
+	id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+	transcription_id UUID NOT NULL REFERENCES transcriptions(id) ON DELETE CASCADE,
+	format VARCHAR(16) NOT NULL, -- docx|srt|vtt|txt|json
+	options JSONB, -- opciones normalizadas (title, author, include_timestamps, speaker_labels)
+	cache_key VARCHAR(64) NOT NULL, -- hash del contenido + formato + opciones
+	status VARCHAR(32) NOT NULL DEFAULT 'queued', -- queued|processing|completed|failed
+	path TEXT, -- archivo generado en DOCX_STORAGE_PATH
+	error TEXT,
+	worker_id TEXT,
+	claimed_at TIMESTAMPTZ,
+	heartbeat_at TIMESTAMPTZ,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+	updated_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_export_jobs_status ON export_jobs (status);
+CREATE INDEX IF NOT EXISTS idx_export_jobs_cache_key ON export_jobs (cache_key);
 
 -- Función auxiliar para actualizar updated_at
 CREATE OR REPLACE FUNCTION set_updated_at_column()
@@ -64,11 +129,21 @@ BEFORE UPDATE ON uploads
 FOR EACH ROW
 EXECUTE FUNCTION set_updated_at_column();
 
+CREATE TRIGGER trg_batches_updated_at
+BEFORE UPDATE ON batches
+FOR EACH ROW
+EXECUTE FUNCTION set_updated_at_column();
+
 CREATE TRIGGER trg_transcriptions_updated_at
 BEFORE UPDATE ON transcriptions
 FOR EACH ROW
 EXECUTE FUNCTION set_updated_at_column();
 
+CREATE TRIGGER trg_export_jobs_updated_at
+BEFORE UPDATE ON export_jobs
+FOR EACH ROW
+EXECUTE FUNCTION set_updated_at_column();
+
 -- Opcional: vista resumida de transcripciones para listados
 CREATE OR REPLACE VIEW transcriptions_list AS
 SELECT
@@ -87,5 +162,5 @@ ORDER BY created_at DESC;
 
 -- Comentarios adicionales:
 -- - Se recomienda crear roles/privilegios específicos para la aplicación.
--- - Para integridad avanzada y search full-text, considerar índices GIN sobre columnas JSONB y tsvector sobre `text`.
+-- - Para integridad avanzada, considerar índices GIN sobre columnas JSONB (la búsqueda full-text usa idx_transcription_segments_fts).
 